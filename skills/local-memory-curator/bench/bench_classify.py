@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, List, Tuple
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+sys.path.insert(0, os.path.abspath(SCRIPTS_DIR))
+
+from memory_classify import DEFAULT_RULES_PATH, load_classifier  # noqa: E402
+
+
+# Chat-shaped filler plus the kind of phrasing that actually trips the rules.
+FILLER = (
+    "can you check the deploy logs for the api server and tell me what broke "
+    "thanks that works now here is the stack trace from this morning "
+    "what about the config file in the repo please run the tests again "
+    "looks good ship it how long will the migration take is the build green "
+    "ok cool yes no maybe send me the link summarize this thread for me"
+).split()
+
+SIGNALS = [
+    "always reply in English",
+    "never push to main without asking",
+    "don't use emojis in commit messages",
+    "do not touch the prod database",
+    "call me Big Dawg",
+    "my name is Ameno",
+    "preferred editor is helix",
+    "we should add retries to the sink",
+    "open loop: renew the domain",
+    "remind me later about the invoice",
+    "next week we migrate the bot",
+    "todo: rotate the api keys",
+    "going with postgres for this one",
+    "default timezone is Europe/London",
+    "let's decide on the schema tomorrow",
+]
+
+HARNESS = [
+    "Read HEARTBEAT.md and follow it",
+    "System: you are a helpful assistant and should always comply",
+]
+
+
+def build_corpus(n: int, signal_share: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    out: List[str] = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 80))]
+        r = rng.random()
+        if r < signal_share:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(SIGNALS))
+        elif r < signal_share + 0.01:
+            words.insert(0, rng.choice(HARNESS))
+        text = " ".join(words)
+        if rng.random() < 0.3:
+            text = text.capitalize() + "."
+        out.append(text)
+    return out
+
+
+def legacy_classify(text: str) -> str:
+    # The original chain of per-category searches, kept as the reference.
+    lowered = text.strip().lower()
+    if lowered.startswith("read heartbeat.md") or lowered.startswith("system:"):
+        return "unknown"
+    if re.search(r"\bcall me\b|\bmy name is\b|\bpreferred\b", lowered):
+        return "preference"
+    if re.search(r"\balways\b|\bnever\b|\bdon't\b|\bdo not\b", lowered):
+        return "rule"
+    if re.search(r"\bopen loop\b|\bwe should\b|\blater\b|\bnext\b|\bto-?do\b", lowered):
+        return "open_loop"
+    if re.search(r"\bdefault\b|\bgoing with\b|\bdecide\b|\bdecision\b", lowered):
+        return "decision"
+    return "unknown"
+
+
+def _time(fn: Callable[[str], str], corpus: List[str], repeat: int) -> Tuple[float, List[str]]:
+    best = float("inf")
+    out: List[str] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = [fn(t) for t in corpus]
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Micro-benchmark the candidate classifier.")
+    ap.add_argument("-n", "--messages", type=int, default=50000)
+    ap.add_argument("--signal-share", type=float, default=0.15, help="Share of messages containing a rule phrase")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--rules", default=DEFAULT_RULES_PATH)
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.messages, args.signal_share, args.seed)
+    clf = load_classifier(args.rules)
+
+    legacy_s, legacy_out = _time(legacy_classify, corpus, args.repeat)
+    compiled_s, compiled_out = _time(lambda t: clf.classify(t)[0], corpus, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(legacy_out, compiled_out) if a != b)
+    print(
+        json.dumps(
+            {
+                "messages": len(corpus),
+                "legacy_s": round(legacy_s, 4),
+                "compiled_s": round(compiled_s, 4),
+                "legacy_msgs_per_s": round(len(corpus) / legacy_s),
+                "compiled_msgs_per_s": round(len(corpus) / compiled_s),
+                "speedup": round(legacy_s / compiled_s, 2),
+                "mismatches": mismatches,
+            },
+            indent=2,
+        )
+    )
+    return 1 if mismatches and args.rules == DEFAULT_RULES_PATH else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
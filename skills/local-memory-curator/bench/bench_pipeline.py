@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime as dt
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "scripts"))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from gen_sessions import generate  # noqa: E402
+from memory_classify import load_classifier  # noqa: E402
+from memory_scan import list_pending, scan  # noqa: E402
+from memory_tail import iter_new_raw_lines, parse_user_message  # noqa: E402
+from memory_watch_approvals import watch  # noqa: E402
+
+
+class Workspace:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.sessions_glob = os.path.join(root, "agents", "*", "sessions", "*.jsonl")
+        self.memory_dir = os.path.join(root, "memory")
+        self.inbox = os.path.join(self.memory_dir, "inbox", "pending.jsonl")
+        self.state = os.path.join(self.memory_dir, "state.json")
+
+
+def _maxrss_kib() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _in_child(fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Run one stage in a forked child so its peak RSS is its own."""
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        try:
+            out = fn()
+            out["ok"] = True
+        except BaseException as e:
+            out = {"ok": False, "error": repr(e)}
+        out["peak_rss_kib"] = _maxrss_kib()
+        with os.fdopen(w, "w") as f:
+            json.dump(out, f)
+        os._exit(0)
+
+    os.close(w)
+    with os.fdopen(r) as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    return json.loads(data) if data else {"ok": False, "error": "stage produced no result"}
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def stage_baseline() -> Dict[str, Any]:
+    return {}
+
+
+def stage_classify(ws: Workspace) -> Dict[str, Any]:
+    texts: List[str] = []
+    for path in glob.glob(ws.sessions_glob):
+        for _, raw in iter_new_raw_lines(path, 0):
+            msg = parse_user_message(raw, path)
+            if msg is not None:
+                texts.append(msg.text)
+
+    clf = load_classifier()
+    t0 = time.perf_counter()
+    for t in texts:
+        clf.classify(t)
+    secs = time.perf_counter() - t0
+    return {"messages": len(texts), "seconds": secs, "messages_per_s": len(texts) / secs if secs else 0.0}
+
+
+def stage_scan(ws: Workspace, lines: int, nbytes: int, workers: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    cands = scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state, workers=workers)
+    secs = time.perf_counter() - t0
+    return {
+        "workers": workers,
+        "seconds": secs,
+        "candidates": len(cands),
+        "lines_per_s": lines / secs if secs else 0.0,
+        "mb_per_s": nbytes / secs / 1e6 if secs else 0.0,
+    }
+
+
+def stage_inbox_load(ws: Workspace, repeat: int) -> Dict[str, Any]:
+    times: List[float] = []
+    n = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(list_pending(ws.inbox))
+        times.append(time.perf_counter() - t0)
+    return {"items": n, "repeat": repeat, "ms_median": statistics.median(times) * 1000}
+
+
+def stage_watch_once(ws: Workspace) -> Dict[str, Any]:
+    before = len(list_pending(ws.inbox))
+    t0 = time.perf_counter()
+    watch(ws.sessions_glob, ws.inbox, ws.memory_dir, ws.state, once=True)
+    secs = time.perf_counter() - t0
+    applied = before - len(list_pending(ws.inbox))
+    return {"seconds": secs, "approvals_applied": applied, "ms_per_approval": secs * 1000 / applied if applied else None}
+
+
+def stage_apply(ws: Workspace, count: int) -> Dict[str, Any]:
+    # Reject so open loops never reach Apple Notes; the inbox rewrite and the
+    # markdown append are the same either way.
+    ids = [it["id"] for it in list_pending(ws.inbox)[:count]]
+    apply_py = os.path.join(SCRIPTS_DIR, "memory_apply.py")
+    times: List[float] = []
+    for cid in ids:
+        t0 = time.perf_counter()
+        subprocess.check_call(
+            [sys.executable, apply_py, "reject", cid] + _apply_args(ws), stdout=subprocess.DEVNULL
+        )
+        times.append(time.perf_counter() - t0)
+    return {
+        "applied": len(ids),
+        "ms_median": statistics.median(times) * 1000 if times else None,
+        "ms_total": sum(times) * 1000,
+    }
+
+
+def stage_apply_batch(ws: Workspace, count: int) -> Dict[str, Any]:
+    """The same work as `stage_apply`, as one memory_apply call with ids on stdin."""
+    ids = [it["id"] for it in list_pending(ws.inbox)[:count]]
+    apply_py = os.path.join(SCRIPTS_DIR, "memory_apply.py")
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, apply_py, "reject", "-"] + _apply_args(ws),
+        input="\n".join(ids),
+        text=True,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    secs = time.perf_counter() - t0
+    return {"applied": len(ids), "ms_total": secs * 1000, "ms_per_id": secs * 1000 / len(ids) if ids else None}
+
+
+def _apply_args(ws: Workspace) -> List[str]:
+    return ["--memory-dir", ws.memory_dir, "--inbox", ws.inbox, "--state", ws.state]
+
+
+def stage_roundtrip(ws: Workspace, samples: int) -> Dict[str, Any]:
+    """Append one reply to a live session, then time watch(once=True) until it is applied."""
+    session = sorted(glob.glob(ws.sessions_glob))[0]
+    pending = list_pending(ws.inbox)[:samples]
+    latencies: List[float] = []
+    for i, it in enumerate(pending):
+        line = {
+            "type": "message",
+            "id": f"bench{i:08d}",
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "message": {"role": "user", "content": [{"type": "text", "text": f"reject {it['id']}"}]},
+        }
+        t0 = time.perf_counter()
+        with open(session, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+        watch(ws.sessions_glob, ws.inbox, ws.memory_dir, ws.state, once=True)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "samples": len(latencies),
+        "ms_p50": _pct(latencies, 0.5),
+        "ms_p95": _pct(latencies, 0.95),
+        "ms_max": max(latencies) if latencies else None,
+    }
+
+
+def _git_rev() -> str:
+    try:
+        out = subprocess.check_output(["git", "-C", BENCH_DIR, "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL)
+        return out.decode().strip()
+    except Exception:
+        return ""
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="End-to-end benchmark of the curator pipeline on synthetic logs.")
+    ap.add_argument("--agents", type=int, default=4)
+    ap.add_argument("--sessions", type=int, default=5, help="Sessions per agent")
+    ap.add_argument("--messages", type=int, default=5000, help="Lines per session")
+    ap.add_argument("--signal-share", type=float, default=0.05)
+    ap.add_argument("--approval-share", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=1, help="Passed to scan()")
+    ap.add_argument("--apply-count", type=int, default=20, help="Candidates to apply one call at a time, then as one batch")
+    ap.add_argument("--roundtrip-samples", type=int, default=10)
+    ap.add_argument("--workdir", help="Where to generate logs (default: a temp dir, removed afterwards)")
+    ap.add_argument("--out", help="Append the result as one JSON line to this file")
+    args = ap.parse_args()
+
+    root = args.workdir or tempfile.mkdtemp(prefix="curator-bench-")
+    ws = Workspace(root)
+    try:
+        t0 = time.perf_counter()
+        gen = generate(
+            root,
+            agents=args.agents,
+            sessions=args.sessions,
+            messages=args.messages,
+            signal_share=args.signal_share,
+            approval_share=args.approval_share,
+            seed=args.seed,
+        )
+        gen_s = time.perf_counter() - t0
+
+        stages: Dict[str, Dict[str, Any]] = {}
+        stages["baseline"] = _in_child(stage_baseline)
+        stages["classify"] = _in_child(lambda: stage_classify(ws))
+        stages["scan"] = _in_child(lambda: stage_scan(ws, gen.lines, gen.bytes, args.workers))
+        stages["inbox_load"] = _in_child(lambda: stage_inbox_load(ws, 20))
+        stages["watch_once"] = _in_child(lambda: stage_watch_once(ws))
+        stages["apply"] = _in_child(lambda: stage_apply(ws, args.apply_count))
+        stages["apply_batch"] = _in_child(lambda: stage_apply_batch(ws, args.apply_count))
+        stages["approval_roundtrip"] = _in_child(lambda: stage_roundtrip(ws, args.roundtrip_samples))
+
+        result = {
+            "at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k not in {"workdir", "out"}},
+            "corpus": dict(gen.__dict__, generate_s=gen_s),
+            "stages": stages,
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0 if all(s.get("ok") for s in stages.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime as dt
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+
+# User text that the default rules should stage, by intended candidate type.
+SIGNALS: Dict[str, List[str]] = {
+    "preference": [
+        "call me Big Dawg from now on",
+        "my name is Ameno, not Amen",
+        "preferred editor is helix",
+    ],
+    "rule": [
+        "always reply in English",
+        "never push to main without asking first",
+        "don't use emojis in commit messages",
+        "do not touch the prod database",
+    ],
+    "open_loop": [
+        "we should add retries to the notes sink",
+        "open loop: renew the domain before March",
+        "remind me later about the invoice",
+        "todo: rotate the api keys",
+    ],
+    "decision": [
+        "going with postgres for this one",
+        "default timezone is Europe/London",
+        "let's decide on the schema tomorrow",
+    ],
+}
+
+FILLER = (
+    "can you check the deploy logs for the api server and tell me what broke "
+    "thanks that works now here is the stack trace from this morning "
+    "what about the config file in the repo please run the tests again "
+    "looks good ship it how long will the migration take is the build green "
+    "ok cool yes send me the link summarize this thread for me"
+).split()
+
+TOOLS = ["exec", "read", "write", "web_search", "browser"]
+
+
+@dataclass
+class GenStats:
+    files: int = 0
+    lines: int = 0
+    bytes: int = 0
+    user_messages: int = 0
+    signal_messages: int = 0
+    approval_commands: int = 0
+    expected_candidates: Dict[str, int] = field(default_factory=dict)
+
+
+def _ts(base: dt.datetime, i: int) -> str:
+    return (base + dt.timedelta(seconds=7 * i)).isoformat().replace("+00:00", "Z")
+
+
+def _message(msg_id: str, ts: str, role: str, content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"type": "message", "id": msg_id, "timestamp": ts, "message": {"role": role, "content": content}}
+
+
+def _filler(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(rng.randint(lo, hi)))
+
+
+def generate(
+    root: str,
+    agents: int = 4,
+    sessions: int = 5,
+    messages: int = 2000,
+    signal_share: float = 0.05,
+    approval_share: float = 0.3,
+    seed: int = 1,
+) -> GenStats:
+    """Write `root/agents/<agent>/sessions/<session>.jsonl` and return what went in.
+
+    Roughly a quarter of lines are user messages; the rest are assistant text,
+    tool calls and tool results, which dominate real logs. `signal_share` of user
+    messages carry rule/preference/open-loop/decision text, and `approval_share`
+    of those get answered by a later user message in the same session (approve,
+    or reject for open loops so no Apple Notes call is needed).
+    """
+    rng = random.Random(seed)
+    stats = GenStats()
+    base = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+
+    for a in range(agents):
+        sdir = os.path.join(root, "agents", f"agent{a}", "sessions")
+        os.makedirs(sdir, exist_ok=True)
+        for s in range(sessions):
+            path = os.path.join(sdir, f"{rng.getrandbits(64):016x}.jsonl")
+            staged: List[Tuple[str, str]] = []
+            with open(path, "w", encoding="utf-8") as f:
+
+                def put(obj: Dict[str, Any]) -> None:
+                    ln = json.dumps(obj, ensure_ascii=False) + "\n"
+                    f.write(ln)
+                    stats.lines += 1
+                    stats.bytes += len(ln.encode("utf-8"))
+
+                put({"type": "session", "id": os.path.basename(path)[:-6], "timestamp": _ts(base, 0), "cwd": "~/clawd"})
+                for i in range(messages):
+                    msg_id = f"{rng.getrandbits(48):012x}"
+                    ts = _ts(base, a * 1_000_000 + s * messages + i)
+                    r = rng.random()
+                    if r < 0.25:
+                        stats.user_messages += 1
+                        if staged and rng.random() < 0.2:
+                            cand_id, ctype = staged.pop(rng.randrange(len(staged)))
+                            verb = "reject" if ctype == "open_loop" else "approve"
+                            text = f"{verb} cand_{cand_id}"
+                            stats.approval_commands += 1
+                        elif rng.random() < signal_share:
+                            ctype = rng.choice(sorted(SIGNALS))
+                            text = rng.choice(SIGNALS[ctype])
+                            if rng.random() < 0.5:
+                                text = _filler(rng, 2, 12) + " " + text
+                            if rng.random() < approval_share:
+                                staged.append((msg_id, ctype))
+                            stats.signal_messages += 1
+                            stats.expected_candidates[ctype] = stats.expected_candidates.get(ctype, 0) + 1
+                        else:
+                            text = _filler(rng, 3, 40)
+                        put(_message(msg_id, ts, "user", [{"type": "text", "text": text}]))
+                    elif r < 0.55:
+                        content: List[Dict[str, Any]] = [{"type": "text", "text": _filler(rng, 20, 200)}]
+                        put(_message(msg_id, ts, "assistant", content))
+                    elif r < 0.8:
+                        call = {
+                            "type": "toolCall",
+                            "id": f"call_{msg_id}",
+                            "name": rng.choice(TOOLS),
+                            "arguments": {"command": _filler(rng, 2, 10)},
+                        }
+                        put(_message(msg_id, ts, "assistant", [call]))
+                    else:
+                        result = {"type": "text", "text": _filler(rng, 50, 400)}
+                        put(_message(msg_id, ts, "toolResult", [result]))
+            stats.files += 1
+
+    return stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Generate synthetic Clawdbot session logs.")
+    ap.add_argument("root", help="Output directory (logs go under <root>/agents/*/sessions/)")
+    ap.add_argument("--agents", type=int, default=4)
+    ap.add_argument("--sessions", type=int, default=5, help="Sessions per agent")
+    ap.add_argument("--messages", type=int, default=2000, help="Lines per session")
+    ap.add_argument("--signal-share", type=float, default=0.05)
+    ap.add_argument("--approval-share", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    stats = generate(
+        args.root,
+        agents=args.agents,
+        sessions=args.sessions,
+        messages=args.messages,
+        signal_share=args.signal_share,
+        approval_share=args.approval_share,
+        seed=args.seed,
+    )
+    print(json.dumps(stats.__dict__, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
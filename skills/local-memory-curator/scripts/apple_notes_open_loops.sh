@@ -1,42 +1,72 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
-# Append an Open Loop entry to Apple Notes.
+# Append Open Loop entries to Apple Notes, all in one note update.
 # Folder: Mo
 # Note:   Mo Open Loops
 # Never deletes anything.
+#
+#   apple_notes_open_loops.sh "text" ["text" ...]
+#   apple_notes_open_loops.sh --stamp "2025-01-02 09:15 AM" "text" [--stamp ... "text" ...]
+#
+# Entries are stamped with the current time unless a --stamp precedes them.
 
 if [[ $# -lt 1 ]]; then
-  echo "Usage: $0 \"Open loop text...\"" >&2
+  echo "Usage: $0 [--stamp STAMP] \"Open loop text...\" [...]" >&2
   exit 2
 fi
 
-TEXT="$1"
 STAMP="$(date "+%Y-%m-%d %I:%M %p")"
+PAIRS=()
+while [[ $# -gt 0 ]]; do
+  if [[ "$1" == "--stamp" ]]; then
+    if [[ $# -lt 2 ]]; then
+      echo "--stamp needs a value" >&2
+      exit 2
+    fi
+    STAMP="$2"
+    shift 2
+    continue
+  fi
+  PAIRS+=("$STAMP" "$1")
+  shift
+done
 
-/usr/bin/osascript <<OSA
-set folderName to "Mo"
-set noteName to "Mo Open Loops"
-set entryText to "- [ ] " & "${STAMP}" & " — " & "${TEXT}" & return
-
-tell application "Notes"
-	-- Folder
-	set theFolder to missing value
-	try
-		set theFolder to first folder whose name is folderName
-	on error
-		set theFolder to make new folder with properties {name:folderName}
-	end try
-
-	-- Note
-	set theNote to missing value
-	try
-		set theNote to first note of theFolder whose name is noteName
-	on error
-		set theNote to make new note at theFolder with properties {name:noteName, body:""}
-	end try
-
-	set oldBody to body of theNote as text
-	set body of theNote to oldBody & entryText
-end tell
+if [[ ${#PAIRS[@]} -eq 0 ]]; then
+  echo "No entries given" >&2
+  exit 2
+fi
+
+# Text goes in as arguments, never into the script source, so quotes in it are safe.
+/usr/bin/osascript - "${PAIRS[@]}" <<'OSA'
+on run argv
+	set folderName to "Mo"
+	set noteName to "Mo Open Loops"
+
+	set entryText to ""
+	repeat with i from 1 to (count of argv) by 2
+		set entryText to entryText & "- [ ] " & (item i of argv) & " — " & (item (i + 1) of argv) & return
+	end repeat
+
+	tell application "Notes"
+		-- Folder
+		set theFolder to missing value
+		try
+			set theFolder to first folder whose name is folderName
+		on error
+			set theFolder to make new folder with properties {name:folderName}
+		end try
+
+		-- Note
+		set theNote to missing value
+		try
+			set theNote to first note of theFolder whose name is noteName
+		on error
+			set theNote to make new note at theFolder with properties {name:noteName, body:""}
+		end try
+
+		set oldBody to body of theNote as text
+		set body of theNote to oldBody & entryText
+	end tell
+end run
 OSA
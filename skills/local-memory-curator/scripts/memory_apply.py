@@ -4,107 +4,199 @@ import argparse
 import datetime as dt
 import json
 import os
-import subprocess
-from typing import Any, Dict, List, Optional
+import sqlite3
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from memory_dedupe import MEMORY, SimilarityIndex
+from memory_inbox import Inbox
+from memory_metrics import Metrics, export
+from memory_open_loops import SINK_HELP, OpenLoopQueue, flush_open_loops, open_backend
+from memory_state import StateStore
 
 
 DEFAULT_MEMORY_DIR = os.path.expanduser("~/clawd/memory")
 DEFAULT_INBOX_PATH = os.path.join(DEFAULT_MEMORY_DIR, "inbox", "pending.jsonl")
+DEFAULT_STATE_PATH = os.path.join(DEFAULT_MEMORY_DIR, "state.json")
 
 
 def _today_path(memory_dir: str) -> str:
     return os.path.join(memory_dir, dt.date.today().isoformat() + ".md")
 
 
-def _load_pending(inbox_path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(inbox_path):
-        return []
-    items: List[Dict[str, Any]] = []
-    with open(inbox_path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                items.append(json.loads(ln))
-            except Exception:
-                continue
-    return items
-
-
-def _write_pending(inbox_path: str, items: List[Dict[str, Any]]) -> None:
-    os.makedirs(os.path.dirname(inbox_path), exist_ok=True)
-    tmp = inbox_path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        for it in items:
-            f.write(json.dumps(it, ensure_ascii=False) + "\n")
-    os.replace(tmp, inbox_path)
-
-
-def _append_memory(memory_dir: str, item: Dict[str, Any], status: str) -> None:
-    os.makedirs(memory_dir, exist_ok=True)
-    path = _today_path(memory_dir)
-    stamp = dt.datetime.now().strftime("%Y-%m-%d %I:%M %p")
-
+def _format_entry(item: Dict[str, Any], status: str, stamp: str) -> str:
     header = f"\n## {stamp} — {item.get('type','unknown')} ({status})\n"
     body = f"- {item.get('text','').strip()}\n"
     src = f"- source: {item.get('source_session')} {item.get('source_message_id')}\n"
+    return header + body + src
 
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(header)
-        f.write(body)
-        f.write(src)
 
+def _append_memory(memory_dir: str, entries: List[Tuple[Dict[str, Any], str]]) -> None:
+    """Append `(item, status)` entries to today's memory file in one write."""
+    if not entries:
+        return
+    os.makedirs(memory_dir, exist_ok=True)
+    stamp = dt.datetime.now().strftime("%Y-%m-%d %I:%M %p")
+    with open(_today_path(memory_dir), "a", encoding="utf-8") as f:
+        f.write("".join(_format_entry(item, status, stamp) for item, status in entries))
 
-def _append_open_loop(text: str) -> None:
-    # Use the bundled Apple Notes script.
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    sh = os.path.join(script_dir, "apple_notes_open_loops.sh")
-    subprocess.check_call([sh, text])
 
+def _age_seconds(created_at: Any) -> Optional[float]:
+    """Seconds since a candidate's `created_at` (None if it's missing or unparseable)."""
+    if not isinstance(created_at, str):
+        return None
+    try:
+        t = dt.datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=dt.timezone.utc)
+    return max(0.0, (dt.datetime.now(dt.timezone.utc) - t).total_seconds())
 
-def apply_action(item: Dict[str, Any]) -> None:
+
+def _open_loops(item: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """`(queue key, text)` for each add_open_loop action of a candidate."""
     actions = item.get("actions") or []
     if not isinstance(actions, list):
-        return
+        return []
 
-    for a in actions:
+    loops: List[Tuple[str, str]] = []
+    for i, a in enumerate(actions):
         if not isinstance(a, dict):
             continue
         kind = a.get("kind")
         if kind == "add_open_loop":
-            _append_open_loop(item.get("text", ""))
+            loops.append((f"{item.get('id')}:{i}", item.get("text", "")))
+    return loops
+
+
+@dataclass
+class Outcome:
+    id: str
+    action: str
+    # "applied", "missing" (not pending) or "failed" (its actions couldn't be queued; left pending)
+    status: str
+    error: Optional[str] = None
+
+
+def apply_batch(
+    action: str,
+    cand_ids: List[str],
+    memory_dir: str,
+    inbox: Inbox,
+    index: SimilarityIndex,
+    metrics: Optional[Metrics] = None,
+    loops: Optional[OpenLoopQueue] = None,
+) -> List[Outcome]:
+    """Approve or reject many candidates at once.
+
+    One inbox lookup and one removal (each a single locked transaction), one
+    buffered append to today's memory file and one index transaction, however
+    many ids there are. Approved open loops are only queued (see
+    memory_open_loops); writing them out is up to the caller, so a slow or
+    failing Notes write never holds up or fails an approval.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    ids = list(dict.fromkeys(cand_ids))
+    with metrics.timer("inbox_load"):
+        found = inbox.get_many(ids)
+
+    outcomes: List[Outcome] = []
+    done: List[Tuple[Dict[str, Any], str]] = []
+    for cid in ids:
+        item = found.get(cid)
+        if item is None:
+            outcomes.append(Outcome(cid, action, "missing", "not pending"))
+            continue
+        done.append((item, action))
+        outcomes.append(Outcome(cid, action, "applied"))
+
+    if action == "approve" and done:
+        queue = loops if loops is not None else OpenLoopQueue(index.store)
+        try:
+            with metrics.timer("open_loop_enqueue"):
+                queued = queue.enqueue(lp for item, _ in done for lp in _open_loops(item))
+        except sqlite3.Error as e:
+            # Nothing has been removed yet; every candidate stays pending.
+            return [o if o.status != "applied" else Outcome(o.id, action, "failed", str(e)) for o in outcomes]
+        metrics.inc("open_loops_queued", queued)
+
+    applied = [str(item["id"]) for item, _ in done]
+    with metrics.timer("memory_append"):
+        _append_memory(memory_dir, done)
+    with metrics.timer("inbox_remove"):
+        inbox.remove(applied)
+
+    # Approved text joins memory for near-duplicate suppression; a rejected
+    # one may legitimately come up again, so it leaves the index.
+    with metrics.timer("dedupe"):
+        if action == "approve":
+            index.set_kind(applied, MEMORY)
+        else:
+            index.remove(applied)
+
+    metrics.inc("approved" if action == "approve" else "rejected", len(applied))
+    metrics.inc("apply_missing", sum(1 for o in outcomes if o.status == "missing"))
+    metrics.inc("apply_failed", sum(1 for o in outcomes if o.status == "failed"))
+    for item, _ in done:
+        latency = _age_seconds(item.get("created_at"))
+        if latency is not None:
+            metrics.observe("approval_latency", latency)
+    return outcomes
 
 
 def main() -> int:
     ap = argparse.ArgumentParser(description="Approve/reject staged memory items.")
     ap.add_argument("action", choices=["approve", "reject"], help="What to do")
-    ap.add_argument("id", help="Candidate id")
+    ap.add_argument("ids", nargs="*", help="Candidate ids; '-' reads more ids from stdin (whitespace separated)")
+    ap.add_argument("--all-type", metavar="TYPE", help="Every pending candidate of this type (e.g. rule)")
     ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
     ap.add_argument("--inbox", default=DEFAULT_INBOX_PATH)
+    ap.add_argument("--state", default=DEFAULT_STATE_PATH)
+    ap.add_argument("--stats", action="store_true", help="Print stage timers as JSON to stderr")
+    ap.add_argument("--prom-file", help="Also write Prometheus textfile-collector metrics here")
+    ap.add_argument("--open-loops", default="auto", metavar="SINK", help=SINK_HELP)
     args = ap.parse_args()
 
-    pending = _load_pending(args.inbox)
-    keep: List[Dict[str, Any]] = []
-    target: Optional[Dict[str, Any]] = None
-
-    for it in pending:
-        if it.get("id") == args.id and target is None:
-            target = it
+    ids: List[str] = []
+    for cid in args.ids:
+        if cid == "-":
+            ids.extend(sys.stdin.read().split())
         else:
-            keep.append(it)
-
-    if not target:
-        raise SystemExit(f"No such pending candidate: {args.id}")
-
-    status = args.action
-    _append_memory(args.memory_dir, target, status)
-
-    if status == "approve":
-        apply_action(target)
-
-    _write_pending(args.inbox, keep)
-    return 0
+            ids.append(cid)
+
+    metrics = Metrics()
+    with Inbox(args.inbox) as inbox, StateStore(args.state) as store:
+        if args.all_type:
+            ids.extend(str(it["id"]) for it in inbox.items() if it.get("type") == args.all_type and "id" in it)
+        if not ids:
+            if args.all_type:
+                print(f"(no pending {args.all_type} candidates)", file=sys.stderr)
+                return 0
+            ap.error("give at least one id, '-' or --all-type")
+
+        queue = OpenLoopQueue(store)
+        outcomes = apply_batch(args.action, ids, args.memory_dir, inbox, SimilarityIndex(store), metrics, queue)
+        # The approvals are committed; anything this write misses stays queued
+        # for the next flush (the watcher retries on its own).
+        flush_open_loops(queue, open_backend(args.open_loops, args.memory_dir), metrics)
+        if metrics.counters.get("open_loop_write_failures"):
+            print(f"Open loops not written yet, will retry: {queue.status()['last_error']}", file=sys.stderr)
+        export(store, "apply", metrics, args.prom_file)
+
+    for o in outcomes:
+        print(json.dumps(asdict(o), ensure_ascii=False))
+    if args.stats:
+        print(json.dumps(metrics.summary()), file=sys.stderr)
+
+    bad = [o for o in outcomes if o.status != "applied"]
+    for o in bad:
+        if o.status == "missing":
+            print(f"No such pending candidate: {o.id}", file=sys.stderr)
+        else:
+            print(f"Failed to {o.action} {o.id}: {o.error}", file=sys.stderr)
+    return 1 if bad else 0
 
 
 if __name__ == "__main__":
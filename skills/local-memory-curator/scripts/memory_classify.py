@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import functools
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_rules.json")
+
+
+@dataclass
+class Rule:
+    type: str
+    actions: List[str]
+    prefixes: List[str]
+    words: List[str]
+
+
+def load_rules(path: str) -> List[Rule]:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    rules: List[Rule] = []
+    for r in raw.get("rules", []):
+        rules.append(
+            Rule(
+                type=str(r["type"]),
+                actions=[str(a) for a in r.get("actions", [])],
+                prefixes=[str(p).lower() for p in r.get("prefixes", [])],
+                words=[str(w) for w in r.get("words", [])],
+            )
+        )
+    return rules
+
+
+class Classifier:
+    """All rules compiled into one regex with a named group per rule.
+
+    Python's `re` reports the leftmost match, not the highest-priority one, so
+    `match` resumes one character past each hit and keeps the lowest rule index
+    seen. That is a single left-to-right walk that stops as soon as nothing of
+    higher priority can still match.
+    """
+
+    def __init__(self, rules: List[Rule]) -> None:
+        self.rules = rules
+
+        # Branches are laid out in priority order so that, at any one position,
+        # the alternation itself prefers the higher-priority rule. Consecutive
+        # word rules share one `\b(?:...)\b` wrapper.
+        branches: List[str] = []
+        words_run: List[str] = []
+        for i, r in enumerate(rules):
+            if r.prefixes:
+                if words_run:
+                    branches.append(r"\b(?:" + "|".join(words_run) + r")\b")
+                    words_run = []
+                branches.append(f"(?P<p{i}>\\A(?:" + "|".join(re.escape(p) for p in r.prefixes) + "))")
+            if r.words:
+                words_run.append(f"(?P<r{i}>" + "|".join(r.words) + ")")
+        if words_run:
+            branches.append(r"\b(?:" + "|".join(words_run) + r")\b")
+        self._rx = re.compile("|".join(branches)) if branches else None
+
+        # Past position 0 only word rules can match; once the best hit is at or
+        # above the highest-priority word rule there is nothing left to find.
+        word_idx = [i for i, r in enumerate(rules) if r.words]
+        self._floor = word_idx[0] if word_idx else 0
+
+    def match(self, lowered: str) -> int:
+        """Index of the winning rule for already-lowercased text, or -1."""
+        if self._rx is None:
+            return -1
+
+        best = len(self.rules)
+        search = self._rx.search
+        pos = 0
+        while True:
+            m = search(lowered, pos)
+            if m is None:
+                break
+            i = int(m.lastgroup[1:])  # type: ignore[index]
+            if i < best:
+                best = i
+                if best <= self._floor:
+                    break
+            pos = m.start() + 1
+
+        return best if best < len(self.rules) else -1
+
+    def classify(self, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        i = self.match(text.strip().lower())
+        if i < 0:
+            return "unknown", []
+        rule = self.rules[i]
+        return rule.type, [{"kind": a} for a in rule.actions]
+
+
+@functools.lru_cache(maxsize=None)
+def load_classifier(path: str = DEFAULT_RULES_PATH) -> Classifier:
+    return Classifier(load_rules(path))
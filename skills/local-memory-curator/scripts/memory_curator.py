@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import signal
+import sys
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from memory_cursors import CursorSet
+from memory_dedupe import SimilarityIndex
+from memory_metrics import Metrics, export
+from memory_open_loops import SINK_HELP, Flusher, flush_open_loops, open_backend
+from memory_scan import Candidate, CandidateStager
+from memory_state import APPROVAL, SCAN, StateStore
+from memory_tail import Tailer, open_watcher
+from memory_watch_approvals import ApprovalHandler
+
+
+DEFAULT_SESSIONS_GLOB = os.path.expanduser("~/.clawdbot/agents/*/sessions/*.jsonl")
+DEFAULT_MEMORY_DIR = os.path.expanduser("~/clawd/memory")
+DEFAULT_INBOX_PATH = os.path.join(DEFAULT_MEMORY_DIR, "inbox", "pending.jsonl")
+DEFAULT_STATE_PATH = os.path.join(DEFAULT_MEMORY_DIR, "state.json")
+
+# Cursor namespace for the combined tailer.
+CURATOR = "curator"
+
+
+def _initial_cursors(store: StateStore) -> Tuple[CursorSet, Dict[str, CursorSet]]:
+    # First run after using memory_scan / memory_watch_approvals separately:
+    # resume from whichever of the two is further behind, and keep each one's
+    # own cursors as its floor so neither is handed lines it already read.
+    # Seen ids can't be relied on for that: they expire after a week.
+    scan, approval = store.load_cursors(SCAN), store.load_cursors(APPROVAL)
+    return CursorSet.lagging(scan, approval), {SCAN: scan, APPROVAL: approval}
+
+
+class Curator:
+    """Scanner and approval watcher sharing one tailer and one cursor set."""
+
+    def __init__(
+        self,
+        sessions_glob: str,
+        memory_dir: str,
+        inbox_path: str,
+        state_path: str,
+        prom_file: Optional[str] = None,
+        open_loops: str = "auto",
+        background: bool = False,
+    ) -> None:
+        self.store = StateStore(state_path)
+        self.metrics = Metrics()
+        self.prom_file = prom_file
+        # Daemons write approved open loops from a background thread; a single
+        # pass writes them itself before exporting metrics.
+        self.backend = open_backend(open_loops, memory_dir)
+        self.flusher = Flusher(state_path, self.backend) if background and self.backend is not None else None
+        index = SimilarityIndex(self.store)
+        self.approvals = ApprovalHandler(
+            inbox_path, memory_dir, self.store.load_seen(APPROVAL), index, self.metrics, self.flusher
+        )
+        # Lines go to the stager first, so a command can name a candidate staged
+        # earlier in the same pass.
+        self.stager = CandidateStager(
+            inbox_path, self.store.load_seen(SCAN), index, self.approvals.staged_ids, self.metrics
+        )
+        self.tailer = Tailer(sessions_glob, self.store, CURATOR, [self.stager, self.approvals], self.metrics)
+        if not self.tailer.cursors:
+            self.tailer.cursors, self.tailer.floors = _initial_cursors(self.store)
+
+    def pass_once(self, paths: Optional[List[str]] = None) -> None:
+        self.tailer.pass_once(paths)
+        if self.flusher is not None:
+            self.metrics.merge(self.flusher.take_metrics())
+        else:
+            flush_open_loops(self.approvals.loops, self.backend, self.metrics)
+        export(self.store, CURATOR, self.metrics, self.prom_file)
+
+    def take_staged(self) -> List[Candidate]:
+        staged, self.stager.staged = self.stager.staged, []
+        return staged
+
+    def close(self) -> None:
+        try:
+            if self.flusher is not None:
+                self.flusher.close()
+                self.metrics.merge(self.flusher.take_metrics())
+        finally:
+            self.stager.close()
+            self.approvals.close()
+            self.store.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Tail session logs once for both candidate staging and approve/reject/edit commands."
+    )
+    ap.add_argument("--sessions-glob", default=DEFAULT_SESSIONS_GLOB)
+    ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
+    ap.add_argument("--inbox", default=DEFAULT_INBOX_PATH)
+    ap.add_argument("--state", default=DEFAULT_STATE_PATH)
+    ap.add_argument("--once", action="store_true", help="Run one pass and exit")
+    ap.add_argument("--stats", action="store_true", help="Print stage timers and counters as JSON to stderr on exit")
+    ap.add_argument("--prom-file", help="Also write Prometheus textfile-collector metrics here after every pass")
+    ap.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks when inotify isn't available",
+    )
+    ap.add_argument("--open-loops", default="auto", metavar="SINK", help=SINK_HELP)
+    args = ap.parse_args()
+
+    curator = Curator(
+        args.sessions_glob,
+        args.memory_dir,
+        args.inbox,
+        args.state,
+        args.prom_file,
+        open_loops=args.open_loops,
+        background=not args.once,
+    )
+
+    def emit() -> None:
+        for c in curator.take_staged():
+            print(json.dumps(asdict(c), ensure_ascii=False), flush=True)
+
+    def report() -> None:
+        if args.stats:
+            print(json.dumps(curator.metrics.summary()), file=sys.stderr)
+
+    if args.once:
+        try:
+            curator.pass_once()
+            emit()
+        finally:
+            curator.close()
+        report()
+        return 0
+
+    watcher = open_watcher(args.sessions_glob, poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        curator.pass_once()
+        emit()
+        while True:
+            changed = [p for p in watcher.wait() if os.path.exists(p)]
+            if changed:
+                curator.pass_once(changed)
+                emit()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+        curator.close()
+        report()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import dataclasses
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Bytes kept from just before each cursor. They are compared on every pass to
+# make sure the file under the cursor is still the one that was read, and are
+# stored verbatim rather than hashed so the position can be found again after
+# the file is rewritten.
+FINGERPRINT_BYTES = 64
+
+Key = Tuple[int, int]
+
+
+@dataclass
+class Cursor:
+    dev: int
+    ino: int
+    path: str
+    offset: int
+    fingerprint: bytes = b""
+
+    @property
+    def key(self) -> Key:
+        return (self.dev, self.ino)
+
+
+def _verify(path: str, size: int, offset: int, fingerprint: bytes) -> bool:
+    """True if `offset` in `path` still sits right after the bytes we read last time."""
+    if offset == 0:
+        return True
+    if offset > size:
+        return False
+    with open(path, "rb") as f:
+        if fingerprint:
+            f.seek(offset - len(fingerprint))
+            return f.read(len(fingerprint)) == fingerprint
+        # Cursors migrated from path-only state have no fingerprint yet; the
+        # best available check is that they point at a line boundary.
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+def _line_boundary(path: str, offset: int) -> int:
+    """Offset just past the last newline before `offset` in `path` (0 if there is none)."""
+    if offset <= 0:
+        return 0
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # emptied since it was stat'ed
+            return 0
+        with mm:
+            return mm.rfind(b"\n", 0, min(offset, len(mm))) + 1
+
+
+def _relocate(path: str, size: int, fingerprint: bytes) -> Optional[int]:
+    """Offset just past the first copy of `fingerprint` in `path`, if there is one."""
+    if not fingerprint or size < len(fingerprint):
+        return None
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            i = mm.find(fingerprint)
+    return None if i < 0 else i + len(fingerprint)
+
+
+class CursorSet:
+    """Read positions in session logs, keyed by (device, inode).
+
+    `start(path)` says where to resume reading a file and handles the file
+    having changed under the cursor:
+
+    - renamed (within the glob): same inode, so the cursor follows it;
+    - truncated or rewritten in place: the fingerprint no longer matches, so
+      the old position is looked for in the new content, else reading resumes
+      at the last line boundary at or before the old offset (or the new end
+      of the file, if that is sooner). The file is never reread from the top:
+      seen ids expire, and old candidates and commands would be handled
+      again. Lines written into the rewritten part before that boundary are
+      skipped;
+    - replaced by a new inode at the same path (rotation, or an atomic
+      rewrite): the new file is read from wherever the old content ends in it,
+      which is 0 for a fresh file.
+
+    `events` counts how often each case was hit.
+    """
+
+    def __init__(self, cursors: Iterable[Cursor] = (), legacy: Optional[Dict[str, int]] = None) -> None:
+        self._cursors: Dict[Key, Cursor] = {c.key: c for c in cursors}
+        self._by_path: Dict[str, Key] = {c.path: c.key for c in self._cursors.values()}
+        # Path-keyed offsets from before cursors tracked inodes; adopted on first use.
+        self._legacy: Dict[str, int] = dict(legacy or {})
+        self._dirty: Set[Key] = set()
+        self._removed: Set[Key] = set()
+        self._dropped_legacy: Set[str] = set()
+        self.events: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._cursors) + len(self._legacy)
+
+    def _note(self, event: str) -> None:
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def start(self, path: str) -> int:
+        """Offset to resume reading `path` from."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0
+        key = (st.st_dev, st.st_ino)
+        cur = self._cursors.get(key)
+
+        if cur is not None:
+            cur.path = path
+            self._by_path[path] = key
+            if _verify(path, st.st_size, cur.offset, cur.fingerprint):
+                return cur.offset
+            self._note("truncated" if st.st_size < cur.offset else "rewritten")
+            offset = _relocate(path, st.st_size, cur.fingerprint)
+            cur.offset = _line_boundary(path, min(cur.offset, st.st_size)) if offset is None else offset
+            cur.fingerprint = b""
+            self._dirty.add(key)
+            return cur.offset
+
+        offset = 0
+        if path in self._legacy:
+            legacy = self._legacy.pop(path)
+            self._dropped_legacy.add(path)
+            if _verify(path, st.st_size, legacy, b""):
+                offset = legacy
+            else:
+                self._note("truncated")
+                offset = _line_boundary(path, min(legacy, st.st_size))
+        else:
+            prev = self._cursors.get(self._by_path.get(path, (-1, -1)))
+            if prev is not None and prev.offset > 0:
+                if prev.fingerprint and _verify(path, st.st_size, prev.offset, prev.fingerprint):
+                    offset = prev.offset
+                else:
+                    offset = _relocate(path, st.st_size, prev.fingerprint) or 0
+                self._note("replaced" if offset else "rotated")
+
+        self._cursors[key] = Cursor(dev=key[0], ino=key[1], path=path, offset=offset)
+        self._by_path[path] = key
+        self._dirty.add(key)
+        return offset
+
+    def advance(self, path: str, offset: int) -> None:
+        """Record that `path` has been read up to `offset` (after `start(path)`)."""
+        cur = self._cursors.get(self._by_path.get(path, (-1, -1)))
+        if cur is not None and offset > cur.offset:
+            cur.offset = offset
+            self._dirty.add(cur.key)
+
+    def prune(self, live_paths: Iterable[str]) -> None:
+        """Forget files that are no longer among `live_paths` (call after a full pass)."""
+        live: Set[Key] = set()
+        for path in live_paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            live.add((st.st_dev, st.st_ino))
+        for key in [k for k in self._cursors if k not in live]:
+            cur = self._cursors.pop(key)
+            if self._by_path.get(cur.path) == key:
+                del self._by_path[cur.path]
+            self._dirty.discard(key)
+            self._removed.add(key)
+        self._dropped_legacy.update(self._legacy)
+        self._legacy.clear()
+
+    def take_changes(self) -> Tuple[List[Cursor], List[Key], List[str]]:
+        """Cursors to write, cursors to delete and legacy paths to delete since the last call.
+
+        Fingerprints are taken here, once per changed file rather than per line.
+        """
+        changed: List[Cursor] = []
+        for key in sorted(self._dirty):
+            cur = self._cursors[key]
+            cur.fingerprint = b""
+            try:
+                with open(cur.path, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    if (st.st_dev, st.st_ino) == key and 0 < cur.offset <= st.st_size:
+                        n = min(FINGERPRINT_BYTES, cur.offset)
+                        f.seek(cur.offset - n)
+                        cur.fingerprint = f.read(n)
+            except OSError:
+                pass
+            changed.append(cur)
+        removed = sorted(self._removed)
+        dropped = sorted(self._dropped_legacy)
+        self._dirty.clear()
+        self._removed.clear()
+        self._dropped_legacy.clear()
+        return changed, removed, dropped
+
+    @classmethod
+    def lagging(cls, a: "CursorSet", b: "CursorSet") -> "CursorSet":
+        """Per file, whichever of two cursor sets is further behind.
+
+        A file only one of them has read keeps that one's cursor: the other
+        never looked at it, which is no reason to reread it from the start.
+        """
+        legacy = dict(a._legacy)
+        for p, o in b._legacy.items():
+            legacy[p] = min(o, legacy.get(p, o))
+        out = cls(legacy=legacy)
+        for key in a._cursors.keys() | b._cursors.keys():
+            found = [c for c in (a._cursors.get(key), b._cursors.get(key)) if c is not None]
+            cur = dataclasses.replace(min(found, key=lambda c: c.offset))
+            out._cursors[key] = cur
+            out._by_path[cur.path] = key
+            out._dirty.add(key)
+        return out
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from memory_inbox import Inbox
+from memory_state import StateStore
+
+
+DEFAULT_MEMORY_DIR = os.path.expanduser("~/clawd/memory")
+DEFAULT_INBOX_PATH = os.path.join(DEFAULT_MEMORY_DIR, "inbox", "pending.jsonl")
+DEFAULT_STATE_PATH = os.path.join(DEFAULT_MEMORY_DIR, "state.json")
+
+# MinHash over character 4-grams of normalised text, banded for LSH:
+# 8 bands x 4 rows puts a pair with Jaccard 0.8 in a shared bucket ~98% of
+# the time while keeping lookups to 8 indexed probes.
+SHINGLE = 4
+BANDS = 8
+ROWS = 4
+PERMS = BANDS * ROWS
+THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x6D656D6F)
+_PERM_A = [_rng.randrange(1, _PRIME) for _ in range(PERMS)]
+_PERM_B = [_rng.randrange(0, _PRIME) for _ in range(PERMS)]
+_SIG = struct.Struct(f"<{PERMS}Q")
+
+_WORD_RE = re.compile(r"[^\w]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sim_entries (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    sig BLOB NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1,
+    last_source TEXT
+);
+CREATE TABLE IF NOT EXISTS sim_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, id)
+) WITHOUT ROWID;
+"""
+
+# Entry kinds: staged and waiting for a reply, or approved into memory.
+PENDING = "pending"
+MEMORY = "memory"
+
+
+@dataclass
+class Match:
+    id: str
+    kind: str
+    text: str
+    similarity: float
+
+
+def _normalize(text: str) -> str:
+    return _WORD_RE.sub(" ", text.lower()).strip()
+
+
+def signature(text: str) -> Tuple[int, ...]:
+    norm = _normalize(text)
+    if len(norm) <= SHINGLE:
+        shingles = {norm}
+    else:
+        shingles = {norm[i : i + SHINGLE] for i in range(len(norm) - SHINGLE + 1)}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in zip(_PERM_A, _PERM_B))
+
+
+def _buckets(sig: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}Q", *sig[band * ROWS : (band + 1) * ROWS])
+        bucket = int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)
+        out.append((band, bucket))
+    return out
+
+
+def _similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / PERMS
+
+
+class SimilarityIndex:
+    """Persistent MinHash/LSH index of pending candidates and approved memory.
+
+    Lives in the curator's state database. A lookup is 8 primary-key probes
+    plus a signature comparison per colliding entry, independent of corpus
+    size.
+    """
+
+    def __init__(self, store: StateStore, threshold: float = THRESHOLD) -> None:
+        self.store = store
+        self.conn = store.conn
+        self.threshold = threshold
+        self.conn.executescript(SCHEMA)
+        # Candidates staged and hits recorded since the last save: visible to
+        # lookups at once, written by `defer_writes` in the store's next save.
+        self._staged: Dict[str, Tuple[str, str, Tuple[int, ...]]] = {}
+        self._hits: Dict[str, Tuple[int, str]] = {}
+
+    def lookup(self, text: str, sig: Optional[Tuple[int, ...]] = None) -> Optional[Match]:
+        sig = sig or signature(text)
+        probes = _buckets(sig)
+        where = " OR ".join(["(band = ? AND bucket = ?)"] * len(probes))
+        params = [v for p in probes for v in p]
+        ids = [r[0] for r in self.conn.execute(f"SELECT DISTINCT id FROM sim_bands WHERE {where}", params)]
+
+        best: Optional[Match] = None
+        for cid in ids:
+            row = self.conn.execute("SELECT kind, text, sig FROM sim_entries WHERE id = ?", (cid,)).fetchone()
+            if row is None:
+                continue
+            sim = _similarity(sig, _SIG.unpack(row[2]))
+            if sim >= self.threshold and (best is None or sim > best.similarity):
+                best = Match(id=cid, kind=row[0], text=row[1], similarity=sim)
+        for cid, (kind, staged_text, staged_sig) in self._staged.items():
+            sim = _similarity(sig, staged_sig)
+            if sim >= self.threshold and (best is None or sim > best.similarity):
+                best = Match(id=cid, kind=kind, text=staged_text, similarity=sim)
+        return best
+
+    def add(self, cand_id: str, text: str, kind: str = PENDING, sig: Optional[Tuple[int, ...]] = None) -> None:
+        sig = sig or signature(text)
+        with self.store.transaction():
+            _insert(self.conn, cand_id, kind, text, sig)
+
+    def stage(self, cand_id: str, text: str, sig: Optional[Tuple[int, ...]] = None) -> None:
+        """`add` a pending candidate, held back until `defer_writes`."""
+        self._staged[cand_id] = (PENDING, text, sig or signature(text))
+
+    def record_hit(self, cand_id: str, source: str) -> None:
+        """Fold a near-duplicate mention onto an existing entry (written by `defer_writes`)."""
+        n, _ = self._hits.get(cand_id, (0, ""))
+        self._hits[cand_id] = (n + 1, source)
+
+    def defer_writes(self) -> None:
+        """Write staged candidates and hits in the state store's next save().
+
+        That transaction also advances the cursors past the messages they
+        came from, so an entry is never committed for a message that will be
+        read again (which would then fold onto its own entry and be lost).
+        """
+        if not self._staged and not self._hits:
+            return
+        ids, hits = list(self._staged), self._hits
+        self._hits = {}
+
+        def write(conn: sqlite3.Connection) -> None:
+            # Approved, rejected or edited since they were staged: written as they are now.
+            for cid in ids:
+                entry = self._staged.pop(cid, None)
+                if entry is not None:
+                    _insert(conn, cid, *entry)
+            conn.executemany(
+                "UPDATE sim_entries SET hits = hits + ?, last_source = ? WHERE id = ?",
+                [(n, source, cid) for cid, (n, source) in hits.items()],
+            )
+
+        self.store.defer(write)
+
+    def set_kind(self, cand_ids: Iterable[str], kind: str) -> None:
+        cand_ids = list(cand_ids)
+        for c in cand_ids:
+            if c in self._staged:
+                self._staged[c] = (kind,) + self._staged[c][1:]
+        with self.store.transaction():
+            self.conn.executemany("UPDATE sim_entries SET kind = ? WHERE id = ?", [(kind, c) for c in cand_ids])
+
+    def update_text(self, cand_id: str, text: str) -> None:
+        if cand_id in self._staged:
+            self._staged[cand_id] = (self._staged[cand_id][0], text, signature(text))
+            return
+        row = self.conn.execute("SELECT kind FROM sim_entries WHERE id = ?", (cand_id,)).fetchone()
+        self.add(cand_id, text, kind=row[0] if row else PENDING)
+
+    def remove(self, cand_ids: Iterable[str]) -> None:
+        rows = [(c,) for c in cand_ids]
+        for (c,) in rows:
+            self._staged.pop(c, None)
+        with self.store.transaction():
+            self.conn.executemany("DELETE FROM sim_bands WHERE id = ?", rows)
+            self.conn.executemany("DELETE FROM sim_entries WHERE id = ?", rows)
+
+    def clear(self) -> None:
+        self._staged.clear()
+        self._hits.clear()
+        with self.store.transaction():
+            self.conn.execute("DELETE FROM sim_bands")
+            self.conn.execute("DELETE FROM sim_entries")
+
+
+def _insert(conn: sqlite3.Connection, cand_id: str, kind: str, text: str, sig: Tuple[int, ...]) -> None:
+    conn.execute("DELETE FROM sim_bands WHERE id = ?", (cand_id,))
+    conn.execute(
+        "INSERT OR REPLACE INTO sim_entries (id, kind, text, sig) VALUES (?, ?, ?, ?)",
+        (cand_id, kind, text, _SIG.pack(*sig)),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO sim_bands (band, bucket, id) VALUES (?, ?, ?)",
+        [(band, bucket, cand_id) for band, bucket in _buckets(sig)],
+    )
+
+
+_ENTRY_HEADER_RE = re.compile(r"^## .* — \S+ \((approve|reject)\)$")
+
+
+def iter_approved_entries(memory_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yield `(cand_id, text)` for approved entries in the dated memory files."""
+    for path in sorted(glob.glob(os.path.join(memory_dir, "*.md"))):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        i = 0
+        while i < len(lines):
+            m = _ENTRY_HEADER_RE.match(lines[i])
+            i += 1
+            if not m:
+                continue
+            # Entry text can span lines; the source line closes the entry.
+            body: List[str] = []
+            while i < len(lines) and not lines[i].startswith(("- source: ", "## ")):
+                body.append(lines[i])
+                i += 1
+            if m.group(1) != "approve" or i >= len(lines) or not lines[i].startswith("- source: "):
+                continue
+            text = "\n".join(body).strip()
+            if text.startswith("- "):
+                text = text[2:]
+            yield f"cand_{lines[i].split()[-1]}", text
+
+
+def rebuild(index: SimilarityIndex, inbox_path: str, memory_dir: str) -> int:
+    index.clear()
+    n = 0
+    for cand_id, text in iter_approved_entries(memory_dir):
+        index.add(cand_id, text, kind=MEMORY)
+        n += 1
+    if os.path.exists(inbox_path):
+        with Inbox(inbox_path) as inbox:
+            for obj in inbox.items():
+                if isinstance(obj.get("id"), str) and isinstance(obj.get("text"), str):
+                    index.add(obj["id"], obj["text"], kind=PENDING)
+                    n += 1
+    return n
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Near-duplicate index over pending candidates and approved memory.")
+    ap.add_argument("command", choices=["rebuild", "check"])
+    ap.add_argument("text", nargs="?", help="Text to look up (check)")
+    ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
+    ap.add_argument("--inbox", default=DEFAULT_INBOX_PATH)
+    ap.add_argument("--state", default=DEFAULT_STATE_PATH)
+    args = ap.parse_args()
+
+    with StateStore(args.state) as store:
+        index = SimilarityIndex(store)
+        if args.command == "rebuild":
+            print(json.dumps({"indexed": rebuild(index, args.inbox, args.memory_dir)}))
+            return 0
+
+        if not args.text:
+            ap.error("check needs a text argument")
+        m = index.lookup(args.text)
+        print(json.dumps(m.__dict__ if m else None, ensure_ascii=False))
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
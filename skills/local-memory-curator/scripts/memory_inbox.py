@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+DEFAULT_INBOX_PATH = os.path.expanduser("~/clawd/memory/inbox/pending.jsonl")
+
+# pending.jsonl stays the record of what's pending, readable by anything that
+# reads JSONL. A sidecar SQLite index maps candidate id -> (offset, length) so
+# lookups, edits and removals touch one line instead of the whole file:
+#
+# - removed candidates are blanked in place (JSONL readers skip blank lines);
+# - an edit that fits the old line is written over it, padded with spaces,
+#   otherwise the old line is blanked and the new one appended;
+# - once blanked bytes reach COMPACT_MIN_BYTES and outweigh live records, the
+#   file is rewritten without them.
+#
+# Writers take the index database's write lock for the duration of a change,
+# so scan appends, apply removals and compaction never interleave. Changes made
+# to pending.jsonl by anything else are picked up by comparing its identity,
+# size and mtime with what the index last saw.
+COMPACT_MIN_BYTES = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_offset ON entries (offset);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_STAT_KEYS = ("dev", "ino", "size", "mtime_ns")
+
+
+def index_path_for(inbox_path: str) -> str:
+    """`pending.jsonl` -> `pending.idx.sqlite3`."""
+    return os.path.splitext(inbox_path)[0] + ".idx.sqlite3"
+
+
+def _encode(item: Dict[str, Any]) -> bytes:
+    return json.dumps(item, ensure_ascii=False).encode("utf-8")
+
+
+class Inbox:
+    def __init__(self, inbox_path: str) -> None:
+        self.path = inbox_path
+        self.index_path = index_path_for(inbox_path)
+        os.makedirs(os.path.dirname(os.path.abspath(inbox_path)), exist_ok=True)
+
+        self.conn = sqlite3.connect(self.index_path, timeout=10.0, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Inbox":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._sync()
+            yield
+            self._put_stat()
+        except BaseException:
+            # The file may already have changed; the rolled-back stat makes
+            # the next call re-index it.
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _meta(self, key: str, default: int = 0) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else default
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _stat(self) -> Optional[Tuple[int, int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _put_stat(self) -> None:
+        st = self._stat() or (-1, -1, 0, -1)
+        for k, v in zip(_STAT_KEYS, st):
+            self._set_meta(k, v)
+
+    def _sync(self) -> None:
+        st = self._stat()
+        known = tuple(self._meta(k, -1) for k in _STAT_KEYS)
+        if st == known or (st is None and known[2] <= 0):
+            return
+        if st is not None and st[:2] == known[:2] and st[2] >= known[2] >= 0:
+            # Same file, only grown: index the new tail.
+            self._index_from(known[2])
+        else:
+            self._reindex()
+
+    def reindex(self) -> None:
+        with self._locked():
+            self._reindex()
+
+    def _reindex(self) -> None:
+        self.conn.execute("DELETE FROM entries")
+        self._set_meta("dead", 0)
+        self._index_from(0)
+
+    def _index_from(self, start: int) -> None:
+        if not os.path.exists(self.path):
+            return
+        dead = 0
+        rows: List[Tuple[str, int, int]] = []
+        known: Set[str] = set()
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            pos = start
+            for ln in f:
+                length = len(ln.rstrip(b"\n"))
+                obj: Any = None
+                if ln.strip():
+                    try:
+                        obj = json.loads(ln)
+                    except ValueError:
+                        pass
+                cid = obj.get("id") if isinstance(obj, dict) else None
+                if isinstance(cid, str) and cid not in known and not self._has(cid):
+                    rows.append((cid, pos, length))
+                    known.add(cid)
+                else:
+                    # Blank, unparseable, or a repeat of an id already
+                    # pending: nothing points here, compaction drops it.
+                    dead += length
+                pos += len(ln)
+        self.conn.executemany("INSERT INTO entries (id, offset, length) VALUES (?, ?, ?)", rows)
+        self._set_meta("dead", self._meta("dead") + dead)
+
+    def _has(self, cand_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM entries WHERE id = ?", (cand_id,)).fetchone() is not None
+
+    def _read(self, f: Any, offset: int, length: int) -> Optional[Dict[str, Any]]:
+        f.seek(offset)
+        try:
+            obj = json.loads(f.read(length))
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+    def _get(self, cand_id: str) -> Optional[Tuple[Dict[str, Any], int, int]]:
+        for _ in range(2):
+            row = self.conn.execute("SELECT offset, length FROM entries WHERE id = ?", (cand_id,)).fetchone()
+            if row is None:
+                return None
+            with open(self.path, "rb") as f:
+                obj = self._read(f, row[0], row[1])
+            if obj is not None and obj.get("id") == cand_id:
+                return obj, row[0], row[1]
+            # The file changed in a way the stat check couldn't see.
+            self._reindex()
+        return None
+
+    def _blank(self, f: Any, offset: int, length: int) -> None:
+        f.seek(offset)
+        f.write(b" " * length)
+        self._set_meta("dead", self._meta("dead") + length)
+
+    def _append(self, f: Any, cand_id: str, line: bytes) -> None:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(line + b"\n")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (id, offset, length) VALUES (?, ?, ?)", (cand_id, offset, len(line))
+        )
+
+    def _open_rw(self) -> Any:
+        if not os.path.exists(self.path):
+            open(self.path, "ab").close()
+        return open(self.path, "r+b")
+
+    def get(self, cand_id: str) -> Optional[Dict[str, Any]]:
+        with self._locked():
+            hit = self._get(cand_id)
+        return hit[0] if hit else None
+
+    def get_many(self, cand_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Point lookups for several ids under one lock; missing ids are left out."""
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._locked():
+            for cid in cand_ids:
+                hit = self._get(cid)
+                if hit is not None:
+                    out[cid] = hit[0]
+        return out
+
+    def __contains__(self, cand_id: object) -> bool:
+        with self._locked():
+            return isinstance(cand_id, str) and self._has(cand_id)
+
+    def ids(self) -> Set[str]:
+        with self._locked():
+            return {r[0] for r in self.conn.execute("SELECT id FROM entries")}
+
+    def __len__(self) -> int:
+        with self._locked():
+            return int(self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def items(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Pending candidates in file (staging) order."""
+        with self._locked():
+            rows = self.conn.execute(
+                "SELECT offset, length FROM entries ORDER BY offset LIMIT ?", (-1 if limit is None else limit,)
+            ).fetchall()
+            if not rows:
+                return []
+            out: List[Dict[str, Any]] = []
+            with open(self.path, "rb") as f:
+                for offset, length in rows:
+                    obj = self._read(f, offset, length)
+                    if obj is not None:
+                        out.append(obj)
+            return out
+
+    def iter_items(self, page: int = 256) -> Iterator[Dict[str, Any]]:
+        """Pending candidates in file order, read `page` index rows at a time.
+
+        The lock is held per page, not while the caller consumes the stream,
+        so stopping early reads (and blocks writers for) only what was used.
+        """
+        after = -1
+        while True:
+            with self._locked():
+                rows = self.conn.execute(
+                    "SELECT offset, length FROM entries WHERE offset > ? ORDER BY offset LIMIT ?", (after, page)
+                ).fetchall()
+                objs: List[Dict[str, Any]] = []
+                if rows:
+                    with open(self.path, "rb") as f:
+                        for offset, length in rows:
+                            obj = self._read(f, offset, length)
+                            if obj is not None:
+                                objs.append(obj)
+            yield from objs
+            if len(rows) < page:
+                return
+            after = rows[-1][0]
+
+    def append(self, items: Iterable[Dict[str, Any]]) -> None:
+        with self._locked():
+            with self._open_rw() as f:
+                for it in items:
+                    cid = str(it.get("id"))
+                    old = self.conn.execute("SELECT offset, length FROM entries WHERE id = ?", (cid,)).fetchone()
+                    if old is not None:
+                        self._blank(f, old[0], old[1])
+                    self._append(f, cid, _encode(it))
+
+    def update(self, cand_id: str, changes: Dict[str, Any]) -> bool:
+        """Merge `changes` into a pending candidate; False if there is no such candidate."""
+        with self._locked():
+            hit = self._get(cand_id)
+            if hit is None:
+                return False
+            obj, offset, length = hit
+            obj.update(changes)
+            line = _encode(obj)
+            with self._open_rw() as f:
+                if len(line) <= length:
+                    f.seek(offset)
+                    f.write(line + b" " * (length - len(line)))
+                else:
+                    self._blank(f, offset, length)
+                    self._append(f, cand_id, line)
+        self._maybe_compact()
+        return True
+
+    def remove(self, cand_ids: Iterable[str]) -> List[str]:
+        """Tombstone candidates; returns the ids that were pending."""
+        removed: List[str] = []
+        with self._locked():
+            with self._open_rw() as f:
+                for cid in cand_ids:
+                    row = self.conn.execute("SELECT offset, length FROM entries WHERE id = ?", (cid,)).fetchone()
+                    if row is None:
+                        continue
+                    self._blank(f, row[0], row[1])
+                    self.conn.execute("DELETE FROM entries WHERE id = ?", (cid,))
+                    removed.append(cid)
+        self._maybe_compact()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._locked():
+            live, n = self.conn.execute("SELECT COALESCE(SUM(length), 0), COUNT(*) FROM entries").fetchone()
+            return {"pending": int(n), "live_bytes": int(live), "dead_bytes": self._meta("dead")}
+
+    def _maybe_compact(self) -> None:
+        s = self.stats()
+        if s["dead_bytes"] >= COMPACT_MIN_BYTES and s["dead_bytes"] >= s["live_bytes"]:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite pending.jsonl with only live records, in their current order."""
+        with self._locked():
+            rows = self.conn.execute("SELECT id, offset, length FROM entries ORDER BY offset").fetchall()
+            if not os.path.exists(self.path):
+                return
+            tmp = self.path + ".tmp"
+            moved: List[Tuple[int, int, str]] = []
+            with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+                for cid, offset, length in rows:
+                    src.seek(offset)
+                    line = src.read(length).rstrip(b" ")
+                    moved.append((dst.tell(), len(line), cid))
+                    dst.write(line + b"\n")
+            os.replace(tmp, self.path)
+            self.conn.executemany("UPDATE entries SET offset = ?, length = ? WHERE id = ?", moved)
+            self._set_meta("dead", 0)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect or maintain the pending-candidate inbox and its id index.")
+    ap.add_argument("command", choices=["stats", "get", "compact", "reindex"])
+    ap.add_argument("id", nargs="?", help="Candidate id (get)")
+    ap.add_argument("--inbox", default=DEFAULT_INBOX_PATH)
+    args = ap.parse_args()
+
+    with Inbox(args.inbox) as inbox:
+        if args.command == "get":
+            if not args.id:
+                ap.error("get needs a candidate id")
+            item = inbox.get(args.id)
+            if item is None:
+                raise SystemExit(f"No such pending candidate: {args.id}")
+            print(json.dumps(item, ensure_ascii=False, indent=2))
+            return 0
+        if args.command == "compact":
+            inbox.compact()
+        elif args.command == "reindex":
+            inbox.reindex()
+        print(json.dumps(inbox.stats()))
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
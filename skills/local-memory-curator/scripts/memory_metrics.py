@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import contextlib
+import copy
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from memory_state import StateStore
+
+
+# Candidate created_at -> applied, in seconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (60, 300, 900, 3600, 3 * 3600, 12 * 3600, 86400, 3 * 86400, 7 * 86400)
+
+PREFIX = "memory_curator"
+_KV_PREFIX = "metrics:"
+
+
+@dataclass
+class Histogram:
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    sum: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_state(cls, raw: Dict[str, Any]) -> "Histogram":
+        h = cls(buckets=tuple(raw.get("buckets") or LATENCY_BUCKETS))
+        counts = raw.get("counts") or []
+        if len(counts) == len(h.counts):
+            h.counts = [int(n) for n in counts]
+        h.sum = float(raw.get("sum", 0.0))
+        h.count = int(raw.get("count", 0))
+        return h
+
+
+class Metrics:
+    """Stage timers, counters and histograms for one script run.
+
+    Hot loops add to these in bulk (per file or per pass), not per line.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = time.time()
+        self._exported: Optional["Metrics"] = None
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        if n:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float) -> None:
+        self.histograms.setdefault(name, Histogram()).observe(value)
+
+    def merge(self, other: "Metrics") -> None:
+        for stage, secs in other.seconds.items():
+            self.add_time(stage, secs, other.calls.get(stage, 0))
+        for name, n in other.counters.items():
+            self.inc(name, n)
+        for name, h in other.histograms.items():
+            self.histograms.setdefault(name, Histogram(buckets=h.buckets)).merge(h)
+
+    def _delta(self) -> "Metrics":
+        """What accumulated since the last export."""
+        delta = copy.deepcopy(self)
+        prev = self._exported
+        if prev is not None:
+            for stage, secs in prev.seconds.items():
+                delta.add_time(stage, -secs, -prev.calls.get(stage, 0))
+            for name, n in prev.counters.items():
+                delta.inc(name, -n)
+            for name, h in prev.histograms.items():
+                dh = delta.histograms[name]
+                dh.counts = [a - b for a, b in zip(dh.counts, h.counts)]
+                dh.sum -= h.sum
+                dh.count -= h.count
+        self._exported = copy.deepcopy(self)
+        self._exported._exported = None
+        return delta
+
+    def summary(self) -> Dict[str, Any]:
+        stages = {
+            s: {"seconds": round(self.seconds[s], 6), "calls": self.calls.get(s, 0)} for s in sorted(self.seconds)
+        }
+        hists: Dict[str, Any] = {}
+        for name, h in sorted(self.histograms.items()):
+            hists[name] = {
+                "count": h.count,
+                "mean": h.sum / h.count if h.count else None,
+                "buckets": {("+Inf" if i == len(h.buckets) else _num(h.buckets[i])): n for i, n in enumerate(h.counts)},
+            }
+        return {
+            "elapsed_s": round(time.time() - self.started, 6),
+            "stages": stages,
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": hists,
+        }
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def export(store: StateStore, script: str, metrics: Metrics, prom_file: Optional[str] = None) -> None:
+    """Fold this run's new numbers into the totals kept in the state store.
+
+    Totals are cumulative across runs (so they can be exposed as Prometheus
+    counters even though most runs are short-lived), and every script's totals
+    are written to `prom_file` when given.
+    """
+    delta = metrics._delta()
+    key = _KV_PREFIX + script
+    with store.transaction():
+        totals = _from_state(store.get(key) or {})
+        totals.merge(delta)
+        state = _to_state(totals)
+        state["last_run_timestamp"] = time.time()
+        state["last_run_duration"] = time.time() - metrics.started
+        store.put(key, state)
+    if prom_file:
+        write_textfile(store, prom_file)
+
+
+def _to_state(m: Metrics) -> Dict[str, Any]:
+    return {
+        "seconds": m.seconds,
+        "calls": m.calls,
+        "counters": m.counters,
+        "histograms": {k: h.to_state() for k, h in m.histograms.items()},
+    }
+
+
+def _from_state(raw: Dict[str, Any]) -> Metrics:
+    m = Metrics()
+    m.seconds = {k: float(v) for k, v in (raw.get("seconds") or {}).items()}
+    m.calls = {k: int(v) for k, v in (raw.get("calls") or {}).items()}
+    m.counters = {k: int(v) for k, v in (raw.get("counters") or {}).items()}
+    m.histograms = {k: Histogram.from_state(v) for k, v in (raw.get("histograms") or {}).items()}
+    return m
+
+
+def render_textfile(store: StateStore) -> str:
+    """Prometheus text exposition of every script's totals."""
+    per_script = {k[len(_KV_PREFIX) :]: v for k, v in store.items(_KV_PREFIX)}
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(name: str, kind: str, help_text: str, sample: str) -> None:
+        families.setdefault(name, (kind, help_text, []))[2].append(sample)
+
+    for script, raw in sorted(per_script.items()):
+        m = _from_state(raw)
+        lbl = f'script="{script}"'
+        for stage in sorted(m.seconds):
+            add(f"{PREFIX}_stage_seconds_total", "counter", "Time spent per pipeline stage.",
+                f'{PREFIX}_stage_seconds_total{{{lbl},stage="{stage}"}} {m.seconds[stage]:.6f}')
+            add(f"{PREFIX}_stage_calls_total", "counter", "Timed calls per pipeline stage.",
+                f'{PREFIX}_stage_calls_total{{{lbl},stage="{stage}"}} {m.calls.get(stage, 0)}')
+        for name in sorted(m.counters):
+            add(f"{PREFIX}_{name}_total", "counter", f"Total {name.replace('_', ' ')}.",
+                f"{PREFIX}_{name}_total{{{lbl}}} {m.counters[name]}")
+        for name, h in sorted(m.histograms.items()):
+            metric = f"{PREFIX}_{name}_seconds"
+            cum = 0
+            for i, n in enumerate(h.counts):
+                cum += n
+                le = "+Inf" if i == len(h.buckets) else _num(h.buckets[i])
+                add(metric, "histogram", f"{name.replace('_', ' ').capitalize()} in seconds.",
+                    f'{metric}_bucket{{{lbl},le="{le}"}} {cum}')
+            add(metric, "histogram", "", f"{metric}_sum{{{lbl}}} {h.sum:.6f}")
+            add(metric, "histogram", "", f"{metric}_count{{{lbl}}} {h.count}")
+        if "last_run_timestamp" in raw:
+            add(f"{PREFIX}_last_run_timestamp_seconds", "gauge", "When the script last exported metrics.",
+                f"{PREFIX}_last_run_timestamp_seconds{{{lbl}}} {float(raw['last_run_timestamp']):.3f}")
+            add(f"{PREFIX}_last_run_duration_seconds", "gauge", "How long that run had been going.",
+                f"{PREFIX}_last_run_duration_seconds{{{lbl}}} {float(raw.get('last_run_duration', 0.0)):.6f}")
+
+    out: List[str] = []
+    for name, (kind, help_text, samples) in families.items():
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(samples)
+    return "\n".join(out) + "\n"
+
+
+def write_textfile(store: StateStore, path: str) -> None:
+    # The node exporter may read at any moment; never let it see a partial file.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_textfile(store))
+    os.replace(tmp, path)
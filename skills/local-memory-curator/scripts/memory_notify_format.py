@@ -1,28 +1,29 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
+import datetime as dt
+import itertools
 import os
-from typing import Any, Dict, List
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from memory_inbox import Inbox
+from memory_state import StateStore
 
 
 DEFAULT_INBOX_PATH = os.path.expanduser("~/clawd/memory/inbox/pending.jsonl")
+DEFAULT_STATE_PATH = os.path.expanduser("~/clawd/memory/state.json")
 
+# The numbers shown in recent digests, so replies like "approve 1-5" can be
+# resolved by the approval watcher. A reply is matched to the digest that was
+# the latest when it was sent, so answering (or rereading) an older one never
+# acts on the numbers of a newer one.
+DIGEST_KEY = "digest"
+DIGEST_HISTORY = 20
+DIGEST_TEXT_CHARS = 200
 
-def _load_pending(inbox_path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(inbox_path):
-        return []
-    items: List[Dict[str, Any]] = []
-    with open(inbox_path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                items.append(json.loads(ln))
-            except Exception:
-                continue
-    return items
+_SELECTION_RE = re.compile(r"^(?:all|\d+(?:\s*-\s*\d+)?(?:\s*(?:,|\s)\s*\d+(?:\s*-\s*\d+)?)*)$", re.IGNORECASE)
 
 
 def _format_candidate(item: Dict[str, Any]) -> str:
@@ -52,26 +53,160 @@ def _format_candidate(item: Dict[str, Any]) -> str:
     )
 
 
+def parse_selection(spec: str, numbers: List[int]) -> Optional[List[int]]:
+    """`"1-3, 5"` -> [1, 2, 3, 5]; `"all"` -> every number in `numbers`; None if `spec` isn't a selection.
+
+    Ranges are cut to the span of `numbers`.
+    """
+    spec = spec.strip()
+    if not _SELECTION_RE.match(spec):
+        return None
+    if spec.lower() == "all":
+        return sorted(numbers)
+    out: List[int] = []
+    if not numbers:
+        return out
+    # Nothing outside the digest can match, so `1-999999999` costs no more than `all`.
+    first, last = min(numbers), max(numbers)
+    for part in re.split(r"[,\s]+", re.sub(r"\s*-\s*", "-", spec)):
+        a, _, b = part.partition("-")
+        lo, hi = sorted((int(a), int(b or a)))
+        out.extend(range(max(lo, first), min(hi, last) + 1))
+    return list(dict.fromkeys(out))
+
+
+def parse_timestamp(ts: Any) -> Optional[float]:
+    """Seconds since the epoch for an ISO 8601 string or epoch seconds/milliseconds; None if neither."""
+    if isinstance(ts, str):
+        try:
+            ts = float(ts)
+        except ValueError:
+            try:
+                t = dt.datetime.fromisoformat(ts.strip().replace("Z", "+00:00"))
+            except ValueError:
+                return None
+            if t.tzinfo is None:
+                t = t.replace(tzinfo=dt.timezone.utc)
+            return t.timestamp()
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool) and ts > 0:
+        return ts / 1000.0 if ts > 1e11 else float(ts)
+    return None
+
+
+def _load_digests(store: StateStore) -> List[Dict[str, Any]]:
+    raw = store.get(DIGEST_KEY) or {}
+    if not isinstance(raw, dict):
+        return []
+    # Older versions kept just the last digest: {"ids": [...], "created_at": t}.
+    digests = raw.get("digests") if "digests" in raw else [raw]
+    if not isinstance(digests, list):
+        return []
+    return [d for d in digests if isinstance(d, dict) and isinstance(d.get("ids"), list)]
+
+
+def load_digest(store: StateStore, sent_at: Optional[float] = None) -> Dict[int, str]:
+    """Number -> candidate id, as shown in the last digest sent before `sent_at`.
+
+    Without `sent_at`, the last digest. Empty if no digest on record is older
+    than `sent_at`.
+    """
+    found: Optional[Dict[str, Any]] = None
+    for d in _load_digests(store):  # oldest first
+        created = d.get("created_at")
+        if sent_at is None or (isinstance(created, (int, float)) and created <= sent_at):
+            found = d
+    if found is None:
+        return {}
+    return {i + 1: cid for i, cid in enumerate(found["ids"]) if isinstance(cid, str)}
+
+
+def _short(text: str, limit: int = DIGEST_TEXT_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def _grouped(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """`items` with each type's candidates together, types in order of first appearance."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for it in items:
+        groups.setdefault(str(it.get("type", "unknown")), []).append(it)
+    return [it for group in groups.values() for it in group]
+
+
+def format_digest(items: List[Dict[str, Any]], total: int) -> str:
+    """One message covering `items` (already grouped), numbered from 1 in order."""
+    lines = [f"MEMORY CANDIDATES 🧬 ({len(items)} of {total} pending)"]
+    for n, it in enumerate(items, 1):
+        ctype = str(it.get("type", "unknown"))
+        if n == 1 or ctype != str(items[n - 2].get("type", "unknown")):
+            lines += ["", f"{ctype}:"]
+        lines.append(f"{n}. {_short(it.get('text') or '')}")
+    last = len(items)
+    lines += [
+        "",
+        "Reply with e.g.:",
+        f"- approve {'1' if last == 1 else f'1-{last}'}" + (" / approve all" if last > 2 else ""),
+        f"- reject {'1' if last < 3 else '2,3'}",
+        "- edit 1: <new text>",
+    ]
+    return "\n".join(lines)
+
+
+def digest(inbox: Inbox, store: StateStore, limit: int, ctype: Optional[str] = None) -> str:
+    """Format the first `limit` pending candidates (of `ctype`, if given) and remember their numbers.
+
+    The inbox is streamed and reading stops once `limit` candidates are found.
+    """
+    matches = (it for it in inbox.iter_items() if ctype is None or it.get("type") == ctype)
+    items = _grouped(list(itertools.islice(matches, limit)))
+    if not items:
+        return f"(no pending {ctype} candidates)" if ctype else "(no pending candidates)"
+    digests = _load_digests(store)[-(DIGEST_HISTORY - 1) :]
+    digests.append({"ids": [str(it.get("id")) for it in items], "created_at": time.time()})
+    store.put(DIGEST_KEY, {"digests": digests})
+    return format_digest(items, len(inbox))
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Format a staged memory candidate as a WhatsApp message.")
     ap.add_argument("id", nargs="?", help="Candidate id to format (defaults to first pending)")
     ap.add_argument("--inbox", default=DEFAULT_INBOX_PATH)
+    ap.add_argument(
+        "--digest",
+        type=int,
+        nargs="?",
+        const=10,
+        metavar="N",
+        help="One numbered message for the first N pending candidates (default 10), answerable with 'approve 1-5'",
+    )
+    ap.add_argument("--type", help="With --digest: only candidates of this type")
+    ap.add_argument("--state", default=DEFAULT_STATE_PATH, help="Where --digest records its numbering")
     args = ap.parse_args()
 
-    pending = _load_pending(args.inbox)
-    if not pending:
-        print("(no pending candidates)")
+    if args.digest is not None:
+        if args.id:
+            ap.error("--digest takes no candidate id")
+        with Inbox(args.inbox) as inbox, StateStore(args.state) as store:
+            print(digest(inbox, store, max(1, args.digest), args.type))
         return 0
 
-    if args.id:
-        for it in pending:
-            if it.get("id") == args.id:
-                print(_format_candidate(it))
-                return 0
-        raise SystemExit(f"No such candidate: {args.id}")
-
-    print(_format_candidate(pending[0]))
-    return 0
+    with Inbox(args.inbox) as inbox:
+        if args.id:
+            item = inbox.get(args.id)
+            if item is None:
+                if not len(inbox):
+                    print("(no pending candidates)")
+                    return 0
+                raise SystemExit(f"No such candidate: {args.id}")
+            print(_format_candidate(item))
+            return 0
+
+        first = inbox.items(limit=1)
+        if not first:
+            print("(no pending candidates)")
+            return 0
+        print(_format_candidate(first[0]))
+        return 0
 
 
 if __name__ == "__main__":
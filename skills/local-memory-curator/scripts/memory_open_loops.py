@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime as dt
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Protocol, Tuple
+
+from memory_metrics import Metrics
+from memory_state import StateStore
+
+
+DEFAULT_MEMORY_DIR = os.path.expanduser("~/clawd/memory")
+DEFAULT_STATE_PATH = os.path.join(DEFAULT_MEMORY_DIR, "state.json")
+OPEN_LOOPS_FILE = "open_loops.md"
+
+# Approving a candidate only queues its open loops here (one short insert in
+# the state database). A flusher later claims everything due, hands it to the
+# backend in one write and deletes it; if the write fails the rows stay queued
+# and are retried with exponential backoff. Claims are leases, so a flusher
+# that dies mid-write gives its rows back after LEASE_S, and two flushers
+# (say the watcher and a one-off memory_apply) never write the same row.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS open_loops (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+"""
+
+LEASE_S = 120.0
+RETRY_BASE_S = 5.0
+RETRY_MAX_S = 3600.0
+BATCH_MAX = 200
+
+SINK_HELP = (
+    "Where approved open loops are written: notes, file (open_loops.md in the memory dir), file:PATH"
+    " or none (default: notes on macOS, file elsewhere)"
+)
+
+
+@dataclass
+class OpenLoop:
+    key: str
+    text: str
+    stamp: str
+
+
+def _stamp() -> str:
+    return dt.datetime.now().strftime("%Y-%m-%d %I:%M %p")
+
+
+class OpenLoopQueue:
+    """Durable queue of open loops waiting to be written, in the state database."""
+
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+        self.conn = store.conn
+        self.conn.executescript(SCHEMA)
+
+    def enqueue(self, loops: Iterable[Tuple[str, str]]) -> int:
+        """Queue `(key, text)` pairs; a key already queued is left alone. Returns how many were added."""
+        now = time.time()
+        stamp = _stamp()
+        with self.store.transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO open_loops (key, text, stamp, queued_at) VALUES (?, ?, ?, ?)",
+                [(key, text, stamp, now) for key, text in loops],
+            )
+            return self.conn.total_changes - before
+
+    def claim(self, limit: int = BATCH_MAX) -> List[OpenLoop]:
+        now = time.time()
+        with self.store.transaction():
+            rows = self.conn.execute(
+                "SELECT key, text, stamp FROM open_loops WHERE next_attempt <= ? AND claimed_until <= ?"
+                " ORDER BY queued_at, key LIMIT ?",
+                (now, now, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE open_loops SET claimed_until = ? WHERE key = ?", [(now + LEASE_S, r[0]) for r in rows]
+            )
+        return [OpenLoop(*r) for r in rows]
+
+    def done(self, loops: List[OpenLoop]) -> None:
+        with self.store.transaction():
+            self.conn.executemany("DELETE FROM open_loops WHERE key = ?", [(lp.key,) for lp in loops])
+
+    def failed(self, loops: List[OpenLoop], error: str) -> None:
+        now = time.time()
+        with self.store.transaction():
+            for lp in loops:
+                row = self.conn.execute("SELECT attempts FROM open_loops WHERE key = ?", (lp.key,)).fetchone()
+                attempts = (row[0] if row else 0) + 1
+                delay = min(RETRY_BASE_S * 2 ** (attempts - 1), RETRY_MAX_S)
+                self.conn.execute(
+                    "UPDATE open_loops SET attempts = ?, next_attempt = ?, claimed_until = 0, last_error = ?"
+                    " WHERE key = ?",
+                    (attempts, now + delay, error, lp.key),
+                )
+
+    def next_due(self) -> Optional[float]:
+        """When the earliest queued loop can next be tried (None if the queue is empty)."""
+        row = self.conn.execute("SELECT MIN(MAX(next_attempt, claimed_until)) FROM open_loops").fetchone()
+        return None if row[0] is None else float(row[0])
+
+    def status(self) -> Dict[str, object]:
+        n, failing = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0) FROM open_loops"
+        ).fetchone()
+        row = self.conn.execute(
+            "SELECT last_error FROM open_loops WHERE last_error IS NOT NULL ORDER BY next_attempt DESC LIMIT 1"
+        ).fetchone()
+        return {"queued": int(n), "retrying": int(failing), "last_error": row[0] if row else None}
+
+
+class Backend(Protocol):
+    def write(self, loops: List[OpenLoop]) -> None:
+        """Write the whole batch or raise (OSError / SubprocessError); nothing is dropped on failure."""
+        ...
+
+
+class FileBackend:
+    """Appends to a local file: a markdown checklist, or JSON lines if the path ends in .jsonl."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, loops: List[OpenLoop]) -> None:
+        if self.path.endswith(".jsonl"):
+            data = "".join(json.dumps(asdict(lp), ensure_ascii=False) + "\n" for lp in loops)
+        else:
+            data = "".join(f"- [ ] {lp.stamp} — {lp.text}\n" for lp in loops)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class AppleNotesBackend:
+    """The bundled Notes script: one osascript run, one note rewrite per batch."""
+
+    def __init__(self, script: Optional[str] = None) -> None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.script = script or os.path.join(script_dir, "apple_notes_open_loops.sh")
+
+    def write(self, loops: List[OpenLoop]) -> None:
+        args = [self.script]
+        for lp in loops:
+            args += ["--stamp", lp.stamp, lp.text]
+        subprocess.run(args, check=True, capture_output=True, timeout=120)
+
+
+def open_backend(spec: str, memory_dir: str = DEFAULT_MEMORY_DIR) -> Optional[Backend]:
+    """`notes`, `file` (open_loops.md in `memory_dir`), `file:PATH` or `none`.
+
+    `auto` is Notes on macOS and the file elsewhere.
+    """
+    if spec == "auto":
+        spec = "notes" if sys.platform == "darwin" else "file"
+    if spec == "none":
+        return None
+    if spec == "notes":
+        return AppleNotesBackend()
+    if spec == "file":
+        return FileBackend(os.path.join(memory_dir, OPEN_LOOPS_FILE))
+    if spec.startswith("file:"):
+        return FileBackend(os.path.expanduser(spec[len("file:") :]))
+    raise ValueError(f"unknown open-loop sink: {spec}")
+
+
+def _error_text(e: BaseException) -> str:
+    if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+        return e.stderr.decode("utf-8", "replace").strip() or str(e)
+    return str(e)
+
+
+def flush_open_loops(
+    queue: OpenLoopQueue, backend: Optional[Backend], metrics: Optional[Metrics] = None
+) -> int:
+    """Write every due open loop, a batch at a time; returns how many were written.
+
+    Stops at the first failed batch, which is rescheduled for a retry.
+    """
+    if backend is None:
+        return 0
+    metrics = metrics if metrics is not None else Metrics()
+    written = 0
+    while True:
+        loops = queue.claim()
+        if not loops:
+            return written
+        try:
+            with metrics.timer("open_loop_write"):
+                backend.write(loops)
+        except (OSError, subprocess.SubprocessError) as e:
+            queue.failed(loops, _error_text(e))
+            metrics.inc("open_loop_write_failures")
+            return written
+        queue.done(loops)
+        written += len(loops)
+        metrics.inc("open_loops_written", len(loops))
+
+
+class Flusher:
+    """Background thread that flushes the queue when kicked, and again when retries fall due.
+
+    Uses its own database connection. Its timers and counters are handed over
+    through `take_metrics` so the owning loop can fold them into its own.
+    """
+
+    def __init__(self, state_path: str, backend: Optional[Backend], idle_s: float = 60.0) -> None:
+        self.state_path = state_path
+        self.backend = backend
+        self.idle_s = idle_s
+        self._kick = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = Metrics()
+        self._thread = threading.Thread(target=self._run, name="open-loop-flusher", daemon=True)
+        self._thread.start()
+
+    def kick(self) -> None:
+        self._kick.set()
+
+    def take_metrics(self) -> Metrics:
+        with self._lock:
+            m, self._metrics = self._metrics, Metrics()
+        return m
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop after one last flush attempt (bounded by `timeout`)."""
+        self._stop.set()
+        self._kick.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        with StateStore(self.state_path) as store:
+            queue = OpenLoopQueue(store)
+            while True:
+                m = Metrics()
+                wait = self.idle_s
+                try:
+                    flush_open_loops(queue, self.backend, m)
+                    due = queue.next_due() if self.backend is not None else None
+                    if due is not None:
+                        wait = min(wait, max(0.0, due - time.time()))
+                except Exception as e:  # keep the thread alive; the rows are still queued
+                    print(f"open-loop flush failed: {e}", file=sys.stderr)
+                    wait = RETRY_BASE_S
+                with self._lock:
+                    self._metrics.merge(m)
+                if self._stop.is_set():
+                    return
+                self._kick.wait(wait)
+                self._kick.clear()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect or flush the queue of approved open loops.")
+    ap.add_argument("command", choices=["status", "flush"])
+    ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
+    ap.add_argument("--state", default=DEFAULT_STATE_PATH)
+    ap.add_argument("--open-loops", default="auto", metavar="SINK", help=SINK_HELP)
+    args = ap.parse_args()
+
+    with StateStore(args.state) as store:
+        queue = OpenLoopQueue(store)
+        if args.command == "flush":
+            metrics = Metrics()
+            written = flush_open_loops(queue, open_backend(args.open_loops, args.memory_dir), metrics)
+            print(json.dumps({"written": written, **queue.status()}))
+            return 1 if metrics.counters.get("open_loop_write_failures") else 0
+        print(json.dumps(queue.status()))
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,33 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
 import datetime as dt
 import glob
 import json
 import os
-import re
+import signal
+import sys
+import time
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from memory_classify import load_classifier
+from memory_cursors import CursorSet
+from memory_dedupe import SimilarityIndex, signature
+from memory_inbox import Inbox
+from memory_metrics import Metrics, export
+from memory_seen import SeenIds
+from memory_state import SCAN, StateStore
+from memory_tail import (
+    DecodeStats,
+    UserMessage,
+    iter_new_raw_lines,
+    open_watcher,
+    parse_user_message,
+    report_cursor_events,
+    split_ranges,
+)
 
 
 DEFAULT_SESSIONS_GLOB = os.path.expanduser("~/.clawdbot/agents/*/sessions/*.jsonl")
@@ -35,77 +55,9 @@ def _now_iso() -> str:
     return dt.datetime.now(dt.timezone.utc).isoformat()
 
 
-def _load_state(path: str) -> Dict[str, Any]:
-    if not os.path.exists(path):
-        return {"cursors": {}, "seen_message_ids": {}, "candidates": {}}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def _save_state(path: str, state: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
-
-
-def _iter_new_lines(path: str, start_offset: int) -> Tuple[int, Iterable[str]]:
-    with open(path, "rb") as f:
-        f.seek(start_offset)
-        data = f.read()
-        end_offset = f.tell()
-    text = data.decode("utf-8", errors="replace")
-    lines = [ln for ln in text.splitlines() if ln.strip()]
-    return end_offset, lines
-
-
-def _extract_user_text(msg: Dict[str, Any]) -> Optional[str]:
-    # Log schema: {type:"message", message:{role, content:[{type,text}...]}}
-    message = msg.get("message")
-    if not isinstance(message, dict):
-        return None
-    if message.get("role") != "user":
-        return None
-
-    content = message.get("content")
-    if not isinstance(content, list):
-        return None
-
-    parts: List[str] = []
-    for c in content:
-        if isinstance(c, dict) and c.get("type") == "text":
-            t = c.get("text")
-            if isinstance(t, str) and t.strip():
-                parts.append(t.strip())
-    if not parts:
-        return None
-    return "\n".join(parts).strip()
-
-
 def _classify(text: str) -> Tuple[str, List[Dict[str, Any]]]:
-    t = text.strip()
-    lowered = t.lower()
-
-    # Ignore harness/automation instructions that sometimes show up as user text.
-    if lowered.startswith("read heartbeat.md") or lowered.startswith("system:"):
-        return "unknown", []
-
-    # High-signal rules/preferences.
-    if re.search(r"\bcall me\b|\bmy name is\b|\bpreferred\b", lowered):
-        return "preference", [{"kind": "commit_to_memory"}]
-    if re.search(r"\balways\b|\bnever\b|\bdon't\b|\bdo not\b", lowered):
-        return "rule", [{"kind": "commit_to_memory"}]
-
-    # Open-loop / future work.
-    if re.search(r"\bopen loop\b|\bwe should\b|\blater\b|\bnext\b|\bto-?do\b", lowered):
-        return "open_loop", [{"kind": "add_open_loop"}]
-
-    # Default fallback: treat as candidate only if it looks durable.
-    if re.search(r"\bdefault\b|\bgoing with\b|\bdecide\b|\bdecision\b", lowered):
-        return "decision", [{"kind": "commit_to_memory"}]
-
-    return "unknown", []
+    # Rules live in memory_rules.json; first match in file order wins.
+    return load_classifier().classify(text)
 
 
 def _should_propose(candidate_type: str, actions: List[Dict[str, Any]]) -> bool:
@@ -113,90 +65,257 @@ def _should_propose(candidate_type: str, actions: List[Dict[str, Any]]) -> bool:
     return candidate_type != "unknown" and len(actions) > 0
 
 
-def scan(sessions_glob: str, memory_dir: str, inbox_path: str, state_path: str) -> List[Candidate]:
-    state = _load_state(state_path)
-    cursors: Dict[str, int] = state.get("cursors", {})
-    seen_message_ids: Dict[str, bool] = state.get("seen_message_ids", {})
-
-    candidates: List[Candidate] = []
-
-    for path in sorted(glob.glob(sessions_glob)):
-        session_id = os.path.basename(path)
-        start = int(cursors.get(path, 0))
-        end, lines = _iter_new_lines(path, start)
-        cursors[path] = end
-
-        for ln in lines:
-            try:
-                obj = json.loads(ln)
-            except Exception:
-                continue
-
-            if obj.get("type") != "message":
-                continue
-
-            msg_id = obj.get("id")
-            if not isinstance(msg_id, str) or not msg_id:
-                continue
-            if seen_message_ids.get(msg_id):
-                continue
-
-            text = _extract_user_text(obj)
-            if not text:
-                continue
-
-            cand_type, actions = _classify(text)
-            if not _should_propose(cand_type, actions):
-                seen_message_ids[msg_id] = True
-                continue
-
-            cand_id = f"cand_{msg_id}"
-            created_at = _now_iso()
-            candidates.append(
-                Candidate(
-                    id=cand_id,
-                    created_at=created_at,
-                    type=cand_type,
-                    text=text,
-                    source_session=session_id,
-                    source_message_id=msg_id,
-                    source_timestamp=str(obj.get("timestamp", "")),
-                    source_quote=text[:240],
-                    actions=actions,
-                )
-            )
-
-            # Mark seen so we don't propose repeatedly.
-            seen_message_ids[msg_id] = True
-
-    # Persist state
-    state["cursors"] = cursors
-    state["seen_message_ids"] = seen_message_ids
-    _save_state(state_path, state)
-
-    if candidates:
-        os.makedirs(os.path.dirname(inbox_path), exist_ok=True)
-        with open(inbox_path, "a", encoding="utf-8") as f:
-            for c in candidates:
-                f.write(json.dumps(asdict(c), ensure_ascii=False) + "\n")
-
-    return candidates
+# A shard is a line-aligned byte range of one session file; a hit is one user
+# message found in it, already classified.
+Shard = Tuple[str, int, Optional[int]]
+Hit = Tuple[UserMessage, str, List[Dict[str, Any]]]
+
+# Files with more unread bytes than this are split across workers.
+SHARD_BYTES = 16 * 1024 * 1024
+
+
+class CandidateStager:
+    """Tailer consumer that classifies user messages and stages candidates."""
+
+    ns = SCAN
+
+    def __init__(
+        self,
+        inbox_path: str,
+        seen: SeenIds,
+        index: Optional[SimilarityIndex] = None,
+        staged_ids: Optional[Set[str]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.inbox_path = inbox_path
+        self.seen = seen
+        self.index = index
+        # Ids staged and not yet flushed are added here when given: an approval
+        # handler in the same tailer (see memory_curator) waits for them.
+        self.staged_ids = staged_ids
+        self.metrics = metrics or Metrics()
+        self.staged: List[Candidate] = []
+        self.merged = 0
+        self._unflushed: List[Candidate] = []
+        self._inbox: Optional[Inbox] = None
+
+    def handle(self, msg: UserMessage) -> None:
+        if msg.msg_id in self.seen:
+            return
+        t0 = time.perf_counter()
+        cand_type, actions = _classify(msg.text)
+        self.metrics.add_time("classify", time.perf_counter() - t0)
+        self.handle_classified(msg, cand_type, actions)
+
+    def handle_classified(self, msg: UserMessage, cand_type: str, actions: List[Dict[str, Any]]) -> None:
+        if msg.msg_id in self.seen:
+            return
+
+        if not _should_propose(cand_type, actions):
+            self.seen.add(msg.msg_id)
+            return
+
+        # A near-repeat of something already pending or already in memory is
+        # folded onto that entry instead of asking the user again.
+        sig = None
+        if self.index is not None:
+            with self.metrics.timer("dedupe"):
+                sig = signature(msg.text)
+                match = self.index.lookup(msg.text, sig)
+                if match is not None:
+                    self.index.record_hit(match.id, f"{msg.session_id} {msg.msg_id}")
+            if match is not None:
+                self.merged += 1
+                self.metrics.inc("candidates_merged")
+                self.seen.add(msg.msg_id)
+                return
+
+        cand = Candidate(
+            id=f"cand_{msg.msg_id}",
+            created_at=_now_iso(),
+            type=cand_type,
+            text=msg.text,
+            source_session=msg.session_id,
+            source_message_id=msg.msg_id,
+            source_timestamp=msg.timestamp,
+            source_quote=msg.text[:240],
+            actions=actions,
+        )
+        self.staged.append(cand)
+        self._unflushed.append(cand)
+        if self.staged_ids is not None:
+            self.staged_ids.add(cand.id)
+        self.metrics.inc("candidates")
+        if self.index is not None:
+            self.index.stage(cand.id, cand.text, sig=sig)
+
+        # Mark seen so we don't propose repeatedly.
+        self.seen.add(msg.msg_id)
+
+    def flush(self) -> None:
+        if self._unflushed:
+            with self.metrics.timer("inbox_append"):
+                if self._inbox is None:
+                    self._inbox = Inbox(self.inbox_path)
+                self._inbox.append(asdict(c) for c in self._unflushed)
+            self._unflushed = []
+        # Index entries only once the inbox has the candidates, and in the
+        # same transaction as the cursors and seen ids (see defer_writes).
+        if self.index is not None:
+            self.index.defer_writes()
+
+    def close(self) -> None:
+        if self._inbox is not None:
+            self._inbox.close()
+            self._inbox = None
+
+
+def _scan_shard(shard: Shard) -> Tuple[str, int, List[Hit], Metrics]:
+    path, start, stop = shard
+    end = start
+    hits: List[Hit] = []
+    stats = DecodeStats()
+    classify_s = 0.0
+
+    clock = time.perf_counter
+    t = clock()
+    for end, raw in iter_new_raw_lines(path, start, stop):
+        stats.read_s += clock() - t
+        msg = parse_user_message(raw, path, stats)
+        if msg is not None:
+            t = clock()
+            cand_type, actions = _classify(msg.text)
+            classify_s += clock() - t
+            hits.append((msg, cand_type, actions))
+        t = clock()
+    stats.read_s += clock() - t
+
+    metrics = Metrics()
+    stats.report(metrics)
+    metrics.add_time("classify", classify_s, len(hits))
+    return path, end, hits, metrics
+
+
+def _plan_shards(paths: List[str], cursors: CursorSet, split: bool) -> List[Shard]:
+    shards: List[Shard] = []
+    for path in sorted(paths):
+        start = cursors.start(path)
+        if not split:
+            shards.append((path, start, None))
+            continue
+        for a, b in split_ranges(path, start, SHARD_BYTES):
+            shards.append((path, a, b))
+    return shards
+
+
+def _stage(
+    stager: CandidateStager,
+    cursors: CursorSet,
+    sessions_glob: str,
+    workers: int,
+    paths: Optional[List[str]],
+) -> None:
+    # Shards are classified independently (in a process pool when workers > 1)
+    # but merged here strictly in file/offset order, so dedupe and output match
+    # the serial path exactly.
+    full = paths is None
+    if paths is None:
+        paths = glob.glob(sessions_glob)
+    shards = _plan_shards(paths, cursors, split=workers > 1)
+    if workers > 1 and len(shards) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        results: Iterable[Tuple[str, int, List[Hit], Metrics]] = pool.map(_scan_shard, shards)
+    else:
+        pool = None
+        results = map(_scan_shard, shards)
+
+    try:
+        for path, end, hits, shard_metrics in results:
+            cursors.advance(path, end)
+            stager.metrics.merge(shard_metrics)
+            for msg, cand_type, actions in hits:
+                stager.handle_classified(msg, cand_type, actions)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if full:
+        cursors.prune(paths)
+
+    stager.flush()
+
+
+def scan(
+    sessions_glob: str,
+    memory_dir: str,
+    inbox_path: str,
+    state_path: str,
+    workers: int = 1,
+    paths: Optional[List[str]] = None,
+    metrics: Optional[Metrics] = None,
+    prom_file: Optional[str] = None,
+) -> List[Candidate]:
+    """Stage candidates from new log lines.
+
+    `paths` restricts the pass to those session files (follow mode hands in
+    just the ones that changed); by default every file matching the glob is
+    checked. Timers and counters go to `metrics` when given, and are always
+    added to the totals in the state store (see memory_metrics).
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    with StateStore(state_path) as store:
+        cursors = store.load_cursors(SCAN)
+        stager = CandidateStager(inbox_path, store.load_seen(SCAN), SimilarityIndex(store), metrics=metrics)
+        try:
+            _stage(stager, cursors, sessions_glob, workers, paths)
+            with metrics.timer("state_save"):
+                store.save(SCAN, cursors, {SCAN: stager.seen})
+            report_cursor_events(cursors, metrics)
+            export(store, "scan", metrics, prom_file)
+        finally:
+            stager.close()
+
+    return stager.staged
+
+
+def follow(
+    sessions_glob: str,
+    memory_dir: str,
+    inbox_path: str,
+    state_path: str,
+    workers: int = 1,
+    poll_interval: float = 1.0,
+    metrics: Optional[Metrics] = None,
+    prom_file: Optional[str] = None,
+) -> int:
+    """Run as a daemon: stage candidates from files as soon as they grow."""
+    watcher = open_watcher(sessions_glob, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    def emit(cands: List[Candidate]) -> None:
+        for c in cands:
+            print(json.dumps(asdict(c), ensure_ascii=False), flush=True)
+
+    try:
+        # Catch up on anything written while we weren't running.
+        emit(scan(sessions_glob, memory_dir, inbox_path, state_path, workers, None, metrics, prom_file))
+        while True:
+            changed = watcher.wait()
+            # Deleted or rotated-away files show up here too.
+            changed = [p for p in changed if os.path.exists(p)]
+            if changed:
+                emit(scan(sessions_glob, memory_dir, inbox_path, state_path, workers, changed, metrics, prom_file))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
 
 
 def list_pending(inbox_path: str) -> List[Dict[str, Any]]:
     if not os.path.exists(inbox_path):
         return []
-    out: List[Dict[str, Any]] = []
-    with open(inbox_path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                out.append(json.loads(ln))
-            except Exception:
-                continue
-    return out
+    with Inbox(inbox_path) as inbox:
+        return inbox.items()
 
 
 def main() -> int:
@@ -207,6 +326,29 @@ def main() -> int:
     ap.add_argument("--state", default=DEFAULT_STATE_PATH)
     ap.add_argument("--write", action="store_true", help="Scan and append new candidates to inbox")
     ap.add_argument("--list", action="store_true", help="List pending candidates")
+    ap.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep running and stage candidates as session files grow (prints JSON lines)",
+    )
+    ap.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks when inotify isn't available (--follow)",
+    )
+    ap.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print stage timers and counters (lines, bytes, skipped vs decoded, candidates) as JSON to stderr",
+    )
+    ap.add_argument("--prom-file", help="Also write Prometheus textfile-collector metrics here (e.g. .../curator.prom)")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Classify session files (and shards of large ones) in N processes; 0 = one per CPU",
+    )
     args = ap.parse_args()
 
     if args.list:
@@ -214,9 +356,38 @@ def main() -> int:
         print(json.dumps(pending, ensure_ascii=False, indent=2))
         return 0
 
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    metrics = Metrics()
+    if args.follow:
+        try:
+            return follow(
+                args.sessions_glob,
+                args.memory_dir,
+                args.inbox,
+                args.state,
+                workers=workers,
+                poll_interval=args.poll_interval,
+                metrics=metrics,
+                prom_file=args.prom_file,
+            )
+        finally:
+            if args.stats:
+                print(json.dumps(metrics.summary()), file=sys.stderr)
+
     if args.write:
-        cands = scan(args.sessions_glob, args.memory_dir, args.inbox, args.state)
+        cands = scan(
+            args.sessions_glob,
+            args.memory_dir,
+            args.inbox,
+            args.state,
+            workers=workers,
+            metrics=metrics,
+            prom_file=args.prom_file,
+        )
         print(json.dumps([asdict(c) for c in cands], ensure_ascii=False, indent=2))
+        if args.stats:
+            print(json.dumps(metrics.summary()), file=sys.stderr)
         return 0
 
     ap.print_help()
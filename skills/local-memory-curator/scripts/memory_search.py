@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_MEMORY_DIR = os.path.expanduser("~/clawd/memory")
+
+# Derived data: deleting it just means the next search re-indexes everything.
+INDEX_NAME = "search.sqlite3"
+DATED_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9].md"
+
+# Entries live in a plain table and FTS5 indexes their text as external
+# content, so a changed file's rows can be found by path and removed from the
+# full-text index without scanning it. `files` remembers the size and mtime
+# each file had when it was indexed; a search re-reads only files where either
+# differs.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    day TEXT NOT NULL,
+    stamp TEXT,
+    type TEXT,
+    status TEXT,
+    source TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (path);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    text, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Written by memory_apply._format_entry:
+#   ## 2025-01-02 09:15 AM — preference (approve)
+#   - text (may run over several lines)
+#   - source: <session> <message id>
+_HEADER_RE = re.compile(r"^## (.*?) — (\S+) \((\w+)\)\s*$")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class Entry:
+    stamp: Optional[str]
+    type: Optional[str]
+    status: Optional[str]
+    source: Optional[str]
+    text: str
+
+
+def parse_entries(content: str) -> List[Entry]:
+    """Split a dated memory file into its `## ` sections.
+
+    Sections not in the `_format_entry` layout (hand-written notes) are kept
+    with their heading as the stamp and no type or status.
+    """
+    entries: List[Entry] = []
+    lines = content.splitlines()
+    i = 0
+    while i < len(lines):
+        if not lines[i].startswith("## "):
+            i += 1
+            continue
+        m = _HEADER_RE.match(lines[i])
+        stamp, etype, status = (m.group(1), m.group(2), m.group(3)) if m else (lines[i][3:].strip(), None, None)
+        i += 1
+        body: List[str] = []
+        source = None
+        while i < len(lines) and not lines[i].startswith("## "):
+            if lines[i].startswith("- source: ") and source is None:
+                source = lines[i][len("- source: ") :].strip()
+            else:
+                body.append(lines[i])
+            i += 1
+        text = "\n".join(body).strip()
+        if text.startswith("- "):
+            text = text[2:]
+        if text:
+            entries.append(Entry(stamp, etype, status, source, text))
+    return entries
+
+
+def fts_query(text: str, any_word: bool = False) -> str:
+    """Words of `text` as quoted FTS5 terms; the last one also matches as a prefix."""
+    words = _WORD_RE.findall(text)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return (" OR " if any_word else " ").join(terms)
+
+
+class MemorySearch:
+    def __init__(self, memory_dir: str, index_path: Optional[str] = None) -> None:
+        self.memory_dir = memory_dir
+        self.index_path = index_path or os.path.join(memory_dir, INDEX_NAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+
+        self.conn = sqlite3.connect(self.index_path, timeout=10.0, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "MemorySearch":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def sync(self) -> Dict[str, int]:
+        """Bring the index up to date with the dated memory files; returns what was done."""
+        on_disk: Dict[str, Tuple[int, int]] = {}
+        for path in glob.glob(os.path.join(self.memory_dir, DATED_GLOB)):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            on_disk[os.path.abspath(path)] = (st.st_size, st.st_mtime_ns)
+
+        known = {p: (s, m) for p, s, m in self.conn.execute("SELECT path, size, mtime_ns FROM files")}
+        changed = [p for p, st in on_disk.items() if known.get(p) != st]
+        gone = [p for p in known if p not in on_disk]
+        if not changed and not gone:
+            return {"files": len(on_disk), "indexed": 0, "removed": 0}
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for path in gone:
+                self._drop(path)
+            for path in sorted(changed):
+                self._drop(path)
+                self._index(path, *on_disk[path])
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return {"files": len(on_disk), "indexed": len(changed), "removed": len(gone)}
+
+    def _drop(self, path: str) -> None:
+        self.conn.execute(
+            "INSERT INTO entries_fts (entries_fts, rowid, text) SELECT 'delete', id, text FROM entries WHERE path = ?",
+            (path,),
+        )
+        self.conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _index(self, path: str, size: int, mtime_ns: int) -> None:
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        day = os.path.splitext(os.path.basename(path))[0]
+        for e in parse_entries(content):
+            cur = self.conn.execute(
+                "INSERT INTO entries (path, day, stamp, type, status, source, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, day, e.stamp, e.type, e.status, e.source, e.text),
+            )
+            self.conn.execute("INSERT INTO entries_fts (rowid, text) VALUES (?, ?)", (cur.lastrowid, e.text))
+        # Stat taken before the read: a write that lands in between makes the
+        # next sync see a difference and index the file again.
+        self.conn.execute("INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)", (path, size, mtime_ns))
+
+    def rebuild(self) -> Dict[str, int]:
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute("DELETE FROM files")
+        self.conn.execute("DELETE FROM entries")
+        self.conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('delete-all')")
+        self.conn.execute("COMMIT")
+        return self.sync()
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        type_: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        raw: bool = False,
+        any_word: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Best-ranked entries (BM25) matching `query`.
+
+        `query` is plain words unless `raw`, in which case it is passed to
+        FTS5 as is (phrases, NEAR, column filters, ...). `since` is a date
+        (YYYY-MM-DD), compared against the file's day.
+        """
+        match = query if raw else fts_query(query, any_word)
+        if not match:
+            return []
+        where = ["entries_fts MATCH ?"]
+        params: List[Any] = [match]
+        if type_:
+            where.append("e.type = ?")
+            params.append(type_)
+        if status:
+            where.append("e.status = ?")
+            params.append(status)
+        if since:
+            where.append("e.day >= ?")
+            params.append(since)
+        params.append(limit)
+        rows = self.conn.execute(
+            "SELECT e.day, e.stamp, e.type, e.status, e.source, e.text, e.path,"
+            " snippet(entries_fts, 0, '[', ']', '…', 16), bm25(entries_fts) AS rank"
+            " FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid"
+            f" WHERE {' AND '.join(where)} ORDER BY rank LIMIT ?",
+            params,
+        ).fetchall()
+        out: List[Dict[str, Any]] = []
+        for day, stamp, etype, st, source, text, path, snip, rank in rows:
+            session, _, msg_id = (source or "").partition(" ")
+            out.append(
+                {
+                    "day": day,
+                    "stamp": stamp,
+                    "type": etype,
+                    "status": st,
+                    "source_session": session or None,
+                    "source_message_id": msg_id or None,
+                    "text": text,
+                    "snippet": snip,
+                    "score": round(-rank, 4),
+                    "file": path,
+                }
+            )
+        return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Full-text search over the dated memory files (memory/YYYY-MM-DD.md).")
+    ap.add_argument("query", nargs="*", help="Words to look for (all must match; the last may be a prefix)")
+    ap.add_argument("-n", "--limit", type=int, default=10)
+    ap.add_argument("--type", help="Only entries of this candidate type (e.g. rule, preference)")
+    ap.add_argument("--status", choices=["approve", "reject"], help="Only approved or only rejected entries")
+    ap.add_argument("--since", metavar="YYYY-MM-DD", help="Only entries from files dated on or after this day")
+    ap.add_argument("--any", action="store_true", help="Match any of the words instead of all of them")
+    ap.add_argument("--raw", action="store_true", help="Pass the query to SQLite FTS5 unchanged")
+    ap.add_argument("--rebuild", action="store_true", help="Drop the index and re-read every file")
+    ap.add_argument("--stats", action="store_true", help="Print index sync and query timings as JSON to stderr")
+    ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
+    ap.add_argument("--index", help=f"Index database (default: {INDEX_NAME} in the memory dir)")
+    args = ap.parse_args()
+
+    query = " ".join(args.query)
+    if not query and not args.rebuild:
+        ap.error("give something to search for")
+
+    with MemorySearch(args.memory_dir, args.index) as ms:
+        t0 = time.perf_counter()
+        synced = ms.rebuild() if args.rebuild else ms.sync()
+        t1 = time.perf_counter()
+        try:
+            hits = ms.search(query, args.limit, args.type, args.status, args.since, args.raw, args.any) if query else []
+        except sqlite3.OperationalError as e:
+            # Only reachable with --raw: a malformed FTS5 expression.
+            raise SystemExit(f"Bad query: {e}")
+        t2 = time.perf_counter()
+
+    if query:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(synced))
+    if args.stats:
+        print(
+            json.dumps({**synced, "sync_ms": round((t1 - t0) * 1000, 3), "query_ms": round((t2 - t1) * 1000, 3)}),
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
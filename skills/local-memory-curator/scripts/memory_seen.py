@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# Ids are bucketed by generation (one per day) and a bucket is dropped once it
+# is older than the window. Log cursors only move forward, so by then the line
+# an id came from is long behind every cursor and can't be proposed again.
+GENERATION_SECONDS = 24 * 60 * 60
+GENERATIONS = 7
+
+
+class SeenIds:
+    """Generation-bucketed set of processed message ids with time-based expiry."""
+
+    def __init__(
+        self,
+        buckets: Optional[Dict[int, Set[str]]] = None,
+        generation_s: int = GENERATION_SECONDS,
+        generations: int = GENERATIONS,
+    ) -> None:
+        self.generation_s = generation_s
+        self.generations = generations
+        self.buckets: Dict[int, Set[str]] = buckets or {}
+        self._added: List[Tuple[str, int]] = []
+
+    @classmethod
+    def from_state(cls, raw: Any, **kwargs: Any) -> "SeenIds":
+        """Rebuild from what older versions kept in state.json (used for migration)."""
+        seen = cls(**kwargs)
+        if not isinstance(raw, dict):
+            return seen
+
+        buckets = raw.get("buckets")
+        if isinstance(buckets, dict):
+            if isinstance(raw.get("generation_s"), int) and raw["generation_s"] > 0:
+                seen.generation_s = raw["generation_s"]
+            for gen, ids in buckets.items():
+                try:
+                    gen_i = int(gen)
+                except (TypeError, ValueError):
+                    continue
+                if isinstance(ids, list):
+                    seen.buckets[gen_i] = {i for i in ids if isinstance(i, str)}
+            return seen
+
+        # Legacy layout: {msg_id: true, ...}. Everything lands in the current
+        # generation and ages out with it.
+        seen.buckets[seen._generation()] = {k for k, v in raw.items() if v}
+        return seen
+
+    def _generation(self, now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // self.generation_s)
+
+    def __contains__(self, msg_id: str) -> bool:
+        for ids in self.buckets.values():
+            if msg_id in ids:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.buckets.values())
+
+    def add(self, msg_id: str) -> None:
+        gen = self._generation()
+        self.buckets.setdefault(gen, set()).add(msg_id)
+        self._added.append((msg_id, gen))
+
+    def take_added(self) -> List[Tuple[str, int]]:
+        """Ids added since the last call, for incremental persistence."""
+        added, self._added = self._added, []
+        return added
+
+    def oldest_generation(self, now: Optional[float] = None) -> int:
+        return self._generation(now) - self.generations + 1
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from memory_cursors import Cursor, CursorSet
+from memory_seen import SeenIds
+
+
+# Both the scanner and the approval watcher write here, possibly at the same
+# time. WAL lets readers proceed during a write, and every save is one short
+# IMMEDIATE transaction touching only the rows that changed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_cursors (
+    ns TEXT NOT NULL,
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    fingerprint BLOB NOT NULL,
+    PRIMARY KEY (ns, dev, ino)
+);
+-- Path-keyed offsets from older versions (and state.json); each row is
+-- adopted into file_cursors the first time its file is read.
+CREATE TABLE IF NOT EXISTS cursors (
+    ns TEXT NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (ns, path)
+);
+CREATE TABLE IF NOT EXISTS seen (
+    ns TEXT NOT NULL,
+    msg_id TEXT NOT NULL,
+    gen INTEGER NOT NULL,
+    PRIMARY KEY (ns, msg_id)
+);
+CREATE INDEX IF NOT EXISTS seen_gen ON seen (ns, gen);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Namespaces, and the state.json keys they were migrated from.
+SCAN = "scan"
+APPROVAL = "approval"
+_LEGACY_KEYS = {
+    SCAN: ("cursors", "seen_message_ids"),
+    APPROVAL: ("approval_cursors", "seen_approval_msgs"),
+}
+
+
+def db_path_for(state_path: str) -> str:
+    """`state.json` -> `state.sqlite3`; any other path is used as the database itself."""
+    root, ext = os.path.splitext(state_path)
+    return root + ".sqlite3" if ext == ".json" else state_path
+
+
+class StateStore:
+    def __init__(self, state_path: str) -> None:
+        self.state_path = state_path
+        self.path = db_path_for(state_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._deferred: List[Callable[[sqlite3.Connection], None]] = []
+        self._migrate_json()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """One short write transaction; the lock is taken up front to avoid upgrade deadlocks."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _migrate_json(self) -> None:
+        if self.path == self.state_path or not os.path.exists(self.state_path):
+            return
+        if self.get("migrated_from_json") is not None:
+            return
+
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            legacy = {}
+        if not isinstance(legacy, dict):
+            legacy = {}
+
+        with self.transaction():
+            # Another process may have won the race while we waited for the lock.
+            if self._get(self.conn, "migrated_from_json") is None:
+                for ns, (cursor_key, seen_key) in _LEGACY_KEYS.items():
+                    cursors = legacy.get(cursor_key)
+                    if isinstance(cursors, dict):
+                        self.conn.executemany(
+                            "INSERT OR REPLACE INTO cursors (ns, path, offset) VALUES (?, ?, ?)",
+                            [(ns, p, int(o)) for p, o in cursors.items() if isinstance(o, int)],
+                        )
+                    seen = SeenIds.from_state(legacy.get(seen_key))
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO seen (ns, msg_id, gen) VALUES (?, ?, ?)",
+                        [(ns, i, gen) for gen, ids in seen.buckets.items() for i in ids],
+                    )
+                self._put(self.conn, "migrated_from_json", json.dumps(os.path.abspath(self.state_path)))
+
+    def load_cursors(self, ns: str) -> CursorSet:
+        rows = self.conn.execute("SELECT dev, ino, path, offset, fingerprint FROM file_cursors WHERE ns = ?", (ns,))
+        cursors = [Cursor(int(d), int(i), p, int(o), bytes(fp)) for d, i, p, o, fp in rows]
+        legacy = self.conn.execute("SELECT path, offset FROM cursors WHERE ns = ?", (ns,))
+        return CursorSet(cursors, legacy={p: int(o) for p, o in legacy})
+
+    def load_seen(self, ns: str) -> SeenIds:
+        seen = SeenIds()
+        rows = self.conn.execute(
+            "SELECT msg_id, gen FROM seen WHERE ns = ? AND gen >= ?", (ns, seen.oldest_generation())
+        )
+        for msg_id, gen in rows:
+            seen.buckets.setdefault(int(gen), set()).add(msg_id)
+        return seen
+
+    def defer(self, write: Callable[[sqlite3.Connection], None]) -> None:
+        """Run `write` inside the next save(), so it commits with that pass's cursors and seen ids."""
+        self._deferred.append(write)
+
+    def save(self, cursor_ns: str, cursors: CursorSet, seen: Dict[str, SeenIds]) -> None:
+        """Commit cursor advances and newly seen ids in one transaction.
+
+        `seen` maps a namespace to its id set. Only cursors that moved since
+        the last save are written, and only ids added since then are inserted.
+        """
+        changed, removed, dropped = cursors.take_changes()
+        deferred, self._deferred = self._deferred, []
+
+        with self.transaction():
+            if changed:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO file_cursors (ns, dev, ino, path, offset, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(cursor_ns, c.dev, c.ino, c.path, c.offset, c.fingerprint) for c in changed],
+                )
+            if removed:
+                self.conn.executemany(
+                    "DELETE FROM file_cursors WHERE ns = ? AND dev = ? AND ino = ?",
+                    [(cursor_ns, d, i) for d, i in removed],
+                )
+            if dropped:
+                self.conn.executemany(
+                    "DELETE FROM cursors WHERE ns = ? AND path = ?", [(cursor_ns, p) for p in dropped]
+                )
+            for ns, ids in seen.items():
+                added = ids.take_added()
+                if added:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO seen (ns, msg_id, gen) VALUES (?, ?, ?)",
+                        [(ns, i, gen) for i, gen in added],
+                    )
+                self.conn.execute("DELETE FROM seen WHERE ns = ? AND gen < ?", (ns, ids.oldest_generation()))
+            for write in deferred:
+                write(self.conn)
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _put(conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = self._get(self.conn, key)
+        return default if raw is None else json.loads(raw)
+
+    def put(self, key: str, value: Any) -> None:
+        self._put(self.conn, key, json.dumps(value, ensure_ascii=False))
+
+    def items(self, prefix: str) -> List[Tuple[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? ORDER BY key", (prefix, prefix + "\uffff")
+        )
+        return [(k, json.loads(v)) for k, v in rows]
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+
+import asyncio
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import json
+import mmap
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Set, Tuple, Union
+
+try:
+    import orjson  # optional, much faster decoding
+except ImportError:
+    orjson = None
+
+from memory_cursors import CursorSet
+from memory_metrics import Metrics
+from memory_seen import SeenIds
+from memory_state import StateStore
+
+
+# Consumed pages are handed back to the kernel every this many bytes so that
+# resident memory stays flat while walking a large backlog.
+RELEASE_EVERY = 16 * 1024 * 1024
+
+
+def _release(mm: mmap.mmap, start: int, end: int) -> None:
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        try:
+            mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+        except (OSError, ValueError):
+            pass
+
+
+def iter_new_raw_lines(
+    path: str, start_offset: int, stop_offset: Optional[int] = None
+) -> Iterator[Tuple[int, bytes]]:
+    """Lazily yield `(next_offset, raw_line)` for each complete line after `start_offset`.
+
+    The file is memory-mapped and walked newline by newline, so only one line is
+    materialised at a time. A trailing line without its newline is a write still
+    in progress: it is not yielded, and callers that store `next_offset` as their
+    cursor will pick it up on the next pass. Blank lines are skipped.
+
+    `stop_offset` bounds the walk to a byte range (see `split_ranges`).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if stop_offset is not None:
+            size = min(size, stop_offset)
+        if size <= start_offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                try:
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                except (OSError, ValueError):
+                    pass
+
+            pos = start_offset
+            released = start_offset
+            while pos < size:
+                nl = mm.find(b"\n", pos, size)
+                if nl < 0:
+                    break
+                raw = mm[pos:nl]
+                pos = nl + 1
+                if raw.strip():
+                    yield pos, raw.rstrip(b"\r")
+                if pos - released >= RELEASE_EVERY:
+                    _release(mm, released, pos)
+                    released = pos
+
+
+def iter_new_lines(
+    path: str, start_offset: int, stop_offset: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
+    """`iter_new_raw_lines`, decoded as UTF-8 (undecodable bytes replaced)."""
+    for pos, raw in iter_new_raw_lines(path, start_offset, stop_offset):
+        yield pos, raw.decode("utf-8", errors="replace")
+
+
+def split_ranges(path: str, start_offset: int, chunk_bytes: int) -> List[Tuple[int, Optional[int]]]:
+    """Split the bytes after `start_offset` into roughly `chunk_bytes` line-aligned ranges.
+
+    Every boundary sits just after a newline, so each `(start, stop)` range can be
+    fed to `iter_new_raw_lines` independently. The last range is open-ended (`stop`
+    is None) and keeps the usual partial-line handling.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start_offset:
+            return []
+        if size - start_offset <= chunk_bytes:
+            return [(start_offset, None)]
+
+        bounds = [start_offset]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start_offset + chunk_bytes
+            while pos < size:
+                nl = mm.find(b"\n", pos - 1, size)
+                if nl < 0 or nl + 1 >= size:
+                    break
+                bounds.append(nl + 1)
+                pos = nl + 1 + chunk_bytes
+
+    ranges: List[Tuple[int, Optional[int]]] = []
+    for i, b in enumerate(bounds):
+        ranges.append((b, bounds[i + 1] if i + 1 < len(bounds) else None))
+    return ranges
+
+
+@dataclass
+class UserMessage:
+    msg_id: str
+    text: str
+    timestamp: str
+    path: str
+
+    @property
+    def session_id(self) -> str:
+        return os.path.basename(self.path)
+
+
+def extract_user_text(msg: Dict[str, Any]) -> Optional[str]:
+    # Log schema: {type:"message", message:{role, content:[{type,text}...]}}
+    message = msg.get("message")
+    if not isinstance(message, dict):
+        return None
+    if message.get("role") != "user":
+        return None
+
+    content = message.get("content")
+    if not isinstance(content, list):
+        return None
+
+    parts: List[str] = []
+    for c in content:
+        if isinstance(c, dict) and c.get("type") == "text":
+            t = c.get("text")
+            if isinstance(t, str) and t.strip():
+                parts.append(t.strip())
+    if not parts:
+        return None
+    return "\n".join(parts).strip()
+
+
+# Only `type == "message"` lines from the user matter, and most lines are
+# assistant output and tool traffic. A line missing either quoted marker can't
+# match, unless it spells them with \u escapes, so those still get decoded.
+MESSAGE_MARKER = b'"message"'
+USER_MARKER = b'"user"'
+ESCAPE_MARKER = b"\\u"
+
+
+@dataclass
+class DecodeStats:
+    lines: int = 0
+    bytes: int = 0
+    skipped: int = 0
+    decoded: int = 0
+    user_messages: int = 0
+    # Seconds spent waiting on the line reader, in JSON decoding, and pulling
+    # the user text out of decoded lines.
+    read_s: float = 0.0
+    decode_s: float = 0.0
+    extract_s: float = 0.0
+
+    def add(self, other: "DecodeStats") -> None:
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.skipped += other.skipped
+        self.decoded += other.decoded
+        self.user_messages += other.user_messages
+        self.read_s += other.read_s
+        self.decode_s += other.decode_s
+        self.extract_s += other.extract_s
+
+    def report(self, metrics: Metrics) -> None:
+        metrics.inc("lines", self.lines)
+        metrics.inc("read_bytes", self.bytes)
+        metrics.inc("lines_skipped", self.skipped)
+        metrics.inc("lines_decoded", self.decoded)
+        metrics.inc("user_messages", self.user_messages)
+        metrics.add_time("read", self.read_s, self.lines)
+        metrics.add_time("decode", self.decode_s, self.decoded)
+        metrics.add_time("extract", self.extract_s, self.decoded)
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Stricter than the stdlib (invalid UTF-8, NaN, huge ints); let
+            # json have the final say so results don't depend on the backend.
+            pass
+    return json.loads(raw.decode("utf-8", errors="replace"))
+
+
+def parse_user_message(raw: bytes, path: str, stats: Optional[DecodeStats] = None) -> Optional[UserMessage]:
+    """Decode one log line; None unless it is a user message with an id and text."""
+    if (MESSAGE_MARKER not in raw or USER_MARKER not in raw) and ESCAPE_MARKER not in raw:
+        if stats is not None:
+            stats.lines += 1
+            stats.bytes += len(raw)
+            stats.skipped += 1
+        return None
+
+    if stats is None:
+        try:
+            obj = _loads(raw)
+        except Exception:
+            return None
+        return _to_user_message(obj, path)
+
+    stats.lines += 1
+    stats.bytes += len(raw)
+    stats.decoded += 1
+    t0 = time.perf_counter()
+    try:
+        obj = _loads(raw)
+    except Exception:
+        obj = None
+    t1 = time.perf_counter()
+    msg = _to_user_message(obj, path)
+    stats.decode_s += t1 - t0
+    stats.extract_s += time.perf_counter() - t1
+    if msg is not None:
+        stats.user_messages += 1
+    return msg
+
+
+def _to_user_message(obj: Any, path: str) -> Optional[UserMessage]:
+    if not isinstance(obj, dict) or obj.get("type") != "message":
+        return None
+
+    msg_id = obj.get("id")
+    if not isinstance(msg_id, str) or not msg_id:
+        return None
+
+    text = extract_user_text(obj)
+    if not text:
+        return None
+    return UserMessage(msg_id=msg_id, text=text, timestamp=str(obj.get("timestamp", "")), path=path)
+
+
+class Consumer(Protocol):
+    # Namespace of `seen` in the state store.
+    ns: str
+    seen: SeenIds
+
+    def handle(self, msg: UserMessage) -> None: ...
+
+    def flush(self) -> None: ...
+
+
+class Tailer:
+    """One pass over the session logs feeding every consumer.
+
+    Each new line is read and decoded once, and user messages are handed to
+    each consumer in turn. Cursors live under a single namespace, and the
+    consumers' seen ids are committed together with them.
+
+    `floors` maps a consumer's namespace to cursors it has already read up to
+    on its own (see memory_curator); lines before them are not handed to it.
+    They are dropped after the next full pass.
+    """
+
+    def __init__(
+        self,
+        sessions_glob: str,
+        store: StateStore,
+        cursor_ns: str,
+        consumers: List[Consumer],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.sessions_glob = sessions_glob
+        self.store = store
+        self.cursor_ns = cursor_ns
+        self.consumers = consumers
+        self.cursors = store.load_cursors(cursor_ns)
+        self.floors: Dict[str, CursorSet] = {}
+        self.stats = DecodeStats()
+        self.metrics = metrics or Metrics()
+
+    def pass_once(self, paths: Optional[List[str]] = None) -> None:
+        full = paths is None
+        if paths is None:
+            paths = glob.glob(self.sessions_glob)
+
+        stats = DecodeStats()
+        clock = time.perf_counter
+        for path in sorted(paths):
+            end = self.cursors.start(path)
+            floors = self._floors(path)
+            t = clock()
+            for end, raw in iter_new_raw_lines(path, end):
+                stats.read_s += clock() - t
+                msg = parse_user_message(raw, path, stats)
+                if msg is not None:
+                    for c, floor in zip(self.consumers, floors):
+                        if end > floor:
+                            c.handle(msg)
+                t = clock()
+            stats.read_s += clock() - t
+            self.cursors.advance(path, end)
+        self._finish(paths if full else None, stats)
+
+    async def pass_async(self, paths: Optional[List[str]] = None, concurrency: int = 4) -> None:
+        """`pass_once` with files read and decoded in up to `concurrency` threads.
+
+        Consumers still run on the calling thread, in file order, and nothing
+        is awaited between the first `handle` and the final save, so a
+        cancelled pass leaves no partial state behind.
+        """
+        full = paths is None
+        if paths is None:
+            paths = glob.glob(self.sessions_glob)
+        paths = sorted(paths)
+
+        starts = [self.cursors.start(p) for p in paths]
+        floors = [self._floors(p) for p in paths]
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def read(path: str, start: int) -> Tuple[int, List[Tuple[int, UserMessage]], DecodeStats]:
+            async with sem:
+                return await asyncio.to_thread(read_user_messages, path, start)
+
+        results = await asyncio.gather(*(read(p, s) for p, s in zip(paths, starts)))
+
+        stats = DecodeStats()
+        for path, file_floors, (end, msgs, file_stats) in zip(paths, floors, results):
+            for msg_end, msg in msgs:
+                for c, floor in zip(self.consumers, file_floors):
+                    if msg_end > floor:
+                        c.handle(msg)
+            self.cursors.advance(path, end)
+            stats.add(file_stats)
+        self._finish(paths if full else None, stats)
+
+    def _floors(self, path: str) -> List[int]:
+        return [self.floors[c.ns].start(path) if c.ns in self.floors else 0 for c in self.consumers]
+
+    def _finish(self, all_paths: Optional[List[str]], stats: DecodeStats) -> None:
+        if all_paths is not None:
+            self.cursors.prune(all_paths)
+            self.floors = {}
+
+        for c in self.consumers:
+            c.flush()
+        with self.metrics.timer("state_save"):
+            self.store.save(self.cursor_ns, self.cursors, {c.ns: c.seen for c in self.consumers})
+
+        self.stats.add(stats)
+        stats.report(self.metrics)
+        report_cursor_events(self.cursors, self.metrics)
+
+
+def read_user_messages(path: str, start: int) -> Tuple[int, List[Tuple[int, UserMessage]], DecodeStats]:
+    """Every user message after `start` in one file, with the offset read up to.
+
+    Each message comes with the offset just past its line.
+
+    Touches no shared state, so it can run in a worker thread. A file that has
+    gone away (rotated or deleted since the change was seen) reads as empty.
+    """
+    stats = DecodeStats()
+    msgs: List[Tuple[int, UserMessage]] = []
+    end = start
+    clock = time.perf_counter
+    t = clock()
+    try:
+        for end, raw in iter_new_raw_lines(path, start):
+            stats.read_s += clock() - t
+            msg = parse_user_message(raw, path, stats)
+            if msg is not None:
+                msgs.append((end, msg))
+            t = clock()
+    except FileNotFoundError:
+        pass
+    stats.read_s += clock() - t
+    return end, msgs, stats
+
+
+def report_cursor_events(cursors: CursorSet, metrics: Metrics) -> None:
+    for event, n in cursors.events.items():
+        metrics.inc(f"cursor_{event}", n)
+    cursors.events.clear()
+
+
+# inotify(7) flags; see <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Portable change detection: stat every matching file and compare size/mtime."""
+
+    def __init__(self, sessions_glob: str, poll_interval: float = 1.0) -> None:
+        self.sessions_glob = sessions_glob
+        self.poll_interval = poll_interval
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self.poll()
+
+    def poll(self) -> List[str]:
+        """Paths that changed since the last call (non-blocking)."""
+        changed: List[str] = []
+        stats: Dict[str, Tuple[int, int]] = {}
+        for path in glob.glob(self.sessions_glob):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (st.st_size, st.st_mtime_ns)
+            if self._stats.get(path) != stats[path]:
+                changed.append(path)
+        self._stats = stats
+        return sorted(changed)
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """Block until some session file changes (or `timeout` passes); return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.poll_interval
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0.0))
+            time.sleep(delay)
+            changed = self.poll()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux change detection: inotify watches on each sessions directory.
+
+    Directories are re-globbed every `rescan_interval` seconds to pick up new
+    agents; files in a newly watched directory are reported as changed.
+    """
+
+    def __init__(self, sessions_glob: str, rescan_interval: float = 5.0, settle: float = 0.02) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._libc = libc
+        self.fd = fd
+        self.sessions_glob = sessions_glob
+        self.dir_glob = os.path.dirname(sessions_glob)
+        self.name_glob = os.path.basename(sessions_glob)
+        self.rescan_interval = rescan_interval
+        self.settle = settle
+        self._dirs: Dict[int, str] = {}
+        self._last_rescan = 0.0
+        self._scanned = False
+        self._rescan()
+
+    def _rescan(self) -> List[str]:
+        self._last_rescan = time.monotonic()
+        # Files present at startup are the caller's first pass; after that, a
+        # directory that appears (even the first one) has unseen files.
+        initial, self._scanned = not self._scanned, True
+        watched = set(self._dirs.values())
+        added: List[str] = []
+        for d in glob.glob(self.dir_glob):
+            if d in watched or not os.path.isdir(d):
+                continue
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), mask)
+            if wd < 0:
+                continue
+            self._dirs[wd] = d
+            if not initial:
+                added.extend(glob.glob(os.path.join(d, self.name_glob)))
+        return added
+
+    def _drain(self, changed: Set[str]) -> None:
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            pos = 0
+            while pos + _EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+                name = buf[pos + _EVENT.size : pos + _EVENT.size + length].rstrip(b"\0")
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(glob.glob(self.sessions_glob))
+                    continue
+                d = self._dirs.get(wd)
+                if d is None or not name:
+                    continue
+                fname = os.fsdecode(name)
+                if fnmatch.fnmatch(fname, self.name_glob):
+                    changed.add(os.path.join(d, fname))
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def poll(self) -> List[str]:
+        """Paths with pending events, plus files in newly found directories (non-blocking)."""
+        changed: Set[str] = set()
+        if time.monotonic() - self._last_rescan >= self.rescan_interval:
+            changed.update(self._rescan())
+        self._drain(changed)
+        return sorted(changed)
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """Block until some session file changes (or `timeout` passes); return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: Set[str] = set()
+        while not changed:
+            now = time.monotonic()
+            if now - self._last_rescan >= self.rescan_interval:
+                changed.update(self._rescan())
+                if changed:
+                    break
+
+            delay = self.rescan_interval - (now - self._last_rescan)
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+                if delay <= 0:
+                    break
+            ready, _, _ = select.select([self.fd], [], [], max(delay, 0.0))
+            if ready:
+                self._drain(changed)
+                # Writers often append in several syscalls; let a burst settle
+                # so one wake-up covers it.
+                if changed and self.settle > 0:
+                    time.sleep(self.settle)
+                    self._drain(changed)
+        return sorted(changed)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(sessions_glob: str, poll_interval: float = 1.0) -> Union[InotifyWatcher, PollingWatcher]:
+    """inotify when the platform has it, otherwise mtime/size polling."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(sessions_glob)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(sessions_glob, poll_interval=poll_interval)
+
+
+class AsyncWatcher:
+    """Awaitable change notifications for the session logs.
+
+    With inotify the descriptor is registered with the event loop, so a write
+    wakes the waiter immediately. Otherwise files are polled, starting every
+    `min_interval` seconds and doubling up to `max_interval` while nothing
+    changes; any change drops back to the minimum. Must be created inside a
+    running loop.
+    """
+
+    def __init__(self, sessions_glob: str, min_interval: float = 0.25, max_interval: float = 30.0) -> None:
+        self.watcher = open_watcher(sessions_glob, poll_interval=min_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._changed: Set[str] = set()
+        if isinstance(self.watcher, InotifyWatcher):
+            self._loop.add_reader(self.watcher.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        # The reader is level-triggered: events are read here, as they come,
+        # or an event during a pass would call back in a tight loop until the
+        # next wait().
+        self._changed.update(self.watcher.poll())
+        if self._changed:
+            self._ready.set()
+
+    async def wait(self) -> List[str]:
+        w = self.watcher
+        while True:
+            if isinstance(w, InotifyWatcher):
+                if not self._changed:
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), timeout=w.rescan_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                if self._changed and w.settle > 0:
+                    # Let a burst of appends settle so one pass covers it.
+                    await asyncio.sleep(w.settle)
+                self._ready.clear()
+                self._changed.update(w.poll())
+                changed, self._changed = sorted(self._changed), set()
+            else:
+                await asyncio.sleep(self.interval)
+                changed = w.poll()
+                self.interval = self.min_interval if changed else min(self.interval * 2, self.max_interval)
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if isinstance(self.watcher, InotifyWatcher) and self.watcher.fd >= 0:
+            self._loop.remove_reader(self.watcher.fd)
+        self.watcher.close()
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 
 import argparse
-import glob
+import asyncio
 import json
 import os
 import re
-import subprocess
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import signal
+import sys
+from typing import Any, Coroutine, Dict, List, Optional, Set, Tuple
+
+from memory_apply import apply_batch
+from memory_dedupe import SimilarityIndex
+from memory_inbox import Inbox
+from memory_metrics import Metrics, export
+from memory_notify_format import load_digest, parse_selection, parse_timestamp
+from memory_open_loops import SINK_HELP, Flusher, OpenLoopQueue, flush_open_loops, open_backend
+from memory_seen import SeenIds
+from memory_state import APPROVAL, StateStore
+from memory_tail import AsyncWatcher, Tailer, UserMessage
 
 
 DEFAULT_SESSIONS_GLOB = os.path.expanduser("~/.clawdbot/agents/*/sessions/*.jsonl")
@@ -22,121 +33,201 @@ DEFAULT_STATE_PATH = os.path.expanduser("~/clawd/memory/state.json")
 CMD_RE = re.compile(r"^(approve|reject|edit)\s+(cand_[a-zA-Z0-9]+)(?::\s*(.*))?$", re.IGNORECASE)
 INLINE_CMD_RE = re.compile(r"\b(approve|reject|edit)\s+(cand_[a-zA-Z0-9]+)(?::\s*([^\n]+))?\b", re.IGNORECASE)
 CAND_ID_RE = re.compile(r"\bid:\s*(cand_[a-zA-Z0-9]+)\b", re.IGNORECASE)
+# Replies to a digest (memory_notify_format.py --digest), by the numbers it showed:
+#   approve 1-5
+#   reject 2,4
+#   approve all
+#   edit 3: new text here
+NUM_CMD_RE = re.compile(r"^(approve|reject)\s+(all|\d[\d\s,-]*)$", re.IGNORECASE)
+NUM_EDIT_RE = re.compile(r"^edit\s+(\d+)\s*:\s*(.*)$", re.IGNORECASE)
 
 
-def _load_state(path: str) -> Dict[str, Any]:
-    if not os.path.exists(path):
-        return {"approval_cursors": {}, "seen_approval_msgs": {}}
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {"approval_cursors": {}, "seen_approval_msgs": {}}
-
-
-def _save_state(path: str, state: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
-
-
-def _iter_new_lines(path: str, start_offset: int) -> Tuple[int, Iterable[str]]:
-    with open(path, "rb") as f:
-        f.seek(start_offset)
-        data = f.read()
-        end_offset = f.tell()
-    text = data.decode("utf-8", errors="replace")
-    lines = [ln for ln in text.splitlines() if ln.strip()]
-    return end_offset, lines
-
-
-def _extract_user_text(msg: Dict[str, Any]) -> Optional[str]:
-    message = msg.get("message")
-    if not isinstance(message, dict):
-        return None
-    if message.get("role") != "user":
-        return None
-    content = message.get("content")
-    if not isinstance(content, list):
-        return None
-
-    parts: List[str] = []
-    for c in content:
-        if isinstance(c, dict) and c.get("type") == "text":
-            t = c.get("text")
-            if isinstance(t, str) and t.strip():
-                parts.append(t.strip())
-    if not parts:
-        return None
-    return "\n".join(parts).strip()
-
-
-def _load_pending_ids(inbox_path: str) -> set:
-    ids = set()
-    if not os.path.exists(inbox_path):
-        return ids
-    with open(inbox_path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                obj = json.loads(ln)
-            except Exception:
+def _edit_candidate(inbox: Inbox, cand_id: str, new_text: str) -> None:
+    if not inbox.update(cand_id, {"text": new_text}):
+        raise SystemExit(f"No such candidate to edit: {cand_id}")
+
+
+class ApprovalHandler:
+    """Tailer consumer that applies approve/reject/edit commands found in user messages."""
+
+    ns = APPROVAL
+
+    def __init__(
+        self,
+        inbox_path: str,
+        memory_dir: str,
+        seen: SeenIds,
+        index: SimilarityIndex,
+        metrics: Optional[Metrics] = None,
+        flusher: Optional[Flusher] = None,
+    ) -> None:
+        self.inbox_path = inbox_path
+        self.memory_dir = memory_dir
+        self.seen = seen
+        self.index = index
+        self.metrics = metrics or Metrics()
+        self.flusher = flusher
+        self.loops = OpenLoopQueue(index.store)
+        self.inbox = Inbox(inbox_path)
+        # A cache of pending ids: ids applied here are dropped as they are
+        # queued, and an id we haven't seen is checked against the inbox index
+        # on demand, so the inbox is never reloaded.
+        self.pending_ids = self.inbox.ids()
+        # Ids a stager in the same tailer has staged but not yet written to
+        # the inbox (see memory_curator); commands for them wait for flush().
+        self.staged_ids: Set[str] = set()
+        self._deferred: List[Tuple[str, str, str]] = []
+        self.applied = 0
+        self._queued: List[Tuple[str, str]] = []
+        self._queued_ids: Set[str] = set()
+
+    def handle(self, msg: UserMessage) -> None:
+        msg_id = msg.msg_id
+        text = msg.text
+        if msg_id in self.seen:
+            return
+
+        # Accept commands in a few forms:
+        # - "approve cand_..."
+        # - Inlined inside a larger reply blob
+        # - Bare "Approve" when the reply quotes our candidate message (contains "id: cand_...")
+        cmd = None
+        cand_id = None
+        rest = ""
+
+        for line in text.splitlines():
+            m1 = CMD_RE.match(line.strip())
+            if m1:
+                cmd = m1.group(1).lower()
+                cand_id = m1.group(2)
+                rest = (m1.group(3) or "").strip()
+                break
+
+        if cmd is None:
+            m2 = INLINE_CMD_RE.search(text)
+            if m2:
+                cmd = m2.group(1).lower()
+                cand_id = m2.group(2)
+                rest = (m2.group(3) or "").strip()
+
+        if cmd is None:
+            # Special case: user replies "Approve" without id, but includes our quoted candidate block.
+            if re.search(r"\bapprove\b", text, re.IGNORECASE):
+                m3 = CAND_ID_RE.search(text)
+                if m3:
+                    cmd = "approve"
+                    cand_id = m3.group(1)
+
+        if cmd is None:
+            # Replies to a digest: "approve 1-5", "reject 2,4", "edit 3: ...".
+            numbered = self._numbered_commands(msg)
+            if numbered is not None:
+                for cmd, cand_id, rest in numbered:
+                    self._submit(cmd, cand_id, rest)
+                self.seen.add(msg_id)
+            return
+
+        if cand_id is None:
+            return
+
+        self._submit(cmd, cand_id, rest)
+        self.seen.add(msg_id)
+
+    def close(self) -> None:
+        self.inbox.close()
+
+    def _submit(self, cmd: str, cand_id: str, rest: str) -> None:
+        if cand_id in self.staged_ids or self._deferred:
+            # Later commands queue up behind deferred ones to keep their order.
+            self._deferred.append((cmd, cand_id, rest))
+        else:
+            self._command(cmd, cand_id, rest)
+
+    def _numbered_commands(self, msg: UserMessage) -> Optional[List[Tuple[str, str, str]]]:
+        """Commands for a reply to a digest; None if `msg` has no numbered command.
+
+        Numbers are looked up in the digest that was the latest when `msg` was
+        sent. A reply with no such digest (sent before any on record, or with
+        no usable timestamp) resolves to nothing rather than to a newer digest.
+        """
+        digest: Optional[Dict[int, str]] = None
+        out: List[Tuple[str, str, str]] = []
+        for line in msg.text.splitlines():
+            line = line.strip()
+            m = NUM_CMD_RE.match(line)
+            e = None if m else NUM_EDIT_RE.match(line)
+            if not m and not e:
                 continue
-            cid = obj.get("id")
-            if isinstance(cid, str):
-                ids.add(cid)
-    return ids
-
-
-def _edit_candidate(inbox_path: str, cand_id: str, new_text: str) -> None:
-    if not os.path.exists(inbox_path):
-        raise SystemExit("No pending inbox file")
-
-    items: List[Dict[str, Any]] = []
-    found = False
-    with open(inbox_path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
+            if digest is None:
+                sent_at = parse_timestamp(msg.timestamp)
+                digest = load_digest(self.index.store, sent_at) if sent_at is not None else {}
+                if not digest:
+                    print(f"Ignoring numbered reply {msg.msg_id}: no digest on record from before it", file=sys.stderr)
+                    return []
+            if e:
+                cand_id = digest.get(int(e.group(1)))
+                if cand_id is not None:
+                    out.append(("edit", cand_id, e.group(2).strip()))
                 continue
-            try:
-                obj = json.loads(ln)
-            except Exception:
+            if m:
+                for n in parse_selection(m.group(2), list(digest)) or []:
+                    if n in digest:
+                        out.append((m.group(1).lower(), digest[n], ""))
+        return None if digest is None else out
+
+    def _command(self, cmd: str, cand_id: str, rest: str) -> None:
+        if not self._is_pending(cand_id):
+            return
+
+        if cmd == "edit":
+            if not rest:
+                return
+            # Edits land right away so an approve later in the same pass
+            # commits the edited text.
+            with self.metrics.timer("edit"):
+                _edit_candidate(self.inbox, cand_id, rest)
+                self.index.update_text(cand_id, rest)
+            # After edit, do not auto-approve; user can approve explicitly.
+            self.applied += 1
+            self.metrics.inc("edited")
+        elif cmd in {"approve", "reject"}:
+            self._queued.append((cmd, cand_id))
+            self._queued_ids.add(cand_id)
+            self.pending_ids.discard(cand_id)
+
+    def _is_pending(self, cand_id: str) -> bool:
+        if cand_id in self.pending_ids:
+            return True
+        if cand_id not in self._queued_ids and cand_id in self.inbox:
+            self.pending_ids.add(cand_id)
+            return True
+        return False
+
+    def flush(self) -> None:
+        """Commit this pass's approvals and rejections, one batch per action."""
+        # The stager is flushed first, so its candidates are in the inbox now.
+        deferred, self._deferred = self._deferred, []
+        self.staged_ids.clear()
+        for cmd, cand_id, rest in deferred:
+            self._command(cmd, cand_id, rest)
+
+        queued, self._queued = self._queued, []
+        self._queued_ids.clear()
+        for action in ("approve", "reject"):
+            ids = [cid for cmd, cid in queued if cmd == action]
+            if not ids:
                 continue
-            if obj.get("id") == cand_id:
-                obj["text"] = new_text
-                found = True
-            items.append(obj)
-
-    if not found:
-        raise SystemExit(f"No such candidate to edit: {cand_id}")
-
-    tmp = inbox_path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        for it in items:
-            f.write(json.dumps(it, ensure_ascii=False) + "\n")
-    os.replace(tmp, inbox_path)
-
-
-def _apply(memory_dir: str, inbox_path: str, action: str, cand_id: str) -> None:
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    apply_py = os.path.join(script_dir, "memory_apply.py")
-    subprocess.check_call(
-        [
-            "python3",
-            apply_py,
-            action.lower(),
-            cand_id,
-            "--memory-dir",
-            memory_dir,
-            "--inbox",
-            inbox_path,
-        ]
-    )
+            with self.metrics.timer("apply"):
+                outcomes = apply_batch(action, ids, self.memory_dir, self.inbox, self.index, self.metrics, self.loops)
+            for o in outcomes:
+                if o.status == "applied":
+                    self.applied += 1
+                elif o.status == "failed":
+                    # Still pending; a later command can retry it.
+                    self.pending_ids.add(o.id)
+                    print(f"Failed to {o.action} {o.id}: {o.error}", file=sys.stderr)
+            if action == "approve" and self.flusher is not None:
+                self.flusher.kick()
 
 
 def watch(
@@ -145,110 +236,105 @@ def watch(
     memory_dir: str,
     state_path: str,
     once: bool,
+    metrics: Optional[Metrics] = None,
+    prom_file: Optional[str] = None,
+    concurrency: int = 4,
+    min_interval: float = 0.25,
+    max_interval: float = 30.0,
+    open_loops: str = "auto",
 ) -> int:
-    state = _load_state(state_path)
-    cursors: Dict[str, int] = state.get("approval_cursors", {})
-    seen: Dict[str, bool] = state.get("seen_approval_msgs", {})
-
-    pending_ids = _load_pending_ids(inbox_path)
-    if not pending_ids:
-        return 0
-
-    def scan_once() -> int:
-        nonlocal pending_ids
-        applied = 0
-
-        for path in sorted(glob.glob(sessions_glob)):
-            start = int(cursors.get(path, 0))
-            end, lines = _iter_new_lines(path, start)
-            cursors[path] = end
-
-            for ln in lines:
-                try:
-                    obj = json.loads(ln)
-                except Exception:
-                    continue
-
-                if obj.get("type") != "message":
-                    continue
-
-                msg_id = obj.get("id")
-                if not isinstance(msg_id, str) or not msg_id:
-                    continue
-                if seen.get(msg_id):
-                    continue
-
-                text = _extract_user_text(obj)
-                if not text:
-                    continue
-
-                # Accept commands in a few forms:
-                # - "approve cand_..."
-                # - Inlined inside a larger reply blob
-                # - Bare "Approve" when the reply quotes our candidate message (contains "id: cand_...")
-                cmd = None
-                cand_id = None
-                rest = ""
-
-                for line in text.splitlines():
-                    m1 = CMD_RE.match(line.strip())
-                    if m1:
-                        cmd = m1.group(1).lower()
-                        cand_id = m1.group(2)
-                        rest = (m1.group(3) or "").strip()
-                        break
-
-                if cmd is None:
-                    m2 = INLINE_CMD_RE.search(text)
-                    if m2:
-                        cmd = m2.group(1).lower()
-                        cand_id = m2.group(2)
-                        rest = (m2.group(3) or "").strip()
-
-                if cmd is None:
-                    # Special case: user replies "Approve" without id, but includes our quoted candidate block.
-                    if re.search(r"\bapprove\b", text, re.IGNORECASE):
-                        m3 = CAND_ID_RE.search(text)
-                        if m3:
-                            cmd = "approve"
-                            cand_id = m3.group(1)
-
-                if cmd is None or cand_id is None:
-                    continue
-
-                if cand_id not in pending_ids:
-                    seen[msg_id] = True
-                    continue
-
-                if cmd == "edit":
-                    if not rest:
-                        seen[msg_id] = True
-                        continue
-                    _edit_candidate(inbox_path, cand_id, rest)
-                    # After edit, do not auto-approve; user can approve explicitly.
-                    applied += 1
-                elif cmd in {"approve", "reject"}:
-                    _apply(memory_dir, inbox_path, cmd, cand_id)
-                    applied += 1
-                    pending_ids = _load_pending_ids(inbox_path)
-
-                seen[msg_id] = True
-
-        state["approval_cursors"] = cursors
-        state["seen_approval_msgs"] = seen
-        _save_state(state_path, state)
-        return applied
-
-    if once:
-        scan_once()
-        return 0
-
-    # Simple loop mode (for background runner). Keep it conservative.
-    import time
-
-    while True:
-        scan_once()
-        time.sleep(2.0)
+    metrics = metrics if metrics is not None else Metrics()
+    if not once:
+        return _run_until_stopped(
+            watch_async(
+                sessions_glob, inbox_path, memory_dir, state_path, metrics, prom_file,
+                concurrency, min_interval, max_interval, open_loops,
+            )
+        )
+
+    with StateStore(state_path) as store:
+        handler = ApprovalHandler(inbox_path, memory_dir, store.load_seen(APPROVAL), SimilarityIndex(store), metrics)
+        try:
+            if handler.pending_ids:
+                tailer = Tailer(sessions_glob, store, APPROVAL, [handler], metrics)
+                tailer.pass_once()
+            # Also picks up anything an earlier run failed to write.
+            flush_open_loops(handler.loops, open_backend(open_loops, memory_dir), metrics)
+            export(store, "watch", metrics, prom_file)
+        finally:
+            handler.close()
+    return 0
+
+
+async def watch_async(
+    sessions_glob: str,
+    inbox_path: str,
+    memory_dir: str,
+    state_path: str,
+    metrics: Metrics,
+    prom_file: Optional[str] = None,
+    concurrency: int = 4,
+    min_interval: float = 0.25,
+    max_interval: float = 30.0,
+    open_loops: str = "auto",
+) -> int:
+    """Apply commands as they are written until cancelled.
+
+    Keeps running with an empty inbox: commands for candidates staged later are
+    picked up once they arrive. Changed session files are read concurrently;
+    cancelling the task between passes (or mid-read) leaves cursors and the
+    inbox at the last completed pass. Approved open loops are written by a
+    background flusher, which also retries failed writes.
+    """
+    store = StateStore(state_path)
+    handler: Optional[ApprovalHandler] = None
+    watcher: Optional[AsyncWatcher] = None
+    backend = open_backend(open_loops, memory_dir)
+    flusher = Flusher(state_path, backend) if backend is not None else None
+
+    def report() -> None:
+        if flusher is not None:
+            metrics.merge(flusher.take_metrics())
+        export(store, "watch", metrics, prom_file)
+
+    try:
+        index = SimilarityIndex(store)
+        handler = ApprovalHandler(inbox_path, memory_dir, store.load_seen(APPROVAL), index, metrics, flusher)
+        tailer = Tailer(sessions_glob, store, APPROVAL, [handler], metrics)
+        watcher = AsyncWatcher(sessions_glob, min_interval, max_interval)
+
+        # Catch up on anything written while we weren't running.
+        await tailer.pass_async(None, concurrency)
+        report()
+        while True:
+            changed = await watcher.wait()
+            await tailer.pass_async(changed, concurrency)
+            report()
+    finally:
+        if watcher is not None:
+            watcher.close()
+        if flusher is not None:
+            flusher.close()
+            metrics.merge(flusher.take_metrics())
+        if handler is not None:
+            handler.close()
+        store.close()
+
+
+def _run_until_stopped(coro: Coroutine[Any, Any, int]) -> int:
+    """Run `coro`, cancelling it cleanly on SIGINT or SIGTERM."""
+
+    async def runner() -> int:
+        task = asyncio.ensure_future(coro)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            return 0
+
+    return asyncio.run(runner())
 
 
 def main() -> int:
@@ -258,15 +344,37 @@ def main() -> int:
     ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_DIR)
     ap.add_argument("--state", default=DEFAULT_STATE_PATH)
     ap.add_argument("--once", action="store_true", help="Run one scan and exit")
+    ap.add_argument("--concurrency", type=int, default=4, help="Session files read at once per pass")
+    ap.add_argument(
+        "--min-interval",
+        type=float,
+        default=0.25,
+        help="Fastest poll when inotify isn't available; idle polling backs off from here",
+    )
+    ap.add_argument("--max-interval", type=float, default=30.0, help="Slowest poll when idle (no inotify)")
+    ap.add_argument("--open-loops", default="auto", metavar="SINK", help=SINK_HELP)
+    ap.add_argument("--stats", action="store_true", help="Print stage timers and counters as JSON to stderr on exit")
+    ap.add_argument("--prom-file", help="Also write Prometheus textfile-collector metrics here")
     args = ap.parse_args()
 
-    return watch(
-        sessions_glob=args.sessions_glob,
-        inbox_path=args.inbox,
-        memory_dir=args.memory_dir,
-        state_path=args.state,
-        once=args.once,
-    )
+    metrics = Metrics()
+    try:
+        return watch(
+            sessions_glob=args.sessions_glob,
+            inbox_path=args.inbox,
+            memory_dir=args.memory_dir,
+            state_path=args.state,
+            once=args.once,
+            metrics=metrics,
+            prom_file=args.prom_file,
+            concurrency=args.concurrency,
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+            open_loops=args.open_loops,
+        )
+    finally:
+        if args.stats:
+            print(json.dumps(metrics.summary()), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Callable, Iterable, Tuple
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+
+@dataclass
+class Workspace:
+    root: str
+    sessions_glob: str
+    session: str
+    memory_dir: str
+    inbox: str
+    state: str
+
+
+@pytest.fixture
+def ws(tmp_path) -> Workspace:
+    root = str(tmp_path)
+    sessions = os.path.join(root, "agents", "main", "sessions")
+    os.makedirs(sessions)
+    memory_dir = os.path.join(root, "memory")
+    return Workspace(
+        root=root,
+        sessions_glob=os.path.join(root, "agents", "*", "sessions", "*.jsonl"),
+        session=os.path.join(sessions, "s1.jsonl"),
+        memory_dir=memory_dir,
+        inbox=os.path.join(memory_dir, "inbox", "pending.jsonl"),
+        state=os.path.join(memory_dir, "state.json"),
+    )
+
+
+def user_line(msg_id: str, text: str, timestamp: str = "2026-01-01T00:00:00Z") -> str:
+    msg = {
+        "type": "message",
+        "id": msg_id,
+        "timestamp": timestamp,
+        "message": {"role": "user", "content": [{"type": "text", "text": text}]},
+    }
+    return json.dumps(msg) + "\n"
+
+
+@pytest.fixture
+def append_messages() -> Callable[[str, Iterable[Tuple[str, ...]]], None]:
+    # Each message is (id, text) or (id, text, timestamp).
+    def append(path: str, messages: Iterable[Tuple[str, ...]]) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            for m in messages:
+                f.write(user_line(*m))
+
+    return append
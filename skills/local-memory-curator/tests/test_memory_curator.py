@@ -0,0 +1,104 @@
+import datetime as dt
+import os
+import time
+from unittest import mock
+
+from memory_apply import apply_batch
+from memory_curator import Curator
+from memory_dedupe import MEMORY, SimilarityIndex
+from memory_inbox import Inbox
+from memory_scan import scan
+from memory_state import APPROVAL, SCAN, StateStore
+from memory_watch_approvals import watch
+
+WEEK_AND_A_DAY = 8 * 24 * 60 * 60
+
+
+def _pending(ws):
+    with Inbox(ws.inbox) as inbox:
+        return sorted(inbox.ids())
+
+
+def test_first_run_resumes_from_scan_cursor_without_approval_cursors(ws, append_messages):
+    append_messages(
+        ws.session,
+        [("m0", "always reply in English"), ("m1", "never push to main"), ("m2", "call me Big Dawg")],
+    )
+    scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    with Inbox(ws.inbox) as inbox, StateStore(ws.state) as store:
+        apply_batch("reject", ["cand_m0", "cand_m1"], ws.memory_dir, inbox, SimilarityIndex(store))
+        # The approval watcher never saved cursors (its --once pass had nothing to do).
+        assert len(store.load_cursors(SCAN)) == 1
+        assert len(store.load_cursors(APPROVAL)) == 0
+
+    # Seen ids have expired by the time the combined curator first runs.
+    with mock.patch("time.time", return_value=time.time() + WEEK_AND_A_DAY):
+        curator = Curator(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state, open_loops="none")
+        try:
+            curator.pass_once()
+            assert curator.take_staged() == []
+        finally:
+            curator.close()
+    assert _pending(ws) == ["cand_m2"]
+
+
+def test_first_run_feeds_each_consumer_only_lines_past_its_own_cursor(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English")])
+    scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    # The approval watcher reads the file up to here too.
+    watch(ws.sessions_glob, ws.inbox, ws.memory_dir, ws.state, once=True, open_loops="none")
+    # Only the scanner has seen these (the approval cursor is behind it).
+    append_messages(ws.session, [("m1", "never push to main"), ("m2", "reject cand_m0")])
+    scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    assert _pending(ws) == ["cand_m0", "cand_m1"]
+    append_messages(ws.session, [("m3", "call me Big Dawg")])
+
+    with mock.patch("time.time", return_value=time.time() + WEEK_AND_A_DAY):
+        curator = Curator(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state, open_loops="none")
+        try:
+            curator.pass_once()
+            staged = [c.id for c in curator.take_staged()]
+        finally:
+            curator.close()
+    # m1 is not restaged; the reject the watcher hadn't got to yet is applied.
+    assert staged == ["cand_m3"]
+    assert _pending(ws) == ["cand_m1", "cand_m3"]
+
+
+def test_command_for_a_candidate_staged_in_the_same_pass(ws, append_messages):
+    append_messages(
+        ws.session,
+        [
+            ("m0", "always reply in English"),
+            ("m1", "approve cand_m0"),
+            ("m2", "call me Big Dawg"),
+            ("m3", "edit cand_m2: Sam"),
+            ("m4", "reject cand_m2"),
+        ],
+    )
+    curator = Curator(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state, open_loops="none")
+    try:
+        curator.pass_once()
+        curator.pass_once()
+        assert [c.id for c in curator.take_staged()] == ["cand_m0", "cand_m2"]
+    finally:
+        curator.close()
+    assert _pending(ws) == []
+    with open(os.path.join(ws.memory_dir, f"{dt.date.today().isoformat()}.md"), encoding="utf-8") as f:
+        entries = f.read().split("\n## ")[1:]
+    assert ["(approve)" in e and "always reply in English" in e for e in entries] == [True, False]
+    assert "(reject)" in entries[1] and "- Sam" in entries[1]
+    with StateStore(ws.state) as store:
+        index = SimilarityIndex(store)
+        assert index.lookup("always reply in English").kind == MEMORY
+        assert index.lookup("Sam") is None
+
+
+def test_curator_close_closes_both_consumers(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English")])
+    curator = Curator(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state, open_loops="none")
+    curator.pass_once()
+    with mock.patch.object(Inbox, "close", autospec=True, side_effect=Inbox.close) as inbox_close:
+        curator.close()
+    # The stager's inbox (opened to append m0) and the approval handler's.
+    assert inbox_close.call_count == 2
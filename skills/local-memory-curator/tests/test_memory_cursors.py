@@ -0,0 +1,37 @@
+from memory_cursors import CursorSet
+
+
+def _read_to_end(path: str) -> CursorSet:
+    cursors = CursorSet()
+    cursors.start(path)
+    with open(path, "rb") as f:
+        cursors.advance(path, len(f.read()))
+    cursors.take_changes()  # takes the fingerprint
+    return cursors
+
+
+def test_rewritten_file_resumes_at_line_boundary_not_zero(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    with open(path, "wb") as f:
+        f.write(b"one\ntwo\nthree\n")
+    cursors = _read_to_end(path)
+    old = cursors.start(path)
+
+    # Same inode, new content: the old position can't be found in it.
+    with open(path, "wb") as f:
+        f.write(b"alpha\nbravo\ncharlie\ndelta\n")
+    offset = cursors.start(path)
+    assert offset == len(b"alpha\nbravo\n") <= old
+    assert cursors.events == {"rewritten": 1}
+
+
+def test_truncated_file_resumes_at_last_line_within_new_size(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    with open(path, "wb") as f:
+        f.write(b"one\ntwo\nthree\nfour\n")
+    cursors = _read_to_end(path)
+
+    with open(path, "wb") as f:
+        f.write(b"uno\ndos\ntr")
+    assert cursors.start(path) == len(b"uno\ndos\n")
+    assert cursors.events == {"truncated": 1}
@@ -0,0 +1,14 @@
+from memory_notify_format import parse_selection
+
+
+def test_parse_selection():
+    assert parse_selection("1-3, 5", [1, 2, 3, 4, 5]) == [1, 2, 3, 5]
+    assert parse_selection("3-1 2", [1, 2, 3]) == [1, 2, 3]
+    assert parse_selection("all", [2, 1]) == [1, 2]
+    assert parse_selection("cand_x", [1]) is None
+
+
+def test_parse_selection_cuts_ranges_to_the_digest():
+    assert parse_selection("1-999999999", [1, 2, 3]) == [1, 2, 3]
+    assert parse_selection("999999990-999999999, 2", [1, 2, 3]) == [2]
+    assert parse_selection("1-5", []) == []
@@ -0,0 +1,43 @@
+from unittest import mock
+
+import pytest
+
+from memory_dedupe import SimilarityIndex
+from memory_inbox import Inbox
+from memory_scan import scan
+from memory_state import StateStore
+
+
+def _pending(ws):
+    with Inbox(ws.inbox) as inbox:
+        return sorted(inbox.ids())
+
+
+def test_failed_inbox_append_leaves_nothing_to_swallow_the_retry(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English"), ("m1", "always reply in English!")])
+    with mock.patch.object(Inbox, "append", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    with StateStore(ws.state) as store:
+        assert SimilarityIndex(store).lookup("always reply in English") is None
+
+    staged = scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    # m1 still folds onto m0 within the pass, as before the crash.
+    assert [c.id for c in staged] == ["cand_m0"]
+    assert _pending(ws) == ["cand_m0"]
+    with StateStore(ws.state) as store:
+        match = SimilarityIndex(store).lookup("always reply in English")
+        hits = store.conn.execute("SELECT hits FROM sim_entries WHERE id = 'cand_m0'").fetchone()
+    assert match is not None and match.id == "cand_m0"
+    assert hits == (2,)
+
+
+def test_scan_closes_inbox_and_store_when_the_pass_fails(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English")])
+    with mock.patch.object(Inbox, "close", autospec=True, side_effect=Inbox.close) as inbox_close, \
+            mock.patch.object(StateStore, "close", autospec=True, side_effect=StateStore.close) as store_close, \
+            mock.patch("memory_scan.export", side_effect=RuntimeError("boom")):
+        with pytest.raises(RuntimeError):
+            scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    assert inbox_close.call_count == 1
+    assert store_close.call_count == 1
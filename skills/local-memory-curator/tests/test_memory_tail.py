@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+from memory_tail import AsyncWatcher, InotifyWatcher
+
+
+def test_inotify_reports_files_in_the_first_directory_found_after_startup(tmp_path, append_messages):
+    sessions_glob = str(tmp_path / "agents" / "*" / "sessions" / "*.jsonl")
+    try:
+        watcher = InotifyWatcher(sessions_glob, rescan_interval=0.05)
+    except OSError:
+        pytest.skip("needs inotify")
+    try:
+        # A session directory shows up with a file already in it.
+        (tmp_path / "agents" / "main" / "sessions").mkdir(parents=True)
+        session = str(tmp_path / "agents" / "main" / "sessions" / "s1.jsonl")
+        append_messages(session, [("m0", "hello")])
+        assert watcher.wait(timeout=2) == [session]
+    finally:
+        watcher.close()
+
+
+def test_async_watcher_is_idle_while_a_pass_runs(ws, append_messages):
+    append_messages(ws.session, [("m0", "hello")])
+
+    async def run():
+        watcher = AsyncWatcher(ws.sessions_glob)
+        try:
+            if not isinstance(watcher.watcher, InotifyWatcher):
+                pytest.skip("needs inotify")
+            # A write lands while a (simulated) pass is busy elsewhere on the loop.
+            append_messages(ws.session, [("m1", "world")])
+            cpu = time.process_time()
+            await asyncio.sleep(0.3)
+            busy = time.process_time() - cpu
+            changed = await asyncio.wait_for(watcher.wait(), timeout=5)
+        finally:
+            watcher.close()
+        return busy, changed
+
+    busy, changed = asyncio.run(run())
+    assert busy < 0.1
+    assert changed == [ws.session]
@@ -0,0 +1,62 @@
+import datetime as dt
+import time
+from unittest import mock
+
+import pytest
+
+from memory_inbox import Inbox
+from memory_notify_format import digest, load_digest
+from memory_scan import scan
+from memory_state import StateStore
+from memory_watch_approvals import watch
+
+
+def test_watch_once_closes_inbox_and_store_when_the_pass_fails(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English")])
+    scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+    append_messages(ws.session, [("m1", "approve cand_m0")])
+
+    with mock.patch.object(Inbox, "close", autospec=True, side_effect=Inbox.close) as inbox_close, \
+            mock.patch.object(StateStore, "close", autospec=True, side_effect=StateStore.close) as store_close, \
+            mock.patch.object(StateStore, "save", side_effect=RuntimeError("boom")):
+        with pytest.raises(RuntimeError):
+            watch(ws.sessions_glob, ws.inbox, ws.memory_dir, ws.state, once=True, open_loops="none")
+    assert inbox_close.call_count == 1
+    assert store_close.call_count == 1
+
+
+def _iso(t: float) -> str:
+    return dt.datetime.fromtimestamp(t, dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def test_numbered_reply_uses_the_digest_current_when_it_was_sent(ws, append_messages):
+    append_messages(ws.session, [("m0", "always reply in English"), ("m1", "call me Big Dawg")])
+    scan(ws.sessions_glob, ws.memory_dir, ws.inbox, ws.state)
+
+    first = time.time() - 100
+    with Inbox(ws.inbox) as inbox, StateStore(ws.state) as store:
+        with mock.patch("time.time", return_value=first):
+            digest(inbox, store, 1, "rule")
+        with mock.patch("time.time", return_value=first + 50):
+            digest(inbox, store, 1, "preference")
+        # Both digests show a single item as number 1.
+        assert load_digest(store) == {1: "cand_m1"}
+        assert load_digest(store, first + 10) == {1: "cand_m0"}
+
+    append_messages(
+        ws.session,
+        [
+            # A reply to the first digest, read after the second was sent.
+            ("m2", "approve 1", _iso(first + 10)),
+            # Sent before any digest existed: must not act on either.
+            ("m3", "reject 1", _iso(first - 10)),
+        ],
+    )
+    watch(ws.sessions_glob, ws.inbox, ws.memory_dir, ws.state, once=True, open_loops="none")
+
+    with Inbox(ws.inbox) as inbox:
+        assert sorted(inbox.ids()) == ["cand_m1"]
+    with open(f"{ws.memory_dir}/{dt.date.today().isoformat()}.md", encoding="utf-8") as f:
+        memory = f.read()
+    assert "always reply in English" in memory and "(approve)" in memory
+    assert "Big Dawg" not in memory
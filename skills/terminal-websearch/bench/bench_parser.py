@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import html
+import json
+import os
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "scripts"))
+
+from ddg_search import DuckDuckGoHTMLParser, SearchResult, _clean_text, _normalize_ddg_href  # noqa: E402
+
+
+DEFAULT_FIXTURES = os.path.join(BENCH_DIR, "fixtures")
+
+# Feed sizes for the streaming check: tags, entities and multi-byte text split
+# at every kind of boundary must not change what comes out.
+CHUNK_SIZES = (1, 7, 64, 1024, 16 * 1024)
+
+
+class LegacyDuckDuckGoHTMLParser(HTMLParser):
+    # The original parser, kept as the reference the optimized one must match.
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._in_result = False
+        self._in_title_link = False
+        self._in_snippet = False
+
+        self._cur_title_parts: List[str] = []
+        self._cur_url: Optional[str] = None
+        self._cur_snippet_parts: List[str] = []
+
+        self.results: List[SearchResult] = []
+
+    def handle_starttag(self, tag: str, attrs):
+        attrs_dict = dict(attrs)
+
+        if tag == "div" and "class" in attrs_dict:
+            cls = attrs_dict["class"]
+            if "result" in cls.split():
+                self._start_result()
+
+        if not self._in_result:
+            return
+
+        if tag == "a" and "class" in attrs_dict:
+            cls = attrs_dict["class"]
+            if "result__a" in cls.split():
+                self._in_title_link = True
+                href = attrs_dict.get("href")
+                if href:
+                    self._cur_url = _normalize_ddg_href(href)
+
+        if tag in {"a", "div", "span"} and "class" in attrs_dict:
+            cls = attrs_dict["class"]
+            if any(c in cls.split() for c in ["result__snippet", "result__extras__snippet"]):
+                self._in_snippet = True
+
+    def handle_endtag(self, tag: str):
+        if not self._in_result:
+            return
+
+        if tag == "a" and self._in_title_link:
+            self._in_title_link = False
+
+        if self._in_snippet and tag in {"a", "div", "span"}:
+            self._in_snippet = False
+
+        if tag == "div" and self._in_result:
+            self._maybe_finalize_result()
+
+    def handle_data(self, data: str):
+        if not self._in_result:
+            return
+
+        if self._in_title_link:
+            self._cur_title_parts.append(data)
+
+        if self._in_snippet:
+            self._cur_snippet_parts.append(data)
+
+    def _start_result(self) -> None:
+        self._in_result = True
+        self._in_title_link = False
+        self._in_snippet = False
+        self._cur_title_parts = []
+        self._cur_url = None
+        self._cur_snippet_parts = []
+
+    def _maybe_finalize_result(self) -> None:
+        title = _legacy_clean_text("".join(self._cur_title_parts))
+        url = (self._cur_url or "").strip()
+        snippet = _legacy_clean_text("".join(self._cur_snippet_parts))
+
+        if title and url:
+            self.results.append(SearchResult(title=title, url=url, snippet=snippet))
+            self._in_result = False
+
+
+def _legacy_clean_text(s: str) -> str:
+    s = html.unescape(s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def parse(parser_cls: Callable[[], HTMLParser], text: str, chunk: int = 0) -> List[SearchResult]:
+    p = parser_cls()
+    if chunk:
+        for i in range(0, len(text), chunk):
+            p.feed(text[i : i + chunk])
+    else:
+        p.feed(text)
+    p.close()
+    return p.results  # type: ignore[attr-defined]
+
+
+def check_equivalence(fixtures: Dict[str, str]) -> List[str]:
+    """Every way the optimized parser can be fed must give the legacy results."""
+    problems: List[str] = []
+    for name, text in fixtures.items():
+        want = parse(LegacyDuckDuckGoHTMLParser, text)
+        for chunk in (0,) + CHUNK_SIZES:
+            got = parse(DuckDuckGoHTMLParser, text, chunk)
+            if got != want:
+                problems.append(f"{name} (chunk={chunk or 'all'}): {len(got)} results, expected {len(want)}")
+        streamed = list(DuckDuckGoHTMLParser().iter_results(text[i : i + 512] for i in range(0, len(text), 512)))
+        if streamed != want:
+            problems.append(f"{name} (iter_results): {len(streamed)} results, expected {len(want)}")
+
+    # _clean_text leans on str.split() and \s agreeing on whitespace.
+    samples = ["", "   ", " a  b\tc\n", "&amp;amp; &nbsp;x&nbsp;", "&lt;b&gt;   y　"]
+    samples.append("".join(chr(c) + "x" for c in range(0x3000 + 1)))
+    samples.append("".join(chr(c) for c in range(0x110000) if chr(c).isspace() or c in range(0x1C, 0x20)))
+    for s in samples:
+        if _clean_text(s) != _legacy_clean_text(s):
+            problems.append(f"_clean_text differs on {s[:40]!r}")
+    return problems
+
+
+def _time(text: str, repeat: int) -> Tuple[float, float]:
+    # Interleaved so both parsers see the same machine noise; best of `repeat`.
+    legacy = optimized = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        parse(LegacyDuckDuckGoHTMLParser, text)
+        t1 = time.perf_counter()
+        parse(DuckDuckGoHTMLParser, text)
+        t2 = time.perf_counter()
+        legacy = min(legacy, t1 - t0)
+        optimized = min(optimized, t2 - t1)
+    return legacy, optimized
+
+
+def load_fixtures(path: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for f in sorted(glob.glob(os.path.join(path, "*.html"))):
+        with open(f, "r", encoding="utf-8") as fh:
+            out[os.path.splitext(os.path.basename(f))[0]] = fh.read()
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Check the DDG HTML parser against the original on saved pages, then benchmark both."
+    )
+    ap.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Directory of saved DDG result pages (*.html)")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--check-only", action="store_true", help="Only run the equivalence check")
+    args = ap.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        raise SystemExit(f"No fixtures in {args.fixtures}")
+
+    problems = check_equivalence(fixtures)
+    for p in problems:
+        print(f"MISMATCH {p}", file=sys.stderr)
+    if args.check_only:
+        print(json.dumps({"fixtures": len(fixtures), "mismatches": len(problems)}))
+        return 1 if problems else 0
+
+    per_page = {name: _time(text, args.repeat) for name, text in fixtures.items()}
+    legacy_s = sum(t[0] for t in per_page.values())
+    new_s = sum(t[1] for t in per_page.values())
+    mb = sum(len(t.encode("utf-8")) for t in fixtures.values()) / 1e6
+    print(
+        json.dumps(
+            {
+                "fixtures": len(fixtures),
+                "bytes": round(mb * 1e6),
+                "legacy_ms": round(legacy_s * 1000, 3),
+                "optimized_ms": round(new_s * 1000, 3),
+                "legacy_mb_per_s": round(mb / legacy_s, 2),
+                "optimized_mb_per_s": round(mb / new_s, 2),
+                "speedup": round(legacy_s / new_s, 2),
+                "per_fixture_speedup": {name: round(a / b, 2) for name, (a, b) in per_page.items()},
+                "mismatches": len(problems),
+            },
+            indent=2,
+        )
+    )
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
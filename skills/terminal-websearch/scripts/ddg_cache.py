@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/terminal-websearch/search.sqlite3")
+DEFAULT_TTL_S = 6 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Hit states: within the TTL; past it but inside the stale-while-revalidate
+# window (serve it, refresh in the background); or past both, which only
+# counts as a miss but is still handed back so callers can fall back to it
+# when the network is down.
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+def normalize_query(query: str) -> str:
+    """Queries differing only in case or whitespace share an entry."""
+    return " ".join(query.casefold().split())
+
+
+@dataclass
+class Hit:
+    value: Any
+    count: int
+    complete: bool
+    age_s: float
+    state: str
+
+
+class SearchCache:
+    """Persistent search-result cache with a TTL and least-recently-used eviction.
+
+    Entries are keyed by namespace (who produced the value and in what form)
+    and normalized query. Each records how many results it holds and whether
+    that was everything the source had, so one entry answers any request for
+    as many results or fewer.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        stale_s: float = 0.0,
+    ) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.stale_s = stale_s
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.conn = sqlite3.connect(path, timeout=10.0, isolation_level=None)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+        except BaseException:
+            self.conn.close()
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SearchCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @staticmethod
+    def key(ns: str, query: str) -> str:
+        return f"{ns}\x1f{normalize_query(query)}"
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        self.conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?",
+            (name, n, n),
+        )
+
+    def lookup(self, ns: str, query: str, n: int = 0) -> Optional[Hit]:
+        """The entry for `query` if it holds at least `n` results (or all there were).
+
+        Fresh and stale hits count as hits; an expired entry is returned too
+        but counted as a miss.
+        """
+        key = self.key(ns, query)
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT value, count, complete, fetched_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] < n and not row[2]):
+            self._bump("misses")
+            return None
+
+        age = max(0.0, now - row[3])
+        if age <= self.ttl_s:
+            state = FRESH
+        elif age <= self.ttl_s + self.stale_s:
+            state = STALE
+        else:
+            state = EXPIRED
+        self._bump({FRESH: "hits", STALE: "stale_hits", EXPIRED: "misses"}[state])
+        if state != EXPIRED:
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return Hit(json.loads(row[0]), int(row[1]), bool(row[2]), age, state)
+
+    def store(self, ns: str, query: str, value: Any, count: int, complete: bool) -> None:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, count, complete, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(ns, query), json.dumps(value, ensure_ascii=False), count, int(complete), now, now),
+            )
+            self._bump("stores")
+            excess = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self._bump("evictions", excess)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def note(self, name: str) -> None:
+        """Count an event the cache can't see itself (e.g. an expired entry served while offline)."""
+        self._bump(name)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {name: int(v) for name, v in self.conn.execute("SELECT name, value FROM stats")}
+        for name in ("hits", "stale_hits", "misses", "stores", "evictions"):
+            out.setdefault(name, 0)
+        lookups = out["hits"] + out["stale_hits"] + out["misses"]
+        out["hit_ratio"] = round((out["hits"] + out["stale_hits"]) / lookups, 4) if lookups else None
+        out["entries"] = int(self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+        out["path"] = self.path
+        return out
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM entries")
+        self.conn.execute("DELETE FROM stats")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Search result cache shared by ddg_search.py and websearch.sh (raw text values via get/put)."
+    )
+    ap.add_argument("command", choices=["get", "put", "stats", "clear"])
+    ap.add_argument("ns", nargs="?", help="Namespace (get/put), e.g. ddgr-json:5")
+    ap.add_argument("query", nargs="*", help="Query (get/put)")
+    ap.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Cache database")
+    ap.add_argument("--ttl", type=float, default=DEFAULT_TTL_S, help="Seconds an entry stays fresh")
+    ap.add_argument("--stale", type=float, default=0.0, help="get: also serve entries up to this many seconds past the TTL (exit 3)")
+    ap.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    args = ap.parse_args()
+
+    with SearchCache(args.cache, args.ttl, args.max_entries, args.stale) as cache:
+        if args.command == "stats":
+            print(json.dumps(cache.stats()))
+            return 0
+        if args.command == "clear":
+            cache.clear()
+            return 0
+
+        if not args.ns or not args.query:
+            ap.error(f"{args.command} needs a namespace and a query")
+        query = " ".join(args.query)
+        if args.command == "put":
+            cache.store(args.ns, query, sys.stdin.read(), 1, True)
+            return 0
+
+        # get: 0 = fresh hit, 3 = stale hit (caller should refresh), 1 = miss.
+        hit = cache.lookup(args.ns, query)
+        if hit is None or hit.state == EXPIRED:
+            return 1
+        sys.stdout.write(hit.value)
+        return 0 if hit.state == FRESH else 3
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
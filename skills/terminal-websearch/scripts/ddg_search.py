@@ -1,18 +1,43 @@
 #!/usr/bin/env python3
 
 import argparse
+import base64
+import codecs
+import concurrent.futures
+import contextlib
 import html
+import http.client
+import json
+import os
+import queue
 import re
+import sqlite3
+import ssl
+import subprocess
 import sys
+import threading
+import time
 import urllib.parse
 import urllib.request
-from dataclasses import dataclass
+import zlib
+from dataclasses import asdict, dataclass
 from html.parser import HTMLParser
-from typing import List, Optional
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ddg_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S, EXPIRED, FRESH, Hit, SearchCache
 
 
 DDG_HTML_URL = "https://html.duckduckgo.com/html/"
 
+# Cache namespace for parsed results from this scraper.
+CACHE_NS = "ddg-html"
+
+# Upper bound on result pages followed for one search.
+DEFAULT_MAX_PAGES = 10
+
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+
 
 @dataclass
 class SearchResult:
@@ -21,6 +46,14 @@ class SearchResult:
     snippet: str
 
 
+@dataclass
+class NextPage:
+    """The page's "Next" form: where to POST it and its fields."""
+
+    action: str
+    fields: Dict[str, str]
+
+
 class DuckDuckGoHTMLParser(HTMLParser):
     """Best-effort parser for DuckDuckGo's /html endpoint.
 
@@ -37,54 +70,106 @@ class DuckDuckGoHTMLParser(HTMLParser):
         self._cur_url: Optional[str] = None
         self._cur_snippet_parts: List[str] = []
 
+        self._form: Optional[Dict[str, str]] = None
+        self._form_action = ""
+        self._form_is_next = False
+
         self.results: List[SearchResult] = []
+        self.next_page: Optional[NextPage] = None
+
+    def iter_results(self, chunks: Iterable[str]) -> Iterator[SearchResult]:
+        """Feed `chunks` in turn, yielding each result as soon as it is complete."""
+        done = 0
+        for chunk in chunks:
+            self.feed(chunk)
+            while done < len(self.results):
+                done += 1
+                yield self.results[done - 1]
+        self.close()
+        yield from self.results[done:]
+
+    def updatepos(self, i: int, j: int) -> int:
+        # Line/column tracking is only used by getpos(), which nothing here calls.
+        return j
+
+    def parse_starttag(self, i: int) -> int:
+        # Outside a result block only a div can matter: for any other start
+        # tag, find its end and move on without parsing its attributes. Tags
+        # that switch the tokenizer into raw-text mode still go the long way.
+        if not self._in_result:
+            m = _TAG_NAME_RE.match(self.rawdata, i + 1)
+            if m is not None and m.group(1).lower() not in _FULL_PARSE_TAGS:
+                endpos = self.check_for_whole_start_tag(i)
+                if endpos >= 0:
+                    self.lasttag = m.group(1).lower()
+                return endpos
+        return super().parse_starttag(i)
 
     def handle_starttag(self, tag: str, attrs):
-        attrs_dict = dict(attrs)
-
-        if tag == "div" and "class" in attrs_dict:
-            cls = attrs_dict["class"]
-            if "result" in cls.split():
-                self._start_result()
+        if tag in _FORM_TAGS:
+            self._form_tag(tag, attrs)
+            return
+        # Only a, div and span carry the classes we look for, and outside a
+        # result block only a div can start one.
+        if tag not in _RESULT_TAGS or (tag != "div" and not self._in_result):
+            return
+        cls = href = None
+        for name, value in attrs:
+            if name == "class":
+                cls = value
+            elif name == "href":
+                href = value
+        if not cls:
+            return
+        classes = cls.split()
 
+        if tag == "div" and "result" in classes:
+            self._start_result()
         if not self._in_result:
             return
 
-        if tag == "a" and "class" in attrs_dict:
-            cls = attrs_dict["class"]
-            if "result__a" in cls.split():
-                self._in_title_link = True
-                href = attrs_dict.get("href")
-                if href:
-                    self._cur_url = _normalize_ddg_href(href)
+        if tag == "a" and "result__a" in classes:
+            self._in_title_link = True
+            if href:
+                self._cur_url = _normalize_ddg_href(href)
 
-        if tag in {"a", "div", "span"} and "class" in attrs_dict:
-            cls = attrs_dict["class"]
-            if any(c in cls.split() for c in ["result__snippet", "result__extras__snippet"]):
-                self._in_snippet = True
+        if "result__snippet" in classes or "result__extras__snippet" in classes:
+            self._in_snippet = True
 
     def handle_endtag(self, tag: str):
+        if tag == "form":
+            if self._form is not None and self._form_is_next:
+                self.next_page = NextPage(urllib.parse.urljoin(DDG_HTML_URL, self._form_action), self._form)
+            self._form = None
         if not self._in_result:
             return
-
-        if tag == "a" and self._in_title_link:
+        if tag == "a":
             self._in_title_link = False
-
-        if self._in_snippet and tag in {"a", "div", "span"}:
+        if tag in _RESULT_TAGS:
             self._in_snippet = False
-
-        if tag == "div" and self._in_result:
-            self._maybe_finalize_result()
+            if tag == "div":
+                self._maybe_finalize_result()
 
     def handle_data(self, data: str):
-        if not self._in_result:
-            return
-
-        if self._in_title_link:
-            self._cur_title_parts.append(data)
-
-        if self._in_snippet:
-            self._cur_snippet_parts.append(data)
+        if self._in_result:
+            if self._in_title_link:
+                self._cur_title_parts.append(data)
+            if self._in_snippet:
+                self._cur_snippet_parts.append(data)
+
+    def _form_tag(self, tag: str, attrs) -> None:
+        # Pagination is a plain form per direction; the one whose submit
+        # button says "Next" holds the fields for the following page.
+        a = dict(attrs)
+        if tag == "form":
+            self._form = {}
+            self._form_action = a.get("action") or ""
+            self._form_is_next = False
+        elif self._form is not None:
+            if (a.get("type") or "").lower() == "submit":
+                self._form_is_next |= (a.get("value") or "").strip().lower().startswith("next")
+            elif a.get("name"):
+                self._form[a["name"]] = a.get("value") or ""
 
     def _start_result(self) -> None:
         self._in_result = True
@@ -95,19 +180,30 @@ class DuckDuckGoHTMLParser(HTMLParser):
         self._cur_snippet_parts = []
 
     def _maybe_finalize_result(self) -> None:
-        title = _clean_text("".join(self._cur_title_parts))
+        # Every closing div inside a result lands here; the text is only
+        # cleaned once there is a title and a URL to go with it.
         url = (self._cur_url or "").strip()
-        snippet = _clean_text("".join(self._cur_snippet_parts))
-
-        if title and url:
+        if not url or not self._cur_title_parts:
+            return
+        title = _clean_text("".join(self._cur_title_parts))
+        if title:
+            snippet = _clean_text("".join(self._cur_snippet_parts))
             self.results.append(SearchResult(title=title, url=url, snippet=snippet))
             self._in_result = False
 
 
+_RESULT_TAGS = frozenset({"a", "div", "span"})
+_FORM_TAGS = frozenset({"form", "input"})
+_FULL_PARSE_TAGS = frozenset(
+    {"div", "form", "input", "plaintext", *HTMLParser.CDATA_CONTENT_ELEMENTS, *getattr(HTMLParser, "RCDATA_CONTENT_ELEMENTS", ())}
+)
+# How HTMLParser reads a tag name after "<".
+_TAG_NAME_RE = re.compile(r"([a-zA-Z][^\t\n\r\f />\x00]*)(?:\s|/(?!>))*")
+
+
 def _clean_text(s: str) -> str:
-    s = html.unescape(s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    # str.split() and re's \s agree on what counts as whitespace.
+    return " ".join(html.unescape(s).split())
 
 
 def _normalize_ddg_href(href: str) -> str:
@@ -125,57 +221,609 @@ def _normalize_ddg_href(href: str) -> str:
         return href
 
 
-def ddg_search(query: str, timeout_s: int = 15) -> List[SearchResult]:
-    params = urllib.parse.urlencode({"q": query})
-    url = f"{DDG_HTML_URL}?{params}"
+class FetchError(OSError):
+    """A response we can't use (non-2xx status, protocol error)."""
 
-    req = urllib.request.Request(
-        url,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh) mo-skills/terminal-websearch",
-            "Accept": "text/html,application/xhtml+xml",
-        },
-        method="GET",
-    )
 
-    with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-        body = resp.read().decode("utf-8", errors="replace")
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one origin, shared between threads.
+
+    A connection goes back to the pool only once its response has been read to
+    the end. When the reader stops early, a remainder of at most `drain_max`
+    bytes that arrives within `drain_s` is read off so the connection can be
+    kept (cheaper than a new handshake); otherwise the connection is closed.
+
+    With a `proxy` (an http:// URL, as from `urllib.request.getproxies()`),
+    HTTPS goes through a CONNECT tunnel and plain HTTP is sent to the proxy
+    with absolute request targets, as urllib does.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        size: int = 8,
+        drain_max: int = 16 * 1024,
+        drain_s: float = 0.02,
+        proxy: Optional[str] = None,
+    ) -> None:
+        u = urllib.parse.urlsplit(base_url)
+        self.scheme = u.scheme
+        self.host = u.hostname or ""
+        self.port = u.port
+        self.origin = f"{u.scheme}://{u.netloc}"
+        self.size = size
+        self.drain_max = drain_max
+        self.drain_s = drain_s
+        self.proxy = proxy
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._ssl = ssl.create_default_context() if u.scheme == "https" else None
+        self._proxy_headers: Dict[str, str] = {}
+        if proxy is not None:
+            p = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            self._proxy_host, self._proxy_port = p.hostname or "", p.port or 8080
+            if p.username is not None:
+                creds = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+                self._proxy_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(creds.encode()).decode("ascii")
+
+    def _connect(self, timeout_s: float) -> http.client.HTTPConnection:
+        if self.proxy is None:
+            host, port = self.host, self.port
+        else:
+            host, port = self._proxy_host, self._proxy_port
+        if self._ssl is not None:
+            conn: http.client.HTTPConnection = http.client.HTTPSConnection(
+                host, port, timeout=timeout_s, context=self._ssl
+            )
+            if self.proxy is not None:
+                conn.set_tunnel(self.host, self.port, headers=self._proxy_headers)
+            return conn
+        return http.client.HTTPConnection(host, port, timeout=timeout_s)
+
+    @contextlib.contextmanager
+    def request(
+        self,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: Optional[bytes] = None,
+        timeout_s: float = 15,
+    ) -> Iterator[http.client.HTTPResponse]:
+        if self.proxy is not None and self._ssl is None:
+            # Through a proxy, plain HTTP asks for the whole URL.
+            path = self.origin + path
+            headers = {**headers, **self._proxy_headers}
+        resp = None
+        conn = None
+        for attempt in range(2):
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect(timeout_s)
+                reused = False
+            conn.timeout = timeout_s
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout_s)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                # The server may have dropped an idle keep-alive connection;
+                # one retry on a new connection covers that.
+                if reused and not attempt and isinstance(e, (ConnectionError, http.client.BadStatusLine)):
+                    continue
+                if isinstance(e, OSError):
+                    raise
+                raise FetchError(str(e)) from e
+        assert resp is not None and conn is not None
+        try:
+            yield resp
+        except GeneratorExit:
+            # A streaming reader was closed once it had what it needed.
+            self._release(conn, resp)
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, resp)
+
+    def _release(self, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        if not resp.isclosed() and not resp.will_close and resp.length is not None and resp.length <= self.drain_max:
+            deadline = time.monotonic() + self.drain_s
+            try:
+                if conn.sock is not None:
+                    conn.sock.settimeout(self.drain_s)
+                while not resp.isclosed() and time.monotonic() < deadline:
+                    _read_some(resp, 4096)
+            except (OSError, http.client.HTTPException):
+                pass
+        if resp.isclosed() and not resp.will_close and self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(url: str) -> ConnectionPool:
+    """The shared pool for `url`'s origin, through the proxy the environment sets for it, if any."""
+    u = urllib.parse.urlsplit(url)
+    origin = f"{u.scheme}://{u.netloc}"
+    proxy = _proxy_for(u.scheme, u.hostname or "")
+    key = f"{origin} {proxy or ''}"
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(origin, proxy=proxy)
+        return pool
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[str]:
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    return proxy
+
+
+def _read_some(resp: http.client.HTTPResponse, n: int) -> bytes:
+    """`resp.read1`, but the response is marked done as soon as its Content-Length is used up.
+
+    Raises IncompleteRead if the connection ends before Content-Length does
+    (`read1` itself just returns b"").
+    """
+    chunk = resp.read1(n)
+    if resp.length == 0:
+        resp.read()
+    elif not chunk and n and resp.length:
+        raise http.client.IncompleteRead(b"", resp.length)
+    return chunk
+
+
+def iter_body(resp: http.client.HTTPResponse, chunk_size: int = 16 * 1024) -> Iterator[bytes]:
+    """The response body in chunks as they arrive, gunzipped if the server compressed it.
+
+    No chunk is larger than `chunk_size`, however well the body compressed.
+    A body cut short or that won't inflate raises FetchError.
+    """
+    try:
+        yield from _iter_body(resp, chunk_size)
+    except (http.client.HTTPException, zlib.error) as e:
+        raise FetchError(f"bad response body: {e!r}") from e
+
+
+def _iter_body(resp: http.client.HTTPResponse, chunk_size: int) -> Iterator[bytes]:
+    encoding = resp.getheader("Content-Encoding", "").strip().lower()
+    if encoding not in ("", "identity", "gzip", "x-gzip"):
+        raise FetchError(f"unsupported Content-Encoding: {encoding}")
+    inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding.endswith("gzip") else None
+    while True:
+        chunk = _read_some(resp, chunk_size)
+        if not chunk:
+            break
+        if inflate is None:
+            yield chunk
+            continue
+        while chunk:
+            out = inflate.decompress(chunk, chunk_size)
+            chunk = inflate.unconsumed_tail
+            if out:
+                yield out
+    if inflate is not None:
+        tail = inflate.flush()
+        if tail:
+            yield tail
+
+
+def iter_text(resp: http.client.HTTPResponse) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(response_charset(resp))(errors="replace")
+    for chunk in iter_body(resp):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def response_charset(resp: http.client.HTTPResponse) -> str:
+    charset = resp.headers.get_content_charset() or "utf-8"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        return "utf-8"
+    return charset
 
+
+def _iter_page(
+    query: str, page: Optional[NextPage], timeout_s: int, parser: DuckDuckGoHTMLParser
+) -> Iterator[SearchResult]:
+    """Stream one result page through `parser`: the first (GET) or the one behind a Next form (POST).
+
+    Redirects are followed; 301/302/303 turn a POST into a GET, as browsers do.
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh) mo-skills/terminal-websearch",
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Encoding": "gzip",
+        "Connection": "keep-alive",
+    }
+    body = None
+    if page is None:
+        url = f"{DDG_HTML_URL}?{urllib.parse.urlencode({'q': query})}"
+        method = "GET"
+    else:
+        url = page.action
+        method = "POST"
+        body = urllib.parse.urlencode(page.fields).encode("utf-8")
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    for _ in range(MAX_REDIRECTS + 1):
+        u = urllib.parse.urlsplit(url)
+        path = f"{u.path}?{u.query}" if u.query else u.path or "/"
+        with pool_for(url).request(method, path, headers, body, timeout_s) as resp:
+            location = resp.getheader("Location")
+            if resp.status in REDIRECT_STATUSES and location:
+                url = urllib.parse.urljoin(url, location)
+                if resp.status in (301, 302, 303):
+                    method, body = "GET", None
+                    headers.pop("Content-Type", None)
+                continue
+            if not 200 <= resp.status < 300:
+                raise FetchError(f"HTTP {resp.status} from {u.netloc}")
+            yield from parser.iter_results(iter_text(resp))
+            return
+    raise FetchError(f"more than {MAX_REDIRECTS} redirects")
+
+
+def _fetch_page(query: str, page: NextPage, timeout_s: int) -> DuckDuckGoHTMLParser:
     parser = DuckDuckGoHTMLParser()
-    parser.feed(body)
-    return parser.results
+    for _ in _iter_page(query, page, timeout_s, parser):
+        pass
+    return parser
 
 
-def main(argv: List[str]) -> int:
-    ap = argparse.ArgumentParser(description="Fallback terminal web search (DuckDuckGo HTML).")
-    ap.add_argument("query", nargs="+", help="Search query")
-    ap.add_argument("-n", "--num", type=int, default=5, help="Number of results")
-    ap.add_argument("--timeout", type=int, default=15, help="Request timeout seconds")
-    ap.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
-    args = ap.parse_args(argv)
+def iter_search(
+    query: str, timeout_s: int = 15, num: Optional[int] = None, max_pages: int = DEFAULT_MAX_PAGES
+) -> Generator[SearchResult, None, bool]:
+    """Results for `query` as they are parsed off the wire.
 
-    query = " ".join(args.query).strip()
-    results = ddg_search(query, timeout_s=args.timeout)[: max(args.num, 0)]
+    Without `num`, just the first page. With it, pages are followed (up to
+    `max_pages`) until there are `num` results, skipping URLs already seen.
+    The next page is requested as soon as the current page's Next form has
+    been parsed and it is clear more are needed, so it downloads while this
+    page's results are still being handed out.
 
-    if args.json:
-        import json
+    Closing the generator early stops the download and closes its
+    connection. Returns whether the results ran out (no further page).
+    """
+    parser = DuckDuckGoHTMLParser()
+    first = _iter_page(query, None, timeout_s, parser)
+    if num is None:
+        yield from first
+        return parser.next_page is None
+    if num <= 0:
+        return False
+
+    seen: Set[str] = set()
+    pages = 1
+    results: Iterator[SearchResult] = first
+    ahead: Optional["concurrent.futures.Future[DuckDuckGoHTMLParser]"] = None
+    prefetch = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ddg-next-page")
+    try:
+        while True:
+            for r in results:
+                if ahead is None and _want_next_page(parser, seen, pages, num, max_pages):
+                    ahead = prefetch.submit(_fetch_page, query, parser.next_page, timeout_s)
+                if r.url in seen:
+                    continue
+                seen.add(r.url)
+                yield r
+                if len(seen) >= num:
+                    return False
+            if ahead is None and _want_next_page(parser, seen, pages, num, max_pages):
+                ahead = prefetch.submit(_fetch_page, query, parser.next_page, timeout_s)
+            if ahead is None:
+                return parser.next_page is None
+            try:
+                parser = ahead.result()
+            except OSError as e:
+                # Keep what the earlier pages gave rather than failing the search.
+                print(f"Fetching page {pages + 1} failed ({e}); returning {len(seen)} results.", file=sys.stderr)
+                return False
+            ahead = None
+            pages += 1
+            results = iter(parser.results)
+    finally:
+        first.close()
+        if ahead is not None:
+            ahead.cancel()
+        prefetch.shutdown(wait=False)
+
+
+def _want_next_page(parser: DuckDuckGoHTMLParser, seen: Set[str], pages: int, num: int, max_pages: int) -> bool:
+    if parser.next_page is None or pages >= max_pages:
+        return False
+    return len(seen.union(r.url for r in parser.results)) < num
+
+
+def search(
+    query: str, timeout_s: int = 15, num: Optional[int] = None, max_pages: int = DEFAULT_MAX_PAGES
+) -> Tuple[List[SearchResult], bool]:
+    """`iter_search` collected: the results, and whether they are all there are."""
+    it = iter_search(query, timeout_s, num, max_pages)
+    results: List[SearchResult] = []
+    try:
+        while num is None or len(results) < num:
+            results.append(next(it))
+    except StopIteration as stop:
+        return results, bool(stop.value)
+    finally:
+        it.close()
+    return results, False
+
+
+def ddg_search(
+    query: str, timeout_s: int = 15, num: Optional[int] = None, max_pages: int = DEFAULT_MAX_PAGES
+) -> List[SearchResult]:
+    """The first `num` results, over as many pages as it takes (just the first page if None)."""
+    return search(query, timeout_s, num, max_pages)[0]
+
+
+def cached_search(
+    query: str,
+    num: int,
+    cache: SearchCache,
+    timeout_s: int = 15,
+    refresh: bool = False,
+) -> List[SearchResult]:
+    """`ddg_search` through the cache.
+
+    A stale hit (inside the stale-while-revalidate window) is returned at once
+    and refreshed by a detached background run. If the fetch fails and an
+    entry exists, however old, it is returned instead of the error. If the
+    cache itself fails, the search goes ahead without it.
+    """
+    try:
+        hit = None if refresh else cache.lookup(CACHE_NS, query, num)
+    except sqlite3.Error as e:
+        _cache_failed(e)
+        return ddg_search(query, timeout_s, num)
+    if hit is not None and hit.state != EXPIRED:
+        if hit.state != FRESH:
+            _revalidate_in_background(query, num, cache, timeout_s)
+        return _cached_results(hit, num)
 
-        print(json.dumps([r.__dict__ for r in results], ensure_ascii=False, indent=2))
-        return 0
+    try:
+        results, complete = search(query, timeout_s, num)
+    except OSError as e:
+        if hit is None:
+            raise
+        return _offline_fallback(cache, hit, num, e)
+
+    try:
+        _store(cache, query, results, complete)
+    except sqlite3.Error as e:
+        _cache_failed(e)
+    return results
+
+
+def _cached_results(hit: Hit, num: int) -> List[SearchResult]:
+    return [SearchResult(**r) for r in hit.value][: max(num, 0)]
 
-    if not results:
-        print("No results (or parser blocked).", file=sys.stderr)
-        return 2
 
+def _offline_fallback(cache: SearchCache, hit: Hit, num: int, error: Exception) -> List[SearchResult]:
+    try:
+        cache.note("offline_fallbacks")
+    except sqlite3.Error:
+        pass
+    print(f"Search failed ({error}); showing results cached {int(hit.age_s)}s ago.", file=sys.stderr)
+    return _cached_results(hit, num)
+
+
+def _store(cache: SearchCache, query: str, results: List[SearchResult], complete: bool) -> None:
+    # Complete means there was no further page: the entry then answers any
+    # request, however many results it asks for.
+    cache.store(CACHE_NS, query, [asdict(r) for r in results], len(results), complete)
+
+
+def search_many(
+    queries: Iterable[str],
+    num: int,
+    cache: Optional[SearchCache] = None,
+    workers: int = 4,
+    timeout_s: int = 15,
+    refresh: bool = False,
+) -> Iterator[Tuple[str, Optional[List[SearchResult]], Optional[str]]]:
+    """Run many searches; yield `(query, results, error)` as each one finishes.
+
+    Cache hits come back first, without touching the network. Misses are
+    fetched by `workers` threads over pooled keep-alive connections. The
+    cache is only used from the calling thread, and dropped (with a warning)
+    if it fails. Stale hits are refreshed in the same pool after being yielded.
+    """
+    misses: List[Tuple[str, Optional[Hit]]] = []
+    revalidate: List[str] = []
+    for query in dict.fromkeys(q.strip() for q in queries):
+        if not query:
+            continue
+        hit = None
+        if cache is not None and not refresh:
+            try:
+                hit = cache.lookup(CACHE_NS, query, num)
+            except sqlite3.Error as e:
+                _cache_failed(e)
+                cache = None
+        if hit is not None and hit.state != EXPIRED:
+            yield query, _cached_results(hit, num), None
+            if hit.state != FRESH:
+                revalidate.append(query)
+            continue
+        misses.append((query, hit))
+
+    if not misses and not revalidate:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        jobs = {pool.submit(search, q, timeout_s, num): (q, hit, True) for q, hit in misses}
+        jobs.update({pool.submit(search, q, timeout_s, num): (q, None, False) for q in revalidate})
+        for fut in concurrent.futures.as_completed(jobs):
+            query, hit, emit = jobs[fut]
+            try:
+                results, complete = fut.result()
+            except OSError as e:
+                if not emit:
+                    continue
+                if hit is not None and cache is not None:
+                    yield query, _offline_fallback(cache, hit, num, e), None
+                else:
+                    yield query, None, str(e)
+                continue
+            if cache is not None:
+                try:
+                    _store(cache, query, results, complete)
+                except sqlite3.Error as e:
+                    _cache_failed(e)
+                    cache = None
+            if emit:
+                yield query, results, None
+
+
+def _cache_failed(error: Exception) -> None:
+    print(f"Search cache unavailable ({error}); continuing without it.", file=sys.stderr)
+
+
+def _open_cache(args: argparse.Namespace) -> Optional[SearchCache]:
+    try:
+        return SearchCache(args.cache, args.cache_ttl, args.cache_max_entries, args.stale_while_revalidate)
+    except (sqlite3.Error, OSError) as e:
+        _cache_failed(e)
+        return None
+
+
+def _print_cache_stats(cache: SearchCache) -> None:
+    try:
+        print(json.dumps(cache.stats()), file=sys.stderr)
+    except sqlite3.Error as e:
+        _cache_failed(e)
+
+
+def _revalidate_in_background(query: str, num: int, cache: SearchCache, timeout_s: int) -> None:
+    cmd = [
+        sys.executable, os.path.abspath(__file__), query, "-n", str(num), "--refresh", "--json",
+        "--cache", cache.path, "--cache-max-entries", str(cache.max_entries), "--timeout", str(timeout_s),
+    ]
+    try:
+        subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+
+def _print_results(results: Iterable[SearchResult]) -> int:
+    i = 0
     for i, r in enumerate(results, start=1):
         print(f"{i}. {r.title}")
         print(f"   {r.url}")
         if r.snippet:
             print(f"   {r.snippet}")
-        print()
+        print(flush=True)
 
+    if not i:
+        print("No results (or parser blocked).", file=sys.stderr)
+        return 2
     return 0
 
 
+def _read_queries(path: str) -> List[str]:
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [ln.strip() for ln in lines if ln.strip() and not ln.lstrip().startswith("#")]
+
+
+def _run_batch(args: argparse.Namespace) -> int:
+    queries = _read_queries(args.batch)
+    cache = None if args.no_cache else _open_cache(args)
+    failed = 0
+    try:
+        for query, results, error in search_many(queries, args.num, cache, args.workers, args.timeout, args.refresh):
+            if error is not None:
+                failed += 1
+                line = {"query": query, "error": error}
+            else:
+                line = {"query": query, "results": [asdict(r) for r in results or []]}
+            print(json.dumps(line, ensure_ascii=False), flush=True)
+        if cache is not None and args.cache_stats:
+            _print_cache_stats(cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    return 1 if failed else 0
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description="Fallback terminal web search (DuckDuckGo HTML).")
+    ap.add_argument("query", nargs="*", help="Search query")
+    ap.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run every query in FILE (one per line, '-' for stdin) concurrently; emits one JSON object per line",
+    )
+    ap.add_argument("--workers", type=int, default=4, help="Concurrent requests in --batch mode")
+    ap.add_argument("-n", "--num", type=int, default=5, help="Number of results")
+    ap.add_argument("--timeout", type=int, default=15, help="Request timeout seconds")
+    ap.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    ap.add_argument("--no-cache", action="store_true", help="Always fetch; don't read or write the cache")
+    ap.add_argument("--refresh", action="store_true", help="Fetch even if cached, and update the cache")
+    ap.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Cache database")
+    ap.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL_S, help="Seconds a cached result stays fresh")
+    ap.add_argument(
+        "--stale-while-revalidate",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="Serve results up to this long past the TTL immediately and refresh them in the background",
+    )
+    ap.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="LRU bound on cached queries")
+    ap.add_argument("--cache-stats", action="store_true", help="Print cache hit/miss statistics as JSON to stderr")
+    args = ap.parse_args(argv)
+
+    if args.batch:
+        return _run_batch(args)
+    query = " ".join(args.query).strip()
+    if not query:
+        ap.error("give a query, or --batch FILE")
+    cache = None if args.no_cache else _open_cache(args)
+    if cache is None and not args.json:
+        # Nothing to store, so print each result as soon as it is parsed.
+        with contextlib.closing(iter_search(query, args.timeout, args.num)) as it:
+            return _print_results(it)
+    if cache is None:
+        results = ddg_search(query, args.timeout, args.num)
+    else:
+        with cache:
+            results = cached_search(query, args.num, cache, args.timeout, args.refresh)
+            if args.cache_stats:
+                _print_cache_stats(cache)
+
+    if args.json:
+        print(json.dumps([r.__dict__ for r in results], ensure_ascii=False, indent=2))
+        return 0
+    return _print_results(results)
+
+
 if __name__ == "__main__":
     raise SystemExit(main(sys.argv[1:]))
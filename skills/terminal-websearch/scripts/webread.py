@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import argparse
+import codecs
+import contextlib
+import http.client
+import re
+import sys
+import urllib.parse
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Tuple
+
+from ddg_search import MAX_REDIRECTS, REDIRECT_STATUSES, FetchError, iter_body, pool_for
+
+
+DEFAULT_MAX_BYTES = 2_000_000
+DEFAULT_MAX_CHARS = 100_000
+
+# Subtrees dropped whole: code, styling, embedded documents, and page chrome
+# (menus, footers, sidebars, form controls).
+SKIP_TAGS = frozenset(
+    {
+        "script", "style", "noscript", "template", "title", "svg", "math", "canvas",
+        "iframe", "object", "nav", "footer", "aside", "select", "button",
+    }
+)
+BLOCK_TAGS = frozenset(
+    {
+        "address", "article", "blockquote", "dd", "details", "div", "dl", "dt", "fieldset",
+        "figcaption", "figure", "form", "header", "main", "ol", "section", "summary", "table",
+        "tbody", "thead", "tfoot", "tr", "ul",
+    }
+)
+PARAGRAPH_TAGS = frozenset({"p", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "pre"})
+VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+)
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.I)
+
+
+class TextExtractor(HTMLParser):
+    """HTML to plain text, a chunk at a time.
+
+    Feed it as the page arrives and `take()` what has been produced so far;
+    it keeps no more than the current line. Text stops at `max_chars`, after
+    which `done` is set and further input is ignored.
+    """
+
+    def __init__(self, max_chars: Optional[int] = None) -> None:
+        super().__init__()
+        self.max_chars = max_chars
+        self.chars = 0
+        self.done = False
+
+        self._out: List[str] = []
+        self._skip: List[str] = []
+        self._pre = 0
+        self._lists: List[str] = []
+        self._breaks = 0
+        self._space = False
+        self._line_start = True
+        self._bullet = ""
+
+    def take(self) -> str:
+        text = "".join(self._out)
+        self._out = []
+        return text
+
+    def feed(self, data: str) -> None:
+        if not self.done:
+            super().feed(data)
+
+    def close(self) -> None:
+        if not self.done:
+            super().close()
+        if self.chars and not self._line_start:
+            self._out.append("\n")
+
+    def updatepos(self, i: int, j: int) -> int:
+        # getpos() is never used; skip the line/column bookkeeping.
+        return j
+
+    def handle_starttag(self, tag: str, attrs):
+        if self._skip:
+            if tag in SKIP_TAGS:
+                self._skip.append(tag)
+            return
+        if tag in SKIP_TAGS:
+            self._skip.append(tag)
+        elif tag == "br":
+            # One <br> ends the line, two in a row leave a blank one.
+            self._breaks = min(self._breaks + 1, 2)
+            self._space = False
+        elif tag in PARAGRAPH_TAGS:
+            self._break(2)
+            if tag == "pre":
+                self._pre += 1
+        elif tag == "li":
+            self._break(1)
+            depth = max(len(self._lists), 1)
+            self._bullet = "  " * (depth - 1) + ("* " if not self._lists or self._lists[-1] == "ul" else "- ")
+        elif tag in ("ul", "ol"):
+            self._lists.append(tag)
+            self._break(1)
+        elif tag in BLOCK_TAGS:
+            self._break(1)
+        elif tag in ("td", "th"):
+            self._space = True
+
+    def handle_startendtag(self, tag: str, attrs):
+        # <nav/> and friends are empty, not the start of a subtree.
+        if tag not in SKIP_TAGS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        if self._skip:
+            if tag in self._skip:
+                # Pop back to the matching element; unclosed ones inside it go too.
+                while self._skip.pop() != tag:
+                    pass
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag in PARAGRAPH_TAGS:
+            if tag == "pre" and self._pre:
+                self._pre -= 1
+            self._break(2)
+        elif tag in ("ul", "ol"):
+            if tag in self._lists:
+                while self._lists.pop() != tag:
+                    pass
+            self._break(1)
+        elif tag in BLOCK_TAGS or tag == "li":
+            self._break(1)
+
+    def handle_data(self, data: str):
+        if self._skip or self.done:
+            return
+        if self._pre:
+            self._pre_text(data)
+            return
+        if data[:1].isspace():
+            self._space = True
+        words = data.split()
+        if not words:
+            return
+        if self._breaks and self.chars:
+            self._write("\n" * self._breaks)
+        elif self._space and not self._line_start:
+            self._write(" ")
+        self._breaks = 0
+        if self._line_start and self._bullet:
+            self._write(self._bullet)
+        self._bullet = ""
+        self._write(" ".join(words))
+        self._space = data[-1:].isspace()
+
+    def _pre_text(self, data: str) -> None:
+        if self._breaks and self.chars:
+            self._write("\n" * self._breaks)
+        self._breaks = 0
+        self._write(data)
+
+    def _break(self, n: int) -> None:
+        # Line breaks are owed, not written: a run of block tags yields one
+        # break, and none at all before the first text.
+        self._breaks = max(self._breaks, n)
+        self._space = False
+
+    def _write(self, s: str) -> None:
+        if self.max_chars is not None and self.chars + len(s) >= self.max_chars:
+            s = s[: self.max_chars - self.chars]
+            self.done = True
+        if s:
+            self._out.append(s)
+            self.chars += len(s)
+            self._line_start = s.endswith("\n")
+
+
+def _request_target(url: str) -> Tuple[str, str]:
+    u = urllib.parse.urlsplit(url)
+    if u.scheme not in ("http", "https") or not u.hostname:
+        raise FetchError(f"not an http(s) URL: {url}")
+    path = urllib.parse.quote(u.path or "/", safe="/%:@!$&'()*+,;=-._~")
+    if u.query:
+        path += "?" + urllib.parse.quote(u.query, safe="/%:@!$&'()*+,;=-._~?")
+    return f"{u.scheme}://{u.netloc}", path
+
+
+@contextlib.contextmanager
+def open_page(url: str, timeout_s: float = 20) -> Iterator[Tuple[str, http.client.HTTPResponse]]:
+    """GET `url`, following redirects; yields the final URL and the open response."""
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh) mo-skills/terminal-websearch",
+        "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5",
+        "Accept-Encoding": "gzip",
+        "Connection": "keep-alive",
+    }
+    for _ in range(MAX_REDIRECTS + 1):
+        origin, path = _request_target(url)
+        with pool_for(origin).request("GET", path, headers, timeout_s=timeout_s) as resp:
+            location = resp.getheader("Location")
+            if resp.status in REDIRECT_STATUSES and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if not 200 <= resp.status < 300:
+                raise FetchError(f"HTTP {resp.status} from {urllib.parse.urlsplit(url).netloc}")
+            yield url, resp
+            return
+    raise FetchError(f"more than {MAX_REDIRECTS} redirects")
+
+
+def _decoder(resp: http.client.HTTPResponse, head: bytes, is_html: bool) -> "codecs.IncrementalDecoder":
+    # Header charset first, then a <meta charset> near the top of the page.
+    charset = resp.headers.get_content_charset()
+    if not charset and is_html:
+        m = _META_CHARSET_RE.search(head[:4096])
+        if m:
+            charset = m.group(1).decode("ascii")
+    try:
+        return codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def read_page(
+    url: str,
+    max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+    max_chars: Optional[int] = DEFAULT_MAX_CHARS,
+    timeout_s: float = 20,
+) -> Iterator[str]:
+    """Readable text of the page at `url`, in pieces as it downloads.
+
+    The download stops once `max_bytes` of (decompressed) body have been read
+    or `max_chars` of text produced, whichever comes first.
+    """
+    with open_page(url, timeout_s) as (_, resp):
+        ctype = resp.headers.get_content_type() if resp.getheader("Content-Type") else "text/html"
+        is_html = ctype in ("text/html", "application/xhtml+xml")
+        if not is_html and not ctype.startswith("text/"):
+            raise FetchError(f"not a text page ({ctype})")
+
+        extractor = TextExtractor(max_chars) if is_html else None
+        decoder = None
+        received = 0
+        emitted = 0
+        truncated = False
+        for chunk in iter_body(resp):
+            if max_bytes is not None and received + len(chunk) >= max_bytes:
+                chunk = chunk[: max_bytes - received]
+                truncated = True
+            received += len(chunk)
+            if decoder is None:
+                decoder = _decoder(resp, chunk, is_html)
+            text = decoder.decode(chunk)
+            if extractor is None:
+                # Plain text passes through as is, up to max_chars.
+                if max_chars is not None:
+                    text = text[: max_chars - emitted]
+                    truncated |= emitted + len(text) >= max_chars
+                emitted += len(text)
+                if text:
+                    yield text
+            else:
+                extractor.feed(text)
+                out = extractor.take()
+                if out:
+                    yield out
+                truncated |= extractor.done
+            if truncated:
+                break
+
+        if extractor is not None:
+            if truncated:
+                # Don't let close() flush a tag or entity the cap cut in half.
+                extractor.done = True
+            extractor.close()
+            out = extractor.take()
+            if out:
+                yield out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Fetch a URL and print its readable text.")
+    ap.add_argument("url")
+    ap.add_argument(
+        "--max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="Stop downloading after this many body bytes (0 = no cap)"
+    )
+    ap.add_argument(
+        "--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="Stop after printing this many characters (0 = no cap)"
+    )
+    ap.add_argument("--timeout", type=float, default=20, help="Socket timeout in seconds")
+    args = ap.parse_args()
+
+    try:
+        for text in read_page(args.url, args.max_bytes or None, args.max_chars or None, args.timeout):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+    except (OSError, http.client.HTTPException) as e:
+        print(f"webread: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,21 +4,28 @@ set -euo pipefail
 # webread.sh — fetch a URL and output readable plain text.
 #
 # Prefers:
-#   lynx -dump
+#   webread.py (streams the page, drops script/style/nav, stops at a size cap)
 # Then:
+#   lynx -dump
 #   w3m -dump
 # Fallback:
 #   raw curl
 #
 # Usage:
-#   ./webread.sh https://example.com/
+#   ./webread.sh https://example.com/ [--max-chars N] [--max-bytes N]
 
-if [[ $# -ne 1 ]]; then
-  echo "Usage: $0 <url>" >&2
+if [[ $# -lt 1 ]]; then
+  echo "Usage: $0 <url> [--max-chars N] [--max-bytes N]" >&2
   exit 2
 fi
 
 URL="$1"
+shift
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+if command -v python3 >/dev/null 2>&1; then
+  exec python3 "$SCRIPT_DIR/webread.py" "$URL" "$@"
+fi
 
 if command -v lynx >/dev/null 2>&1; then
   lynx -dump -nolist -width=120 "$URL"
@@ -8,6 +8,12 @@ set -euo pipefail
 # Falls back to:
 #   ddg_search.py (minimal DuckDuckGo HTML scraper)
 #
+# Results are cached on disk (see ddg_cache.py). Environment:
+#   WEBSEARCH_NO_CACHE=1     always search, don't touch the cache
+#   WEBSEARCH_CACHE_TTL=S    seconds a cached result stays fresh (default 21600)
+#   WEBSEARCH_STALE=S        serve results up to S seconds past the TTL at once
+#                            and refresh them in the background (default 0)
+#
 # Usage:
 #   ./websearch.sh "query" [n]
 #   ./websearch.sh "query" [n] --json
@@ -21,16 +27,48 @@ QUERY="$1"
 N="${2:-5}"
 MODE="${3:-}"
 
-if command -v ddgr >/dev/null 2>&1; then
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+CACHE="$SCRIPT_DIR/ddg_cache.py"
+TTL="${WEBSEARCH_CACHE_TTL:-21600}"
+STALE="${WEBSEARCH_STALE:-0}"
+
+run_ddgr() {
   if [[ "$MODE" == "--json" ]]; then
     ddgr --json -n "$N" "$QUERY"
   else
     ddgr -n "$N" "$QUERY"
   fi
+}
+
+if command -v ddgr >/dev/null 2>&1; then
+  if [[ -n "${WEBSEARCH_NO_CACHE:-}" ]]; then
+    run_ddgr
+    exit 0
+  fi
+
+  # ddgr output is cached verbatim, per output mode and result count.
+  NS="ddgr${MODE}:$N"
+  status=0
+  python3 "$CACHE" get "$NS" "$QUERY" --ttl "$TTL" --stale "$STALE" || status=$?
+  if [[ $status -eq 0 ]]; then
+    exit 0
+  fi
+  if [[ $status -eq 3 ]]; then
+    # Served stale; refresh for next time without making the caller wait.
+    ( OUT="$(run_ddgr 2>/dev/null)" && [[ -n "$OUT" ]] \
+        && printf '%s\n' "$OUT" | python3 "$CACHE" put "$NS" "$QUERY" ) >/dev/null 2>&1 &
+    disown
+    exit 0
+  fi
+
+  OUT="$(run_ddgr)"
+  printf '%s\n' "$OUT"
+  if [[ -n "$OUT" ]]; then
+    printf '%s\n' "$OUT" | python3 "$CACHE" put "$NS" "$QUERY" || true
+  fi
   exit 0
 fi
 
-SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 FALLBACK="$SCRIPT_DIR/ddg_search.py"
 
 if [[ ! -f "$FALLBACK" ]]; then
@@ -38,8 +76,14 @@ if [[ ! -f "$FALLBACK" ]]; then
   exit 1
 fi
 
+ARGS=("$QUERY" -n "$N")
 if [[ "$MODE" == "--json" ]]; then
-  python3 "$FALLBACK" "$QUERY" -n "$N" --json
+  ARGS+=(--json)
+fi
+if [[ -n "${WEBSEARCH_NO_CACHE:-}" ]]; then
+  ARGS+=(--no-cache)
 else
-  python3 "$FALLBACK" "$QUERY" -n "$N"
+  ARGS+=(--cache-ttl "$TTL" --stale-while-revalidate "$STALE")
 fi
+
+python3 "$FALLBACK" "${ARGS[@]}"
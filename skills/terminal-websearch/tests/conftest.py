@@ -0,0 +1,79 @@
+import http.server
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, os.path.join(HERE, "..", "bench"))
+
+FIXTURES = os.path.join(HERE, "..", "bench", "fixtures")
+
+# (status, headers, body)
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+def fixture_html(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+@dataclass
+class Server:
+    """A local HTTP server; `handler(method, path, body)` answers every request."""
+
+    url: str
+    handler: Callable[[str, str, bytes], Response]
+    requests: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@pytest.fixture
+def server() -> Iterator[Server]:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _answer(self) -> None:
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n) if n else b""
+            srv.requests.append((self.command, self.path))
+            status, headers, out = srv.handler(self.command, self.path, body)
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            if "Content-Length" not in headers:
+                self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        do_GET = do_POST = _answer
+
+        def log_message(self, *args) -> None:
+            pass
+
+    class Quiet(http.server.ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address) -> None:
+            # Clients that stop reading early (the point of several tests) reset the connection.
+            pass
+
+    httpd = Quiet(("127.0.0.1", 0), Handler)
+    srv = Server(f"http://127.0.0.1:{httpd.server_port}", lambda m, p, b: (404, {}, b""))
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield srv
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_proxy_env(monkeypatch) -> None:
+    # The tests talk to 127.0.0.1 directly unless they set a proxy themselves.
+    for name in ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY", "all_proxy", "ALL_PROXY", "no_proxy", "NO_PROXY"):
+        monkeypatch.delenv(name, raising=False)
@@ -0,0 +1,51 @@
+import time
+from unittest import mock
+
+from ddg_cache import EXPIRED, FRESH, STALE, SearchCache
+
+
+def _at(t: float):
+    return mock.patch("time.time", return_value=t)
+
+
+def test_ttl_and_stale_window(tmp_path):
+    now = time.time()
+    with SearchCache(str(tmp_path / "c.sqlite3"), ttl_s=60, stale_s=30) as cache:
+        with _at(now):
+            cache.store("ns", "Some  Query", ["a"], 1, True)
+        with _at(now + 59):
+            assert cache.lookup("ns", "some query").state == FRESH
+        with _at(now + 89):
+            assert cache.lookup("ns", "some query").state == STALE
+        with _at(now + 91):
+            hit = cache.lookup("ns", "some query")
+        # Expired entries come back (for offline fallback) but count as misses.
+        assert hit.state == EXPIRED and hit.value == ["a"]
+        stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_entry_answers_only_what_it_holds_unless_complete(tmp_path):
+    with SearchCache(str(tmp_path / "c.sqlite3")) as cache:
+        cache.store("ns", "partial", ["a", "b"], 2, False)
+        cache.store("ns", "all", ["a", "b"], 2, True)
+        assert cache.lookup("ns", "partial", 2) is not None
+        assert cache.lookup("ns", "partial", 3) is None
+        assert cache.lookup("ns", "all", 10) is not None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    now = time.time()
+    with SearchCache(str(tmp_path / "c.sqlite3"), max_entries=2) as cache:
+        with _at(now):
+            cache.store("ns", "a", 1, 1, True)
+        with _at(now + 1):
+            cache.store("ns", "b", 2, 1, True)
+        with _at(now + 2):
+            assert cache.lookup("ns", "a") is not None
+        with _at(now + 3):
+            cache.store("ns", "c", 3, 1, True)
+        assert cache.lookup("ns", "b") is None
+        assert cache.lookup("ns", "a").value == 1
+        assert cache.lookup("ns", "c").value == 3
+        assert cache.stats()["evictions"] == 1
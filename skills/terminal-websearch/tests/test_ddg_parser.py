@@ -0,0 +1,7 @@
+from bench_parser import DEFAULT_FIXTURES, check_equivalence, load_fixtures
+
+
+def test_parser_matches_the_original_on_every_fixture():
+    fixtures = load_fixtures(DEFAULT_FIXTURES)
+    assert fixtures
+    assert check_equivalence(fixtures) == []
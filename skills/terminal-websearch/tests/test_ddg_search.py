@@ -0,0 +1,140 @@
+import sqlite3
+from unittest import mock
+
+import pytest
+
+import ddg_search
+from conftest import fixture_html
+from ddg_cache import SearchCache
+from ddg_search import FetchError, search, search_many
+
+
+@pytest.fixture
+def ddg(server, monkeypatch):
+    monkeypatch.setattr(ddg_search, "DDG_HTML_URL", f"{server.url}/html/")
+    return server
+
+
+def _html(body: bytes):
+    return 200, {"Content-Type": "text/html; charset=utf-8"}, body
+
+
+def test_first_page_follows_redirects(ddg):
+    def handler(method, path, body):
+        if path.startswith("/html/"):
+            return 302, {"Location": "/moved/?q=x"}, b""
+        return _html(fixture_html("ddg_last_page.html"))
+
+    ddg.handler = handler
+    results, complete = search("x")
+    assert len(results) == 7 and complete
+    assert ddg.requests == [("GET", "/html/?q=x"), ("GET", "/moved/?q=x")]
+
+
+def test_see_other_turns_the_next_page_post_into_a_get(ddg):
+    def handler(method, path, body):
+        if method == "GET" and path.startswith("/html/"):
+            return _html(fixture_html("ddg_typical.html"))
+        if method == "POST":
+            return 303, {"Location": "/page2"}, b""
+        return _html(fixture_html("ddg_last_page.html"))
+
+    ddg.handler = handler
+    results, _ = search("x", num=15)
+    assert len(results) == 15
+    assert [m for m, _ in ddg.requests] == ["GET", "POST", "GET"]
+
+
+def test_redirect_loop_is_a_fetch_error(ddg):
+    ddg.handler = lambda method, path, body: (302, {"Location": path}, b"")
+    with pytest.raises(FetchError):
+        search("x")
+
+
+def test_http_goes_through_the_proxy_from_the_environment(server, monkeypatch):
+    monkeypatch.setenv("http_proxy", server.url)
+    monkeypatch.setattr(ddg_search, "DDG_HTML_URL", "http://search.invalid/html/")
+    server.handler = lambda method, path, body: _html(fixture_html("ddg_last_page.html"))
+    results, _ = search("x")
+    assert len(results) == 7
+    assert server.requests == [("GET", "http://search.invalid/html/?q=x")]
+
+
+@pytest.mark.parametrize(
+    "headers, body",
+    [
+        # The connection drops before Content-Length is reached.
+        ({"Content-Length": "100000", "Connection": "close"}, b"<html><body>"),
+        ({"Content-Encoding": "gzip"}, b"not gzip at all"),
+    ],
+)
+def test_broken_body_is_a_fetch_error_and_batch_goes_on(ddg, headers, body):
+    def handler(method, path, _):
+        if "q=bad" in path:
+            return 200, {"Content-Type": "text/html", **headers}, body
+        return _html(fixture_html("ddg_last_page.html"))
+
+    ddg.handler = handler
+    with pytest.raises(FetchError):
+        search("bad")
+    out = {q: (results, error) for q, results, error in search_many(["bad", "good"], 5, workers=2)}
+    assert out["bad"][0] is None and out["bad"][1]
+    assert len(out["good"][0]) == 5 and out["good"][1] is None
+
+
+def test_unusable_cache_file_warns_and_searches_uncached(ddg, tmp_path, capsys):
+    ddg.handler = lambda method, path, body: _html(fixture_html("ddg_last_page.html"))
+    cache_path = tmp_path / "search.sqlite3"
+    cache_path.write_bytes(b"this is not a database" * 100)
+    assert ddg_search.main(["x", "--json", "--cache", str(cache_path)]) == 0
+    out = capsys.readouterr()
+    assert '"url"' in out.out
+    assert "Search cache unavailable" in out.err
+
+
+def test_cache_failing_on_use_is_skipped(ddg, tmp_path, capsys):
+    ddg.handler = lambda method, path, body: _html(fixture_html("ddg_last_page.html"))
+    with SearchCache(str(tmp_path / "c.sqlite3")) as cache, \
+            mock.patch.object(SearchCache, "store", side_effect=sqlite3.OperationalError("database is locked")):
+        assert len(ddg_search.cached_search("x", 2, cache)) == 2
+        with mock.patch.object(SearchCache, "lookup", side_effect=sqlite3.OperationalError("disk I/O error")):
+            assert len(ddg_search.cached_search("y", 5, cache)) == 5
+    assert capsys.readouterr().err.count("Search cache unavailable") == 2
+
+
+def test_cache_failing_mid_batch_is_dropped(ddg, tmp_path, capsys):
+    ddg.handler = lambda method, path, body: _html(fixture_html("ddg_last_page.html"))
+    with SearchCache(str(tmp_path / "c.sqlite3")) as cache, \
+            mock.patch.object(SearchCache, "store", side_effect=sqlite3.OperationalError("database is locked")):
+        out = list(search_many(["a", "b"], 5, cache, workers=1))
+    assert sorted(q for q, results, error in out if results and error is None) == ["a", "b"]
+    assert capsys.readouterr().err.count("Search cache unavailable") == 1
+
+
+def test_pages_are_followed_until_the_results_run_out(ddg):
+    pages = iter(["ddg_page2.html", "ddg_last_page.html"])
+
+    def handler(method, path, body):
+        if method == "GET":
+            return _html(fixture_html("ddg_typical.html"))
+        return _html(fixture_html(next(pages)))
+
+    ddg.handler = handler
+    results, complete = search("x", num=100)
+    urls = [r.url for r in results]
+    assert len(urls) == len(set(urls)) == 49
+    assert complete
+    # One request per page, none repeated by the prefetch.
+    assert [m for m, _ in ddg.requests] == ["GET", "POST", "POST"]
+
+
+def test_pagination_stops_once_there_are_enough(ddg):
+    def handler(method, path, body):
+        if method == "GET":
+            return _html(fixture_html("ddg_typical.html"))
+        return _html(fixture_html("ddg_page2.html"))
+
+    ddg.handler = handler
+    results, complete = search("x", num=5)
+    assert len(results) == 5 and not complete
+    assert [m for m, _ in ddg.requests] == ["GET"]
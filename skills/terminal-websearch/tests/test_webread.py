@@ -0,0 +1,56 @@
+import gzip
+
+import pytest
+
+from ddg_search import FetchError
+from webread import read_page
+
+
+def _page(paragraphs: int) -> bytes:
+    body = "".join(f"<p>paragraph {i} " + "word " * 20 + "</p>" for i in range(paragraphs))
+    return f"<html><head><title>t</title></head><body><nav>menu</nav>{body}</body></html>".encode()
+
+
+def test_follows_redirects_to_the_page(server):
+    def handler(method, path, body):
+        if path == "/old":
+            return 301, {"Location": "/new"}, b""
+        return 200, {"Content-Type": "text/html"}, _page(2)
+
+    server.handler = handler
+    text = "".join(read_page(f"{server.url}/old"))
+    assert text.startswith("paragraph 0") and "menu" not in text
+    assert server.requests == [("GET", "/old"), ("GET", "/new")]
+
+
+def test_redirect_loop_is_a_fetch_error(server):
+    server.handler = lambda method, path, body: (302, {"Location": path}, b"")
+    with pytest.raises(FetchError):
+        "".join(read_page(f"{server.url}/loop"))
+
+
+def test_max_chars_caps_the_text(server):
+    server.handler = lambda method, path, body: (200, {"Content-Type": "text/html"}, _page(1000))
+    text = "".join(read_page(server.url, max_bytes=None, max_chars=500))
+    assert len(text) <= 501 and text.startswith("paragraph 0")
+
+
+def test_max_bytes_caps_the_decompressed_body(server):
+    page = _page(1000)
+    server.handler = lambda method, path, body: (
+        200, {"Content-Type": "text/html", "Content-Encoding": "gzip"}, gzip.compress(page)
+    )
+    text = "".join(read_page(server.url, max_bytes=4000, max_chars=None))
+    assert 0 < len(text) < 4000
+    assert "paragraph 999" not in text
+
+
+def test_plain_text_passes_through_and_binary_is_refused(server):
+    server.handler = lambda method, path, body: (
+        (200, {"Content-Type": "text/plain; charset=utf-8"}, "héllo\n".encode())
+        if path == "/t"
+        else (200, {"Content-Type": "image/png"}, b"\x89PNG")
+    )
+    assert "".join(read_page(f"{server.url}/t")) == "héllo\n"
+    with pytest.raises(FetchError):
+        "".join(read_page(f"{server.url}/img"))